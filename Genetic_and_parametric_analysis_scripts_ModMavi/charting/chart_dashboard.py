@@ -0,0 +1,269 @@
+"""
+=========================
+Live progress dashboard
+=========================
+
+Module description
+------------------
+Shows the progress of a running parametric sweep or genetic optimization in a browser
+page that refreshes itself. Run this script from any suitable IDE (iesve is not
+required) while the VE runs the study, and choose the run journal (.jsonl) in the
+project folder e.g. Para_sim_table.jsonl or GA_SO_output.jsonl.
+
+The journal is written by the study next to its results csv (see utils_journal.py):
+one line per simulation, append only. This script only reads it and only reads the
+lines added since the last check, so it never locks the results csv and costs the
+study no simulation time, even for studies of thousands of runs.
+
+The page shows:
+- runs completed, the run rate and the ETA (sweeps; the total is known)
+- the best-so-far value of each target against the run number
+- the distributions of the inputs and outputs
+
+Notes
+-----
+The page is written to <journal name>_dashboard.html next to the journal, with
+plotly.min.js alongside it, and rewritten only when there are new results.
+
+Targets are minimised (as in the genetic optimizations); sweeps have no targets in the
+journal so set them in the main loop.
+
+Stop the script with Ctrl+C (or stop in the IDE) when the study has finished.
+"""
+
+import os
+import json
+import time
+import webbrowser
+import numpy as np
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+from plotly.offline import get_plotlyjs
+import tkinter as tk
+from tkinter.filedialog import askopenfilename
+from pathlib import Path
+
+
+class journal_reader:
+     """ Reads the new lines of a run journal from the last byte read
+     """
+
+     def __init__(self, path):
+          """ Initialise class variables
+
+          Args:
+               path (str) : journal pathname
+          """
+          self.path = path
+          self.offset = 0
+          self.start = None
+          self.results = []
+
+     def read_new(self):
+          """ Reads the complete lines added since the last call
+
+          Returns:
+               results (list[dict]) : new result lines
+          """
+          try:
+               size = os.path.getsize(self.path)
+          except OSError:
+               return []
+          if size < self.offset:
+               # the journal was restarted by a new run
+               self.offset = 0
+               self.start = None
+               self.results = []
+          if size == self.offset:
+               return []
+
+          # shared read; the writer appends with its own short-lived handle
+          with open(self.path, 'rb') as f:
+               f.seek(self.offset)
+               chunk = f.read(size - self.offset)
+          # a partly written last line is left for the next call
+          end = chunk.rfind(b'\n') + 1
+          self.offset += end
+
+          new = []
+          for line in chunk[:end].splitlines():
+               try:
+                    entry = json.loads(line)
+               except ValueError:
+                    continue
+               if entry['event'] == 'start':
+                    self.start = entry
+                    self.results = []
+                    new = []
+               elif entry['event'] == 'result':
+                    new.append(entry)
+          self.results += new
+          return new
+
+
+class dashboard:
+     """ Incrementally updated progress statistics and page
+     """
+
+     def __init__(self, html_path, targets=None, refresh=10, bins=30):
+          """ Initialise class variables
+
+          Args:
+               html_path (str) : page pathname
+               targets (list[str], optional) : outputs to track the best of; None = the
+                                               targets in the journal
+               refresh (int) : page refresh interval (seconds)
+               bins (int) : histogram bins
+          """
+          self.html_path = html_path
+          self.targets = targets
+          self.refresh = refresh
+          self.bins = bins
+          self.reset()
+
+     def reset(self):
+          """ Clears the statistics (new run)
+          """
+          self.runs = []
+          self.times = []
+          self.values = {}
+          self.best = {}
+          self.columns = None
+
+     def update(self, reader, new):
+          """ Adds the new results to the statistics
+
+          Args:
+               reader (journal_reader) : journal reader
+               new (list[dict]) : new result lines
+          """
+          if len(reader.results) == len(new):
+               # first results or a restarted run
+               self.reset()
+               self.columns = reader.start['columns'] if reader.start else None
+               if self.targets is None and reader.start:
+                    self.targets = reader.start['targets']
+
+          for entry in new:
+               self.runs.append(entry['run'])
+               self.times.append(entry['time'])
+               # non-finite values (failed assessments) are left out of the histograms
+               # and the best so far
+               for key, value in entry['values'].items():
+                    if isinstance(value, (int, float)) and not isinstance(value, bool) \
+                              and np.isfinite(value):
+                         self.values.setdefault(key, []).append(value)
+               for target in self.targets or []:
+                    value = entry['values'].get(target)
+                    history = self.best.get(target, [])
+                    if not isinstance(value, (int, float)) or not np.isfinite(value):
+                         # the best so far carries on (kept in step with the runs)
+                         if history:
+                              history.append(history[-1])
+                         continue
+                    history = self.best.setdefault(target, [])
+                    history.append(min(value, history[-1]) if history else value)
+
+     def progress(self, reader):
+          """ Returns the progress text
+
+          Args:
+               reader (journal_reader) : journal reader
+
+          Returns:
+               text (str) : runs, rate and ETA
+          """
+          done = len(self.runs)
+          total = reader.start['total'] if reader.start else None
+          elapsed = self.times[-1] - (reader.start['time'] if reader.start else self.times[0])
+          rate = done / elapsed * 3600 if elapsed > 0 else 0.0
+          text = f'{done} runs completed'
+          if total:
+               text += f' of {total}'
+          text += f'; {rate:.1f} runs/hour'
+          if total and rate > 0:
+               remaining = (total - done) / rate
+               text += f'; ETA {remaining:.1f} hours'
+          for target, history in self.best.items():
+               text += f'; best {target} {history[-1]:.4g}'
+          return text
+
+     def write(self, reader, first):
+          """ Writes the page
+
+          Args:
+               reader (journal_reader) : journal reader
+               first (bool) : open the page in the browser
+          """
+          outputs = [key for key in self.values if key not in self.best]
+          rows = 1 + (len(outputs) + 2) // 3
+          titles = ['Best so far'] + outputs
+          fig = make_subplots(rows=rows, cols=3, subplot_titles=titles,
+                              specs=[[{'colspan': 3}, None, None]] + [[{}, {}, {}]] * (rows - 1))
+
+          for target, history in self.best.items():
+               fig.add_trace(go.Scatter(x=self.runs[-len(history):], y=history, name=target,
+                                        mode='lines'), row=1, col=1)
+          for i, key in enumerate(outputs):
+               counts, edges = np.histogram(self.values[key], bins=self.bins)
+               fig.add_trace(go.Bar(x=(edges[:-1] + edges[1:]) / 2, y=counts, name=key,
+                                    marker_color='skyblue', showlegend=False),
+                             row=2 + i // 3, col=1 + i % 3)
+
+          title = f'{Path(reader.path).name}: {self.progress(reader)}'
+          fig.update_layout(title_text=title, height=300 * rows, bargap=0.05,
+                            font={'size':10, 'family':'Arial', 'color':'gray'})
+
+          # plotly.js is written once next to the page rather than into every refresh
+          script_path = Path(self.html_path).with_name('plotly.min.js')
+          if not script_path.exists():
+               script_path.write_text(get_plotlyjs(), encoding='utf-8')
+          html = fig.to_html(include_plotlyjs='directory', full_html=True)
+          html = html.replace('<head>', f'<head><meta http-equiv="refresh" content="{self.refresh}">', 1)
+          temp_path = self.html_path + '.tmp'
+          with open(temp_path, 'w', encoding='utf-8') as f:
+               f.write(html)
+          os.replace(temp_path, self.html_path)
+          print(title)
+          if first:
+               webbrowser.open(Path(self.html_path).resolve().as_uri())
+
+
+def monitor(journal_name, targets=None, poll_interval=10):
+     """ Tails the journal and updates the page until stopped
+
+     Args:
+          journal_name (str) : journal pathname
+          targets (list[str], optional) : outputs to track the best of
+          poll_interval (float) : seconds between checks
+     """
+
+     reader = journal_reader(journal_name)
+     html_path = str(Path(journal_name).with_name(Path(journal_name).stem + '_dashboard.html'))
+     page = dashboard(html_path, targets, refresh=int(poll_interval))
+     first = True
+     while True:
+          new = reader.read_new()
+          if new:
+               page.update(reader, new)
+               page.write(reader, first)
+               first = False
+          time.sleep(poll_interval)
+
+# Main loop
+if __name__ == "__main__":
+
+     ### Set the targets to track (minimised); None = the targets in the journal (GA)
+     # e.g. targets = ['EUI_kWh/m2'] for a sweep
+     targets = None
+     poll_interval = 10
+
+     # Ask user for the journal file
+     root = tk.Tk()
+     journal_name = askopenfilename(title='Choose run journal', filetypes=[("journal(*.jsonl)","*.jsonl")])
+     root.destroy() # Removes Tkinter dialog popup window
+
+     try:
+          monitor(journal_name, targets, poll_interval)
+     except KeyboardInterrupt:
+          print('Dashboard stopped')
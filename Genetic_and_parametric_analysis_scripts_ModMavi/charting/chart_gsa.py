@@ -0,0 +1,88 @@
+"""
+===============================
+Global sensitivity bar chart
+===============================
+
+Module description
+------------------
+Creates a bar chart of the global sensitivity indices of a target metric from the
+indices csv generated by parametric_gsa.py (GSA_sobol_indices.csv or
+GSA_morris_indices.csv). The inputs are ranked by their total Sobol index (ST) or by
+mu* (Morris) with bootstrap confidence intervals as error bars.
+
+Sobol: the first-order index (S1) is charted next to ST; the difference between them is
+the share of the variance due to interactions with other inputs.
+
+Morris: sigma is charted next to mu*; a high sigma relative to mu* shows a non-linear
+effect or interactions.
+
+Notes:
+
+Negative Sobol indices close to 0 are estimation noise; increase the base samples if
+the confidence intervals are wide.
+
+"""
+
+import pandas as pd
+import plotly.graph_objects as go
+import tkinter as tk
+from tkinter.filedialog import askopenfilename
+
+def gsa_bar(df: pd.DataFrame, target):
+     """ Creates a bar chart of the sensitivity indices
+
+     Args:
+          df (pandas df) : indices of one target (index = input names)
+          target (str) : output metric
+     """
+
+     if 'ST' in df.columns:
+          # Sobol
+          df = df.sort_values(by=['ST'], ascending=False)
+          bars = [('ST', 'ST_conf', 'Total (ST)', 'skyblue'),
+                  ('S1', 'S1_conf', 'First-order (S1)', 'steelblue')]
+          y_title = 'Sobol index'
+     else:
+          # Morris
+          df = df.sort_values(by=['mu_star'], ascending=False)
+          bars = [('mu_star', 'mu_star_conf', 'mu*', 'skyblue'),
+                  ('sigma', None, 'sigma', 'lightgray')]
+          y_title = f'Elementary effect ({target} per input range)'
+
+     fig = go.Figure()
+     for col, conf, name, color in bars:
+          error = {'type': 'data', 'array': df[conf]} if conf is not None else None
+          fig.add_trace(go.Bar(x=df.index, y=df[col], name=name, marker_color=color,
+                               error_y=error))
+
+     # Set options
+     title = 'Global sensitivity (' + target + ')'
+     fig.update_layout(barmode='group', width=750, height=750, title_text=title)
+     fig.update_layout(font={'size':12, 'family':'Arial', 'color':'gray'})
+     fig.update_layout(title={'y':0.9,'x':0.5,'xanchor': 'center','yanchor': 'top'})
+     fig.update_xaxes(title_text=' ', tickangle=90)
+     fig.update_yaxes(title_text=y_title)
+
+     # Add annotations
+     fig.add_annotation(text='Variables ordered in decreasing influence',font={'size':6},
+     xref="paper", yref="paper", x=0.5, y=1.0, showarrow=False)
+
+     fig.show()
+
+# Main loop
+if __name__ == "__main__":
+
+     ### Set the target metric to chart (one of the parametric_gsa.py targets)
+     target = 'EUI_kWh/m2'
+
+     # Ask user for csv file
+     root = tk.Tk()
+     indices_output_name = askopenfilename(title='Choose indices CSV file', filetypes=[("csv file(*.csv)","*.csv")])
+     root.destroy() # Removes Tkinter dialog popup window
+
+     # Load the csv file in to a dataframe and select the target
+     df = pd.read_csv(indices_output_name, index_col='input')
+     df = df[df['target'] == target].drop(columns='target')
+     print(df)
+
+     gsa_bar(df, target)
@@ -23,8 +23,15 @@ and setting 'Heating_kWh/m2' to chart you will get an error 'ValueError: zero-si
 array ...' this is because a regression analysis is not possible and you need to chart
 a dependent output variable, for example 'CE_kgCO2/m2'.
 
+The regressions are solved in one batch with closed-form least squares (batch_regression)
+for every numeric output of every csv, so the other outputs can be looked up in the
+returned table (beta, R2, p-value) without refitting. regression() is the per-csv
+statsmodels fit it replaces; benchmark() times the two.
+
 """
 
+import time
+import tempfile
 import numpy as np
 from scipy import stats
 import pandas as pd
@@ -71,6 +78,136 @@ def sensitivity(df: pd.DataFrame, target):
 
      fig.show()
 
+def regression(csv_list, target):
+     """ Fits y ~ z-scored x for each csv with statsmodels, one fit at a time
+
+     Args:
+          csv_list (list[str]) : sensitivity csv file paths
+          target (str) : output metric
+
+     Returns:
+          results (dict) : analysis name : beta
+     """
+
+     results = {}
+     for csv_file in csv_list:
+          analysis_name = Path(csv_file).stem
+          df = pd.read_csv(csv_file)
+          df = df[[analysis_name, target]]
+          df = df.rename(columns={analysis_name: 'x', target: 'y'})
+          df['xz'] = stats.zscore(df['x'])
+          result = smf.ols('y ~ xz', data=df).fit()
+          results[analysis_name] = result.params['xz']
+     return results
+
+
+def batch_regression(csv_list, targets=None):
+     """ Fits y ~ z-scored x for every (csv, output) pair at once
+         The csvs are stacked into one NaN-padded array (csv x row x output) and the
+         slope, R2 and p-value of each simple regression are computed in closed form
+
+     Args:
+          csv_list (list[str]) : sensitivity csv file paths; the input column of each
+                                 csv is named as the file
+          targets (list[str], optional) : outputs to fit; None = every numeric output
+                                          column of any of the csvs
+
+     Returns:
+          df (pandas df) : analysis, output, beta, r2, p_value, n (one row per pair);
+                           an output is only fitted on the csvs in which it is numeric
+     """
+
+     frames = [pd.read_csv(csv_file) for csv_file in csv_list]
+     names = [Path(csv_file).stem for csv_file in csv_list]
+     numeric = [set(df.select_dtypes(include=[np.number]).columns) for df in frames]
+     if targets is None:
+          targets = []
+          for df in frames:
+               targets += [col for col in df.columns if col not in targets and
+                           col not in names and col != 'run' and any(col in cols for cols in numeric)]
+     partial = [col for col in targets if not all(col in cols for cols in numeric)]
+     if partial:
+          print(f'Outputs missing or not numeric in some csvs (fitted on the others): {partial}')
+
+     rows = max(len(df) for df in frames)
+     x = np.full((len(frames), rows), np.nan)
+     y = np.full((len(frames), rows, len(targets)), np.nan)
+     for i, (df, name) in enumerate(zip(frames, names)):
+          x[i, :len(df)] = df[name].to_numpy(dtype=float)
+          # outputs missing or not numeric in this csv are left as NaN
+          y[i, :len(df)] = df.reindex(columns=targets).apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+
+     # z score of x (population standard deviation, as stats.zscore)
+     xz = (x - np.nanmean(x, axis=1, keepdims=True)) / np.nanstd(x, axis=1, keepdims=True)
+
+     # each output is fitted on the rows where both x and the output are present (as
+     # the missing rows are dropped by statsmodels)
+     mask = ~np.isnan(xz)[:, :, None] & ~np.isnan(y)
+     n = mask.sum(axis=1)
+     xs = np.where(mask, xz[:, :, None], 0.0)
+     ys = np.where(mask, y, 0.0)
+     with np.errstate(divide='ignore', invalid='ignore'):
+          xc = np.where(mask, xs - (xs.sum(axis=1) / n)[:, None, :], 0.0)
+          yc = np.where(mask, ys - (ys.sum(axis=1) / n)[:, None, :], 0.0)
+          sxx = np.sum(xc ** 2, axis=1)
+          sxy = np.sum(xc * yc, axis=1)
+          syy = np.sum(yc ** 2, axis=1)
+          beta = sxy / sxx
+          r2 = sxy ** 2 / (sxx * syy)
+          dof = n - 2
+          t = np.sqrt(r2 * dof / (1 - r2))
+     p_value = 2 * stats.t.sf(t, dof)
+
+     df = pd.DataFrame({'analysis': np.repeat(names, len(targets)),
+                        'output': np.tile(targets, len(names)),
+                        'beta': beta.ravel(),
+                        'r2': r2.ravel(),
+                        'p_value': p_value.ravel(),
+                        'n': n.ravel()})
+     # drop the (csv, output) pairs without the output
+     fitted = (n > 0).ravel()
+     return df[fitted].reset_index(drop=True)
+
+
+def benchmark(csv_count=40, rows=20, outputs=30):
+     """ Times the statsmodels loop (every output) against batch_regression on
+         random csvs
+
+     Args:
+          csv_count (int) : number of sensitivity csvs
+          rows (int) : rows per csv
+          outputs (int) : output columns per csv
+
+     Returns:
+          seconds (dict) : method : seconds
+     """
+
+     rng = np.random.default_rng(0)
+     targets = [f'output_{j}' for j in range(outputs)]
+     with tempfile.TemporaryDirectory() as folder:
+          csv_list = []
+          for i in range(csv_count):
+               x = np.linspace(0, 1, rows)
+               df = pd.DataFrame(rng.normal(0, 1, (rows, outputs)) + x[:, None] * np.arange(outputs),
+                                 columns=targets)
+               df.insert(0, f'input_{i}', x)
+               df.index.name = 'run'
+               csv_list.append(f'{folder}/input_{i}.csv')
+               df.to_csv(csv_list[-1])
+
+          start = time.perf_counter()
+          loop = {target: regression(csv_list, target) for target in targets}
+          seconds = {'statsmodels loop': time.perf_counter() - start}
+          start = time.perf_counter()
+          batch = batch_regression(csv_list)
+          seconds['batch'] = time.perf_counter() - start
+
+     check = batch.set_index(['analysis', 'output'])['beta']
+     error = max(abs(loop[target][name] - check[(name, target)])
+                 for target in targets for name in loop[target])
+     print(f'{csv_count} csvs x {outputs} outputs: {seconds}; max beta difference {error:.2e}')
+     return seconds
+
 # Main loop
 if __name__ == "__main__":
 
@@ -102,44 +239,14 @@ if __name__ == "__main__":
      if len(csv_list) == 0:
           quit()
 
-     # Create an empty df for the regression results
-     results = {}
-     #results = pd.DataFrame(columns=['analysis', 'beta'])
-
-     # Process each csv file
-     for csv_file in csv_list:
-          # Get the name of the sensitivity analysis
-          analysis_name = Path(csv_file).stem
-
-          # Load the csv file in to a dataframe
-          df = pd.read_csv(csv_file)
-          # Reduce the df1 to the required columns
-          df = df[[analysis_name, target]]
-          # Rename the columns to be suitable for statsmodels
-          df.rename(columns={analysis_name: 'x', target: 'y'}, inplace=True)
-
-          # Regression analysis
-          # https://www.analyticsvidhya.com/blog/2021/03/standardized-vs-unstandardized-regression-coefficient/
-          # https://stackoverflow.com/questions/50842397/how-to-get-standardised-beta-coefficients-for-multiple-linear-regression-using
-
-          # Standardize the data using a z score
-          df['xz']= stats.zscore(df['x'])
-          #df_z = df.select_dtypes(include=[np.number]).dropna().apply(stats.zscore)
-
-          # Carry out regression analysis
-          model = smf.ols('y ~ xz', data=df)
-          result = model.fit()
-
-          # Access the results; optionally print all results, get beta value
-          # https://medium.com/swlh/interpreting-linear-regression-through-statsmodels-summary-4796d359035a
-          #print(result.summary())
-          beta = result.params
-
-          # Add beta value to results dict
-          results[analysis_name] = beta[1]
+     # Regression analysis of every output at once
+     # https://www.analyticsvidhya.com/blog/2021/03/standardized-vs-unstandardized-regression-coefficient/
+     results = batch_regression(csv_list)
+     # ... optionally save the table of every (analysis, output) regression
+     #results.to_csv(str(Path(csv_list[0]).parent / 'Influence_regressions.csv'), index=False)
 
-     # Make a df with the results for charting
-     plot_data = pd.DataFrame.from_dict(results, orient='index',columns=['beta'])
+     # Make a df with the target results for charting
+     plot_data = results[results['output'] == target].set_index('analysis')[['beta']]
 
      # Sort the df rows by value; key parameter sorts by absolute value
      plot_data = plot_data.sort_values(by=['beta'], ascending=False, key=abs)
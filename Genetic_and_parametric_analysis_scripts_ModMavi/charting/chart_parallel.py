@@ -35,17 +35,85 @@ Refer to Plotly Parcoords chart help pages for usage, in summary:
   - filter output axes to show runs that meet a desired threshold
   - Once filter bars exist drag the ends of the bar to adjust the range
   - Drag the axis names left or right to rearrange the order of the axes
+
+Large csv files (e.g. tens of thousands of runs from a sweep or GA log) are slow to
+render and to interact with. Set max_rows to draw a sample of the rows instead; the
+sample is stratified by the target metric (so the whole range of outcomes is kept) and
+the best runs (lowest target) are always kept. Set html_path to write a self-contained
+html file instead of opening the chart. Run benchmark() to time the chart at 1k / 10k /
+100k rows.
 """
 
 import math
+import time
+import tempfile
 import pandas as pd
 import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
 import tkinter as tk
+from pathlib import Path
 from tkinter.filedialog import askopenfilename
 
-def para_coord(df, simulations_output_name, cols_delete):
+def sample_rows(df, max_rows, target=None, keep_best=0.05, seed=0):
+     """ Reduces the rows of a large df for charting
+         Without a target a random sample is taken. With a target the best runs (lowest
+         target) are kept and the other rows are sampled one per stratum of the target
+         ranking so that the spread of outcomes is kept
+
+     Args:
+          df (pandas df) : list of scenarios, assignments & results
+          max_rows (int) : maximum number of rows
+          target (str, optional) : output metric to stratify by (lower is better)
+          keep_best (float) : share of max_rows kept for the best runs
+          seed (int) : random seed
+
+     Returns:
+          df (pandas df) : sampled rows in their original order
+     """
+
+     if len(df) <= max_rows:
+          return df
+
+     rng = np.random.default_rng(seed)
+     if target is None:
+          positions = rng.choice(len(df), max_rows, replace=False)
+          return df.iloc[np.sort(positions)]
+
+     # Rank rows by target, best first (NaN last)
+     order = np.argsort(df[target].to_numpy(dtype=float), kind='stable')
+     best = max(1, int(math.ceil(keep_best * max_rows)))
+     rest = order[best:]
+
+     # One random row from each of the equal strata of the remaining ranking
+     strata = max_rows - best
+     picks = np.floor((np.arange(strata) + rng.random(strata)) * len(rest) / strata)
+     positions = np.concatenate([order[:best], rest[picks.astype(int)]])
+     return df.iloc[np.sort(positions)]
+
+
+def tick_values(mins, maxs):
+     """ Creates the axis tick values of the numeric columns
+
+     Args:
+          mins (numpy array) : column minimum values
+          maxs (numpy array) : column maximum values
+
+     Returns:
+          list[numpy array] : tick values of each column
+     """
+
+     starts = np.floor(mins)
+     stops = np.ceil(maxs)
+     # adjust step divisor to change scaling / label divisions
+     steps = np.round((stops - starts) / 50)
+     steps[steps < 1] = 0.5     # try 0.5, 0.25, but not 0.1
+     # np.arange stop value is not included so add step
+     return [np.arange(start, stop + step, step) for start, stop, step in zip(starts, stops, steps)]
+
+
+def para_coord(df, simulations_output_name, cols_delete, max_rows=None, target=None,
+               html_path=None):
      """ Creates a parallel coordinate diagram
          Utilizes the Plotly lib
 
@@ -53,6 +121,14 @@ def para_coord(df, simulations_output_name, cols_delete):
           df (pandas df) : list of scenarios, assignments & results
           simulations_output_name (str) : csv filename
           cols_delete (list) : list of strings (cols to delete)
+          max_rows (int, optional) : sample large dfs down to this number of rows
+          target (str, optional) : output metric to stratify the sample by (lower is
+                                   better); the best runs are always kept
+          html_path (str, optional) : write a self-contained html file instead of
+                                      showing the chart
+
+     Returns:
+          fig (plotly figure) : chart
      """
 
      # Find all columns in cols_delete and remove
@@ -60,56 +136,50 @@ def para_coord(df, simulations_output_name, cols_delete):
 
      # Find columns which with all values = 0 and delete
      null_cols = df.eq(0).all(axis=0)
-     for col, is_zeroes in null_cols.items():
-          if is_zeroes:
-               df.drop([col], axis=1, inplace=True)
+     df.drop(columns=null_cols.index[null_cols], inplace=True)
+
+     # Optionally sample the rows
+     rows = len(df)
+     if max_rows is not None and rows > max_rows:
+          df = sample_rows(df, max_rows, target)
+          print(f'Charting {len(df)} of {rows} rows')
 
      # Take a copy of the df
      df2 = df.copy()
 
      # To plot this type of diagram we must map string columns to a numeric category
-     # Map string columns and delete the source string columns
+     # (in place, so the column order is kept)
+     categories = {}
      for column in df2:
           if pd.api.types.is_string_dtype(df2[column]):
-               # get source column index
-               postion = df2.columns.get_loc(column)
-               temp_name = column + '1'
-               # insert new column after source column (otherwise it is added to the end)
-               df2.insert(postion, temp_name, pd.Categorical(df2[column], ordered=True).codes)
-               # delete old column
-               df2.drop(column, axis=1, inplace=True)
-               # rename new column back to the source column name
-               df2.rename(columns={temp_name:column}, inplace=True)
+               categorical = pd.Categorical(df2[column], ordered=True)
+               categories[column] = categorical.categories.tolist()
+               df2[column] = categorical.codes
 
      # Get a list of columns
      cols2 = list(df2)
 
      # Create the parameters needed for the plot axes in a dict
      # ... {key : [tickvals[], ticktext[], column label, column values]}
+     # Numeric based; min / max of all columns at once
+     numeric = [col for col in cols2 if col not in categories]
+     if not all(pd.api.types.is_numeric_dtype(df2[col]) for col in numeric):
+          print('Error: in plot parameter creation')
+     numeric = [col for col in numeric if pd.api.types.is_numeric_dtype(df2[col])]
+     values = df2[numeric].to_numpy(dtype=float)
+     if max_rows is not None:
+          # halves the size of the chart data
+          values = values.astype(np.float32)
      dim = {}
-     for col in cols2:
-          if pd.api.types.is_numeric_dtype(df[col]):
-               # Numeric based
-               start = math.floor(df2[col].min())
-               stop = math.ceil(df2[col].max())
-               # adjust step divisor to change scaling / label divisions
-               step = round((stop-start)/50)
-               if step < 1:
-                    step = 0.5     # try 0.5, 0.25, but not 0.1
-               # np.arange stop value is not included so add step
-               tickvals = np.arange(start, stop+step, step)
-               ticktext = [str(x) for x in tickvals]
-               # add to dim dict
-               dim[col] = [tickvals, ticktext, col, df2[col]]
-          elif pd.api.types.is_string_dtype(df[col]):
-               # String / category based
-               tickvals = list(range(df2[col].min(), df2[col].max()+1, 1))
-               ticktext = pd.Categorical(df[col], ordered=True).categories.tolist()
-               # add to dim dict
-               dim[col] = [tickvals, ticktext, col, df2[col]]
-          else:
-               print('Error: in plot parameter creation')
-               break
+     if numeric:
+          ticks = tick_values(np.nanmin(values, axis=0), np.nanmax(values, axis=0))
+          for i, col in enumerate(numeric):
+               dim[col] = [ticks[i], ticks[i].astype(str).tolist(), col, values[:, i]]
+     # String / category based
+     for col, ticktext in categories.items():
+          tickvals = list(range(df2[col].min(), df2[col].max()+1, 1))
+          dim[col] = [tickvals, ticktext, col, df2[col].to_numpy()]
+     cols2 = [col for col in cols2 if col in dim]
 
      # Create the parallel coordinate diagram
      # Try other colorscale options: https://plotly.com/python/builtin-colorscales/
@@ -120,7 +190,7 @@ def para_coord(df, simulations_output_name, cols_delete):
 
      parcoords_data = {
           'line': {
-               'color':df['run'],
+               'color':df['run'].to_numpy(),
                'showscale':False,
                'colorscale':px.colors.sequential.Jet,
                'colorbar': {'thickness':20, 'tick0':0 , 'dtick':5, 'title':'Run #'}
@@ -134,11 +204,52 @@ def para_coord(df, simulations_output_name, cols_delete):
      )
      # Set options
      title = f'Parametric simulations ({simulations_output_name})'
+     if len(df) < rows:
+          title += f' - {len(df)} of {rows} runs'
      fig.update_layout(font={'size':8, 'family':'Arial', 'color':'gray'})
      fig.update_layout(title_text=title,
                title={'y':0.98, 'x':0.5, 'xanchor': 'center', 'yanchor': 'top'})
 
-     fig.show()
+     if html_path is not None:
+          # plotly.js is included so the file opens without an internet connection
+          fig.write_html(html_path, include_plotlyjs=True, full_html=True)
+          print(f'Chart saved to {html_path}')
+     else:
+          fig.show()
+     return fig
+
+
+def benchmark(sizes=(1000, 10000, 100000), columns=30, max_rows=5000):
+     """ Times the chart (build and html file) for random data of each size, in full
+         and with sampling
+
+     Args:
+          sizes (tuple[int]) : numbers of rows
+          columns (int) : number of output columns
+          max_rows (int) : sample size for the sampled mode
+
+     Returns:
+          df (pandas df) : rows, mode, seconds and html file size (MB)
+     """
+
+     rng = np.random.default_rng(0)
+     results = []
+     with tempfile.TemporaryDirectory() as folder:
+          for size in sizes:
+               df = pd.DataFrame(rng.normal(100, 20, (size, columns)),
+                                 columns=[f'output_{i}' for i in range(columns)])
+               df.insert(0, 'run', np.arange(size))
+               df.insert(1, 'option', rng.choice(['a', 'b', 'c'], size))
+               for mode, rows in (('full', None), ('sampled', max_rows)):
+                    html_path = f'{folder}/chart_{size}_{mode}.html'
+                    start = time.perf_counter()
+                    para_coord(df.copy(), 'benchmark', [], rows, 'output_0', html_path)
+                    seconds = time.perf_counter() - start
+                    results.append({'rows': size, 'mode': mode, 'seconds': seconds,
+                                    'html_MB': Path(html_path).stat().st_size / 1e6})
+     df = pd.DataFrame(results)
+     print(df)
+     return df
 
 # Main loop
 if __name__ == "__main__":
@@ -170,5 +281,12 @@ if __name__ == "__main__":
                'Wind_PV_kWh/m2'
                ]
 
+     ### Optionally sample large files and / or save to html
+     # e.g. max_rows = 5000 and target = 'EUI_kWh/m2' (lower is better) for sweeps or GA
+     # logs of more than ~10k rows; html_path = simulations_output_name[:-4] + '.html'
+     max_rows = None
+     target = None
+     html_path = None
+
      # Plot parallel coordinates diagram
-     para_coord(df, simulations_output_name, cols_delete)
\ No newline at end of file
+     para_coord(df, simulations_output_name, cols_delete, max_rows, target, html_path)
\ No newline at end of file
@@ -0,0 +1,85 @@
+"""
+=========================================
+Genetic optimization - island
+=========================================
+
+Module description
+------------------
+One island of an island model genetic optimization; requires utils_genetic.py and
+utils_archipelago.py
+
+Run this script from the Python editor of a VE instance that has a project copy open
+(see utils_clone_pool.create_clones) after ga_so.py / ga_mo.py (with island_folders set)
+has written the island settings (GA_island.json) to the copy. The island evolves its own
+population on the copy and exchanges its best individuals with the other islands
+through the archipelago folder of the main project. Results are saved to
+GA_island_output.csv in the copy.
+
+Notes
+-----
+Each island sets every optimization input on its own copy; cumulative inputs (local
+shades) are not supported on copies.
+
+Do not edit the copy model while the island is running.
+
+"""
+
+import json
+import iesve
+import importlib
+import pygmo as pg
+import utils_genetic as gau
+import utils_archipelago as uar
+from pathlib import Path
+
+# Reload utils
+importlib.reload(gau)
+importlib.reload(uar)
+
+# Main loop
+if __name__ == "__main__":
+
+    # Get the current project (a project copy)
+    project = iesve.VEProject.get_current_project()
+
+    with open(Path(project.path, uar.ISLAND_CONFIG), 'r') as f:
+        config = json.load(f)
+    island = config['island']
+    print(f'Island {island} of {config["islands"]}')
+
+    ### Set the optimization problem on the copy
+    udp = gau.ga_function(config['target'],
+                          config['outputs'],
+                          config['boundaries'],
+                          config['mapped_ids'],
+                          config['route'],
+                          config['loads_on'],
+                          config['model_index'],
+                          'GA_island_output.csv',
+                          resolution=config['resolution'],
+                          cache_file=config['cache_file'],
+                          generation_size=config['pop_size'],
+                          constraints=config['constraints'],
+                          constraint_mode=config['constraint_mode'],
+                          penalty=config['penalty'])
+    prob = pg.problem(udp)
+    if config['constraint_mode'] == 'pygmo':
+        prob.c_tol = udp.c_tol()
+
+    ### Set the algorithm of the main script with the island seed
+    algo = uar.load_algorithm(config['archipelago_folder'], config['seed'])
+
+    ### Set population; each island starts from different random individuals
+    pop = gau.unique_population(prob, config['pop_size'], seed=config['seed'])
+
+    ### Evolve with periodic migration
+    received = {}
+    for generation in range(1, config['generations'] + 1):
+        pop = algo.evolve(pop)
+        best = uar.best_indices(pop.get_f(), 1, udp.get_nobj(), udp.get_nec(), udp.c_tol())[0]
+        print(f'Island {island} generation {generation}: best {pop.get_f()[best]}')
+        if generation % config['migration_interval'] == 0:
+            pop = uar.migrate(config, generation, pop, udp, received)
+
+    uar.write_final(config, pop)
+    print(f'Island {island} finished')
@@ -11,9 +11,11 @@ For an introduction on genetic optimization see:
 https://stackoverflow.com/questions/69544221/how-can-i-find-the-optimal-parameters-for-a-function
 
 This script uses Pygmo 2; refer to https://esa.github.io/pygmo2/tutorials/tutorials.html
-In this script we define a continuous, single objective, unconstrained problem. Pygmo 2
-assumes a minimise function by default. We will use evolve() but not the archipelago()
-class as this implements multiple threads (https://esa.github.io/pygmo/quickstart.html).
+In this script we define a mixed-integer (mapped id inputs are integer dimensions),
+single objective, unconstrained problem. Pygmo 2 assumes a minimise function by default. We
+will use evolve() but not the archipelago() class as this implements multiple threads
+(https://esa.github.io/pygmo/quickstart.html). An island model can instead be run on
+project copies, each island in its own VE instance (see utils_archipelago.py).
 
 This script operates on the current model. Very large numbers of simulations can be
 generated. Plan each analysis; consider a series of parametric studies to review
@@ -39,8 +41,10 @@ chromosone values and target metric; this ensures that the results are safe shou
 simulation error occur or the user chooses to interrupt (stop) the script early. The
 Python editor output pane shows progress; you can also copy the csv file and open it at
 any time during the sim to look the data to date, but do not open the live file as this
-will lock-out access by the script. The csv can be viewed & processed in Excel e.g.
-using sort and also charted on a parallel coordinate chart using chart_parallel.py
+will lock-out access by the script. To follow a long run use charting/chart_dashboard.py
+which reads the run journal (csv name with a .jsonl suffix) without touching the csv.
+The csv can be viewed & processed in Excel e.g. using sort and also charted on a
+parallel coordinate chart using chart_parallel.py
 
 Notes
 -----
@@ -73,7 +77,15 @@ In the script main_loop:
 - Set the simulation route
 - Set if you want load sizing sims and makes sure boundaries['asp_file'] is set
 - Set the model to edit (normally the real model)
-- Set the algorithm parameters e.g. # of generations (gen)
+- Set the fitness cache file and optional resolution of numeric inputs
+- Optionally set project copies to evaluate each generation in parallel (ga_worker.py)
+- Optionally set project copies to run as islands of an island model (ga_island.py)
+- Optionally set result tables from earlier studies to warm-start the population
+- Optionally set surrogate-assisted mode and its simulation budget
+- Optionally set a fidelity ladder to screen candidates with cheap sim options first
+- Optionally set constraints on outputs (after simulation) and inputs (before)
+- Set the run controller: maximum generations, stall criterion and budgets
+- Set the algorithm parameters
 - Set the required population
 - Set what you want to plot on the generation chart (this shows after the optimization)
 
@@ -84,6 +96,7 @@ optimal; however this still may offer value. As noted above this is a very good
 to consider a series of parametric analyses, coarse optimization etc.
 
 The script will delete each aps/asp file after each iteration.
+The script will re-use results from GA_fitness_cache.json for repeat input sets.
 The script will archive the model before making any changes.
 
 The GA_output.csv will be overwritten before a new optimization task so move/rename the
@@ -97,12 +110,24 @@ import importlib
 import pygmo as pg
 import pandas as pd
 import utils_genetic as gau
+import utils_clone_pool as ucp
+import utils_archipelago as uar
+import utils_warm_start as uws
+import utils_surrogate as usu
+import utils_fidelity as ufi
+import utils_run_control as urc
 from datetime import datetime
 import plotly.express as px
 from pathlib import Path
 
 # Reload utils
 importlib.reload(gau)
+importlib.reload(ucp)
+importlib.reload(uar)
+importlib.reload(uws)
+importlib.reload(usu)
+importlib.reload(ufi)
+importlib.reload(urc)
 
 # Main loop
 if __name__ == "__main__":
@@ -134,6 +159,9 @@ if __name__ == "__main__":
     # 'Ta_max_degC',
     # 'Boiler_max_kW',
     # 'Chiller_max_kW'
+    # 'TM52_fail_rooms',    (CIBSE TM52, see overheating_engine.py)
+    # 'TM52_fail_%',
+    # 'TM59_fail_rooms'    (rooms of a TM59 room grouping scheme, see utils_model_mod.tm59_rooms)
     target = ['CE_kgCO2/m2']
 
     ### Define the output metrics; this should include the target
@@ -153,6 +181,9 @@ if __name__ == "__main__":
     # 'Ta_max_degC',
     # 'Boiler_max_kW',
     # 'Chiller_max_kW'
+    # 'TM52_fail_rooms',    (CIBSE TM52, see overheating_engine.py)
+    # 'TM52_fail_%',
+    # 'TM59_fail_rooms'    (rooms of a TM59 room grouping scheme, see utils_model_mod.tm59_rooms)
 
     # Energy end use breakdown entries:
     #'Interior_lighting_kWh/m2',
@@ -272,6 +303,113 @@ if __name__ == "__main__":
     #   data is updated following edits in accordance with relevant compliance rules
     model_index = 0
 
+    ### Set the fitness cache
+    # Repeat evaluations of the same effective inputs (mapped ids rounded, numeric inputs
+    # quantised to the resolution step) are returned from the cache without simulating.
+    # The cache file persists between sessions and is shared by ga_so.py & ga_mo.py;
+    # delete it if the base model or sim options change. Set cache_file = None to disable
+    resolution = {}
+    #resolution['building_orientation'] = 5.0
+    #resolution['wall_const_u_value'] = 0.01
+    cache_file = 'GA_fitness_cache.json'
+
+    ### Set population size (also used to log the cache hit rate per generation)
+    pop_size = 20
+
+    ### Optionally evaluate each generation in parallel on project copies
+    # Create the copies once (they are re-used), open each in its own VE instance and
+    # run ga_worker.py in it. Leave the list empty to simulate on the current project
+    clone_folders = []
+    #clone_folders = ucp.create_clones(project_folder, 4)
+
+    ### Optionally run an island model on project copies
+    # Each island evolves its own population on its own project copy; after this script
+    # has written the island settings open each copy in its own VE instance and run
+    # ga_island.py in it. Every migration_interval generations each island sends its
+    # best individuals (migrants) to the next island. This script waits for the islands
+    # and merges their results. Do not use the same copies for clone_folders. Leave the
+    # list empty for a single population
+    island_folders = []
+    #island_folders = ucp.create_clones(project_folder, 4)
+    migration_interval = 2
+    migrants = 1
+
+    ### Optionally warm-start the population from earlier result tables
+    # Rows need every input column and the target(s) and are added without simulating,
+    # so only use tables from studies with the same model & sim options. Leave the list
+    # empty for a random population
+    seed_tables = []
+    #seed_tables = uws.find_result_tables(project_folder)
+    #seed_tables = [project_folder + 'Para_sim_table.csv', project_folder + 'GA_SO_output.csv']
+    seed_fraction = 0.5     # maximum share of the population taken from the tables
+
+    ### Optionally use surrogate-assisted mode instead of a full evolution
+    # After the population is simulated each iteration fits a surrogate to all results,
+    # runs the algorithm against it and simulates only the batch of candidates with the
+    # highest expected improvement; the run stops at max_simulations (incl. population)
+    surrogate = False
+    surrogate_iterations = 20
+    surrogate_batch = 4
+    max_simulations = 100
+
+    ### Optionally screen candidates with cheap simulation options (fidelity ladder)
+    # Each candidate is simulated at each level in turn (cheapest first) and is only
+    # simulated at full fidelity (the Apachesim dialog options) if its target is within
+    # fidelity_margin of the best at the level below. Level costs and rank correlations
+    # with full fidelity are logged each generation. Leave the list empty to simulate
+    # every candidate at full fidelity
+    fidelity_levels = []
+    #fidelity_levels.append({'name': 'coarse',
+    #                         'options': {'simulation_timestep': 4,   # 30 minutes
+    #                                     'reporting_interval': 3,    # 60 minutes
+    #                                     'suncast': False,
+    #                                     'radiance': False},
+    #                         'loads_on': False})
+    fidelity_margin = 0.05
+    ladder = None
+    if fidelity_levels:
+        ladder = ufi.fidelity_ladder(fidelity_levels, fidelity_margin,
+                                     log_path=project_folder + 'GA_SO_fidelity_log.csv')
+
+    ### Optionally set constraints
+    # Output constraints are tested after each simulation e.g. an overheating limit; a
+    # min constraint on a target also rejects failed simulations that return zeros.
+    # Input constraints are tested before simulating and failing input sets are given
+    # the penalty without a simulation; a function of the inputs dict returns the
+    # violation (<= 0 is feasible). 'penalty' mode folds violations into the target(s)
+    # and works with any algorithm (pso_gen); 'pygmo' mode returns them as Pygmo
+    # constraints for algorithms that handle them (e.g. gaco)
+    constraints = []
+    #constraints.append({'output': 'Ta_max_degC', 'max': 28.0})
+    #constraints.append({'output': 'EUI_kWh/m2', 'min': 1.0})
+    #constraints.append({'input': lambda data: data['ext_wall_glazing'] - 40.0
+    #                    if data['window_const_u_value'] > 1.4 else 0.0,
+    #                    'name': 'glazing_with_poor_windows'})
+    # ... U values the active constructions cannot reach
+    constraints += gau.u_value_constraints(project.models[model_index], boundaries)
+    constraint_mode = 'penalty'
+
+    ### Set the run controller
+    # The population is evolved one generation at a time; the run stops at the maximum
+    # generations or earlier when the champion fitness has improved by less than
+    # stall_tolerance (relative) over stall_generations, the population diversity falls
+    # below min_diversity or the next generation would overrun the time (seconds) or
+    # simulation budget. Set a limit to None to switch it off. Each generation is logged
+    # to GA_SO_log.csv
+    generations = 20
+    stall_generations = 5
+    stall_tolerance = 0.001
+    min_diversity = None
+    max_seconds = None              # e.g. 12 * 3600
+    simulation_budget = None        # e.g. 500 (incl. the initial population)
+    controller = urc.run_controller(generations,
+                                    stall_generations,
+                                    stall_tolerance,
+                                    min_diversity,
+                                    max_seconds,
+                                    simulation_budget,
+                                    log_path=project_folder + 'GA_SO_log.csv')
+
     ### Set the optimization problem
     prob = pg.problem(gau.ga_function(  target,
                                         outputs,
@@ -280,21 +418,44 @@ if __name__ == "__main__":
                                         route,
                                         loads_on,
                                         model_index,
-                                        'GA_SO_output.csv'))
+                                        'GA_SO_output.csv',
+                                        resolution=resolution,
+                                        cache_file=cache_file,
+                                        generation_size=pop_size,
+                                        ladder=ladder,
+                                        constraints=constraints,
+                                        constraint_mode=constraint_mode))
+    if constraint_mode == 'pygmo':
+        prob.c_tol = prob.extract(gau.ga_function).c_tol()
     #print(prob)
 
     ### Set the algorithm
     # https://esa.github.io/pygmo2/algorithms.html
     # Single https://esa.github.io/pygmo2/algorithms.html?highlight=pso_gen#pygmo.pso_gen
-    algo = pg.algorithm(pg.pso_gen( gen=20,
-                                    omega=0.7298,
-                                    eta1=2.05,
-                                    eta2=2.05,
-                                    max_vel=0.5,
-                                    variant=5,
-                                    neighb_type=2,
-                                    neighb_param=4,
-                                    memory=False))
+    # One generation per evolve call; the number of generations is set by the run
+    # controller (memory=True keeps the particle velocities between calls)
+    uda = pg.pso_gen(   gen=1,
+                        omega=0.7298,
+                        eta1=2.05,
+                        eta2=2.05,
+                        max_vel=0.5,
+                        variant=5,
+                        neighb_type=2,
+                        neighb_param=4,
+                        memory=True)
+    # pso_gen treats the mapped id (integer) inputs as continuous and rounds them; for
+    # mostly mapped id inputs use an integer-aware algorithm e.g. gaco (ker <= pop_size)
+    #uda = pg.gaco(gen=1, ker=pop_size, memory=True)
+
+    # Batch fitness evaluator for the project copies; the algorithm must support bfe
+    # e.g. pso_gen, nsga2, gaco
+    bfe = None
+    clone_pool = None
+    if clone_folders:
+        clone_pool = ucp.project_clone_pool(clone_folders)
+        bfe = pg.bfe(gau.clone_pool_bfe(clone_pool))
+        uda.set_bfe(bfe)
+    algo = pg.algorithm(uda)
 
     # Set the verbosity (i.e. each 1 gen there will be a log line)
     # https://esa.github.io/pygmo2/algorithm.html?highlight=verbosity#pygmo.algorithm.set_verbosity
@@ -302,26 +463,50 @@ if __name__ == "__main__":
 
     ### Set population
     # https://esa.github.io/pygmo2/population.html?highlight=population#pygmo.population
-    pop = pg.population(prob, 20)
+    if island_folders:
+        # each island creates its own population
+        pass
+    elif seed_tables:
+        pop = uws.seeded_population(prob, pop_size, seed_tables, seed_fraction, b=bfe)
+    else:
+        # random individuals; duplicate models are rejected before simulation
+        pop = gau.unique_population(prob, pop_size, b=bfe)
 
     ### Perform an evolution
     # https://esa.github.io/pygmo2/tutorials/evolving_a_population.html?highlight=evolve
-    pop = algo.evolve(pop)
+    if island_folders:
+        folder = uar.setup_islands(prob.extract(gau.ga_function), algo, island_folders,
+                                   project_folder, pop_size, generations,
+                                   migration_interval, migrants, cache_file=cache_file)
+        print('Run ga_island.py in the VE instance of each project copy ...')
+        finished = uar.wait_for_islands(folder, len(island_folders))
+        champion_x, champion_f = [v[0] for v in uar.merge_islands(folder, finished, 1,
+                                                                 prob.get_nec(), prob.c_tol)]
+    elif surrogate:
+        # the surrogate is searched with the default pso_gen (uda is one generation)
+        xs, fs, simulations = usu.surrogate_optimise(prob, pop, surrogate_iterations,
+                                                     surrogate_batch,
+                                                     clone_pool=clone_pool,
+                                                     max_simulations=max_simulations)
+        best = fs[:, 0].argmin()
+        champion_f, champion_x = fs[best], xs[best]
+        print(f'Surrogate mode used {simulations} simulations')
+    else:
+        pop = controller.evolve(algo, pop)
+        champion_f, champion_x = pop.champion_f, pop.champion_x
+
+    # Stop the project copy workers
+    if clone_folders:
+        clone_pool.shutdown()
 
     ### Print the optimum result
-    print(f'Optimum fitness vector for {target} target is {pop.champion_f}')
-    print(f'Optimum decision vector for {target} target is {pop.champion_x}')
-
-    """### Optionally plot the optimization generations
-    uda = algo.extract(pg.pso_gen)
-    log = uda.get_log()
-    generation = [entry[0] for entry in log]
-    value = [entry[2] for entry in log]
-    data = list(zip(generation, value))
-    df = pd.DataFrame(data, columns = ['Generation','CE_kgCO2/m2'])
-    log_path = project_folder + 'GA_SO_log.csv'
-    df.to_csv(log_path)
-    fig = px.scatter(df, x='Generation', y=target[0], log_x=True, log_y=False,
-    trendline='ols')
+    print(f'Optimum fitness vector for {target} target is {champion_f}')
+    print(f'Optimum decision vector for {target} target is {champion_x}')
+    print(f'Optimum inputs are {prob.extract(gau.ga_function).decode(champion_x)}')
+
+    """### Optionally plot the optimization generations from the run controller log
+    df = pd.read_csv(project_folder + 'GA_SO_log.csv')
+    fig = px.scatter(df, x='generation', y=target[0], log_x=False, log_y=False,
+    hover_data=['simulations', 'diversity'])
     fig.update_traces(marker_size=20)
-    fig.show()"""
\ No newline at end of file
+    fig.show()"""
@@ -0,0 +1,109 @@
+"""
+=========================================
+Genetic optimization - project copy worker
+=========================================
+
+Module description
+------------------
+Simulation worker for batch genetic optimization; requires utils_genetic.py and
+utils_clone_pool.py
+
+Run this script from the Python editor of a VE instance that has a project copy open
+(see utils_clone_pool.create_clones). The script polls the GA_queue folder of the
+project for jobs written by the optimization script (ga_so.py / ga_mo.py with
+clone_folders set), applies each chromosone set to the model, simulates it and writes
+the outputs back to the queue folder. The script runs until the optimization script
+finishes (it writes a stop file to the queue folder) or the user stops it.
+
+Notes
+-----
+Each job carries all of the optimization inputs, so the copy model is fully set by each
+job; cumulative inputs (local shades) are not supported on copies.
+
+Do not edit the copy model while the worker is running.
+
+"""
+
+import os
+import json
+import time
+import iesve
+import importlib
+import traceback
+import numpy as np
+import utils_genetic as gau
+import utils_clone_pool as ucp
+from pathlib import Path
+
+# Reload utils
+importlib.reload(gau)
+importlib.reload(ucp)
+
+# Main loop
+if __name__ == "__main__":
+
+    # Get the current project (a project copy)
+    project = iesve.VEProject.get_current_project()
+    queue_folder = Path(project.path, ucp.QUEUE_FOLDER)
+    queue_folder.mkdir(exist_ok=True)
+    stop_path = Path(queue_folder, ucp.STOP_FILE)
+
+    ### Seconds between checks for new jobs
+    poll_interval = 2
+
+    # Problems built so far (settings : ga_function); the problem is built once for
+    # each optimization run rather than for every job
+    problems = {}
+
+    print(f'Worker waiting for jobs in {queue_folder} ...')
+
+    while not stop_path.exists():
+        jobs = sorted(path for path in queue_folder.glob('job_*.json')
+                      if not path.name.endswith('.result.json'))
+        if not jobs:
+            time.sleep(poll_interval)
+            continue
+
+        job_path = jobs[0]
+        print(f'\nProcessing {job_path.name} ...')
+        try:
+            with open(job_path, 'r') as f:
+                job = json.load(f)
+        except ValueError:
+            # still being written
+            time.sleep(poll_interval)
+            continue
+
+        config = job['config']
+        result = {'output': None}
+        try:
+            # The worker has no csv dump or cache of its own; the optimization script
+            # records the results it gathers
+            key = json.dumps({k: v for k, v in config.items() if k != 'level'}, sort_keys=True)
+            if key not in problems:
+                problems[key] = gau.ga_function(config['target'],
+                                                config['outputs'],
+                                                config['boundaries'],
+                                                config['mapped_ids'],
+                                                config['route'],
+                                                config['loads_on'],
+                                                config['model_index'],
+                                                'GA_worker_output.csv')
+            udp = problems[key]
+            # a fidelity level (cheap sim options) is set for screening jobs
+            result['output'] = udp.run_model(np.array(job['x']), config.get('level'))
+        except Exception as e:
+            traceback.print_exc()
+            result['error'] = str(e)
+
+        # The optimization script deletes the job if it timed out; the result is then
+        # not wanted (the script also deletes late results)
+        if job_path.exists():
+            ucp.write_json(ucp.result_path(job_path), result)
+        try:
+            os.remove(job_path)
+        except FileNotFoundError:
+            pass
+
+    os.remove(stop_path)
+    print('Worker stopped')
@@ -0,0 +1,245 @@
+"""
+=========================================
+Global sensitivity analysis simulations
+=========================================
+
+Module description
+------------------
+Global sensitivity analysis tool; requires utils_gsa.py and utils_parametric.py
+
+This script operates on the current model. Unlike parametric_sensitivity.py (one
+simulation series per input, one input changed at a time) every input is varied at once
+in a sampling design, so all inputs are ranked from one set of simulations and
+interactions between inputs are included. Two methods are available:
+
+- 'morris' : elementary effects screening; trajectories * (inputs + 1) simulations give
+  mu* (overall influence; used for ranking) and sigma (non-linearity / interactions).
+  Use it first to screen many inputs.
+- 'sobol' : variance-based; base_samples * (inputs + 2) simulations give the first-order
+  (S1) and total (ST) Sobol indices i.e. the share of the output variance due to an
+  input alone and including its interactions. Use it on the few inputs that matter.
+
+Both methods give bootstrap confidence intervals. The inputs are defined as ranges like
+ga_so.py (mapped id inputs as index ranges with their ids). The script outputs a csv of
+the scenarios and results (GSA_<method>_sim_table.csv) and a csv of the indices of each
+target (GSA_<method>_indices.csv) to chart with chart_gsa.py.
+
+Notes
+-----
+Metric units only
+
+See parametric_uncertainty.py for the model set-up and simulation options. Cumulative
+inputs (local shades) cannot be used as each scenario sets every input.
+
+In the main loop section:
+- Define the output metrics required and the targets to analyse
+- Define the input ranges; comment-out input lines to be excluded
+- Set the method and design size
+- Set the simulation route
+- Set if you want room & system sizing runs
+- Set the model to edit (normally the real model)
+- Remember to set the options on the Apachesim dialog!
+
+The script will archive the model before making any changes.
+
+"""
+
+import iesve
+import importlib
+import utils_gsa as utils_gsa
+from datetime import datetime
+from pathlib import Path
+
+# Reload utils to pick up any edits in the current session
+importlib.reload(utils_gsa)
+
+# Main loop
+if __name__ == "__main__":
+
+    # Get the current project
+    project = iesve.VEProject.get_current_project()
+
+    # Archive the project before we run parametric changes to the model
+    print('Archiving project ...')
+    project_folder = project.path
+    time_stamp = datetime.now().strftime("%d%m%Y_%H%M%S")
+    path = Path(project_folder, 'Backups', f'{project.name}_{time_stamp}.zip')
+    project.archive_project(str(path), False)
+    print('Project archived to project backups folder')
+
+    ### Define the output metrics; this should include the target
+    # For df column names use snake_case. Spaces are not permitted, example coded list
+    # Summary entries:
+    # 'Gas_MWh',
+    # 'Elec_MWh',
+    # 'Gas_kWh/m2',
+    # 'Elec_kWh/m2'
+    # 'Boilers_MWh',
+    # 'Chillers_MWh',
+    # 'Boilers_kWh/m2',
+    # 'Chillers_kWh/m2'
+    # 'CE_kgCO2/m2',
+    # 'UK_BER_kgCO2/m2',
+    # 'EUI_kWh/m2'
+    # 'Ta_max_degC',
+    # 'Boiler_max_kW',
+    # 'Chiller_max_kW'
+    # 'TM52_fail_rooms',    (CIBSE TM52, see overheating_engine.py)
+    # 'TM52_fail_%',
+    # 'TM59_fail_rooms'    (rooms of a TM59 room grouping scheme, see utils_model_mod.tm59_rooms)
+
+    # Energy end use breakdown entries:
+    #'Interior_lighting_kWh/m2',
+    #'Exterior_lighting_kWh/m2',
+    #'Space_heating_(gas)_kWh/m2',
+    #'Space_heating_(elec)_kWh/m2',
+    #'Space_cooling_kWh/m2',
+    #'Pumps_kWh/m2',
+    #'Fans_interior_kWh/m2',
+    #'DHW_heating_kWh/m2',
+    #'Receptacle_equipment_kWh/m2',
+    #'Elevators_escalators_kWh/m2',
+    #'Data_center_equipment_kWh/m2',
+    #'Cooking_(gas)_kWh/m2',
+    #'Cooking_(elec)_kWh/m2',
+    #'Refrigeration_kWh/m2',
+    #'Wind_PV_kWh/m2'
+
+    outputs = [
+                'Gas_MWh',
+                'Elec_MWh',
+                'Gas_kWh/m2',
+                'Elec_kWh/m2',
+                'Boilers_MWh',
+                'Chillers_MWh',
+                'Boilers_kWh/m2',
+                'Chillers_kWh/m2',
+                'CE_kgCO2/m2',
+                'UK_BER_kgCO2/m2',
+                'EUI_kWh/m2',
+                'Ta_max_degC',
+                'Boiler_max_kW',
+                'Chiller_max_kW',
+
+                'Interior_lighting_kWh/m2',
+                'Exterior_lighting_kWh/m2',
+                'Space_heating_(gas)_kWh/m2',
+                'Space_heating_(elec)_kWh/m2',
+                'Space_cooling_kWh/m2',
+                'Pumps_kWh/m2',
+                'Fans_interior_kWh/m2',
+                'DHW_heating_kWh/m2',
+                'Receptacle_equipment_kWh/m2',
+                'Elevators_escalators_kWh/m2',
+                'Data_center_equipment_kWh/m2',
+                'Cooking_(gas)_kWh/m2',
+                'Cooking_(elec)_kWh/m2',
+                'Refrigeration_kWh/m2',
+                'Wind_PV_kWh/m2'
+                ]
+
+
+    ### Define the targets to analyse (from the outputs)
+    targets = ['EUI_kWh/m2', 'Ta_max_degC']
+
+    ### Define the input ranges in a dict
+    # Example coded dict entries [lower, upper]; comment-out inputs not required:
+    boundaries = {}
+
+    # ... numeric inputs
+    boundaries['building_orientation'] = [90.0, 180.0]
+    #boundaries['room_heating_setpoint'] = [19.0, 22.0]
+    #boundaries['room_cooling_setpoint'] = [25.0, 28.0]
+    #boundaries['apsys_scop'] = [0.7, 0.9]
+    #boundaries['apsys_sseer'] = [2.0, 3.0]
+    #boundaries['sys_free_cooling'] = [4.0, 5.0]
+    #boundaries['ncm_terminal_sfp'] = [0.1, 0.5]            # NCM only
+    #boundaries['ncm_localexhaust_sfp'] = [0.1, 0.5]        # NCM only
+    #boundaries['ncm_light_pho_parasit'] = [0.01, 0.05]     # NCM only
+    #boundaries['ncm_light_occ_parasit'] = [0.01, 0.05]     # NCM only
+    #boundaries['window_openable_area'] = [25.0, 30.0]
+    #boundaries['ext_wall_glazing'] = [5.0, 50.0]
+    #boundaries['wall_const_u_value'] = [0.1, 0.3]
+    #boundaries['window_const_u_value'] = [1.0, 1.5]
+    #boundaries['roof_const_u_value'] = [0.1, 0.3]
+    #boundaries['floor_const_u_value'] = [0.1, 0.3]
+    #boundaries['outer_pane_transmittance'] = [0.2, 0.5]
+    #boundaries['outer_pane_reflectance'] = [0.6, 0.8]
+    #boundaries['pv_area'] = [10.0, 50.0]
+
+    # ... string id by integer index (maps to id, name or filename)
+    boundaries['weather_file'] = [0, 2]          # ['LondonDSY2020H.fwt', 'LondonDSY2050H.fwt', 'LondonDSY2080H.fwt']  
+    #boundaries['ap_system'] = [0, 2]            # ['SYST0001', 'SYST0002', 'SYST0003']
+    #boundaries['infiltration_rate'] = [0, 1]    # ['Infiltration 0.5', 'Infiltration 0.75']
+    #boundaries['gen_lighting_gain'] = [0, 1]    # ['General Lighting 5','General Lighting 10']
+    #boundaries['computer_gain'] = [0, 1]        # ['Computers 3','Computers 5']
+    #boundaries['wall_construction'] = [0, 1]    # ['AGWAL213','AGWAL214']
+    #boundaries['window_construction'] = [0, 1]  # ['APGEXTW4','APGEXTW']
+    #boundaries['roof_construction'] = [0, 1]    # ['APGROOF1', 'APGROOF4']
+    #boundaries['floor_construction'] = [0, 1]   # ['APGFLO12', 'AGSOG111']
+    #boundaries['asp_file'] = [0, 2]             # ['CAV.asp', 'VAV.asp', 'UFAD.asp']
+
+    ### For string/id based boundaries define the mappings between index and ids
+    mapped_ids = {}
+    # Example coded list entries; comment-out inputs not required:
+    mapped_ids['weather_file'] = ['LondonDSY2020H.fwt', 'LondonDSY2050H.fwt', 'LondonDSY2080H.fwt']     
+    #mapped_ids['ap_system'] = ['New System 1', 'New System 2', 'New System 3'],
+    #mapped_ids['infiltration_rate'] = ['Infiltration 0.5', 'Infiltration 0.75'],
+    #mapped_ids['gen_lighting_gain'] = ['General Lighting 5','General Lighting 10'],
+    #mapped_ids['computer_gain'] = ['Computers 3','Computers 5'],
+    #mapped_ids['wall_construction'] = ['AGWAL213','AGWAL214'],
+    #mapped_ids['window_construction'] = ['APGEXTW4','APGEXTW'] ,
+    #mapped_ids['roof_construction'] = ['APGROOF1', 'APGROOF4'],
+    #mapped_ids['floor_construction'] = ['APGFLO12', 'AGSOG111'],
+    #mapped_ids['asp_file'] = ['CAV.asp', 'VAV.asp', 'UFAD.asp']
+
+    ### Set the method and design size
+    # 'morris' : trajectories * (inputs + 1) simulations; levels is the grid size (even)
+    # 'sobol' : base_samples * (inputs + 2) simulations; use a power of 2
+    method = 'morris'
+    trajectories = 10
+    levels = 4
+    base_samples = 64
+    bootstrap = 500
+    confidence = 0.95
+    seed = 0
+
+    ### Define the simulation route
+    #   0 is run_simulation() i.e. Apache
+    #   1 is run_compliance_simulation () i.e. UK Part L
+    route = 0
+
+    ### Define loads sims (asp_file must be defined)
+    # True for ON, False for off. Set to False for UK Compliance
+    loads_on = False
+
+    ### Set the model to edit
+    #   The Real model is index 0 in the project.models list
+    #   The Real, Actual & Proposed models are the same model; actual/proposed room model
+    #   data is updated following edits in accordance with relevant compliance rules
+    model_index = 0
+
+    # Create the design
+    names = list(boundaries.keys())
+    if method == 'sobol':
+        unit = utils_gsa.saltelli_design(len(names), base_samples, seed)
+    else:
+        unit = utils_gsa.morris_design(len(names), trajectories, levels, seed)
+    design_df = utils_gsa.scale(unit, boundaries, mapped_ids)
+
+    # Run the simulations
+    simulations_output_name = project_folder + f'GSA_{method}_sim_table.csv'
+    results_df = utils_gsa.simulate_design(project,
+                                           model_index,
+                                           route,
+                                           loads_on,
+                                           design_df,
+                                           simulations_output_name,
+                                           outputs)
+
+    # Compute and save the indices
+    indices_df = utils_gsa.indices(method, unit, results_df, targets, names, bootstrap, confidence)
+    indices_output_name = project_folder + f'GSA_{method}_indices.csv'
+    indices_df.to_csv(indices_output_name, index=True)
+    print(indices_df)
+    print(f'Indices saved to {indices_output_name}')
@@ -125,6 +125,9 @@ if __name__ == "__main__":
     # 'Ta_max_degC',
     # 'Boiler_max_kW',
     # 'Chiller_max_kW'
+    # 'TM52_fail_rooms',    (CIBSE TM52, see overheating_engine.py)
+    # 'TM52_fail_%',
+    # 'TM59_fail_rooms'    (rooms of a TM59 room grouping scheme, see utils_model_mod.tm59_rooms)
 
     # Energy end use breakdown entries:
     #'Interior_lighting_kWh/m2',
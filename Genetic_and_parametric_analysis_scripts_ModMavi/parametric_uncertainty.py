@@ -25,7 +25,8 @@ The script can be used for compliance actual/proposed etc models.
 
 The script outputs a csv file containing the scenario run #, model changes and multiple
 output metrics; this is saved after each iteration so that the results are safe should
-a simulation error occur. The csv can be viewed & processed in Excel e.g. using sort.
+a simulation error occur; follow progress with charting/chart_dashboard.py (do not open
+the live csv). The csv can be viewed & processed in Excel e.g. using sort.
 The csv can be edited e.g. deleting the control row or output metric columns that are
 not wanted then parallel coordinate charted using parallel_chart.py,
 TM_54_uncertainty_chart.py and TM_54_range_of_outcomes_chart.py.
@@ -58,6 +59,8 @@ In the main loop section:
 - Set the simulation route
 - Set if you want room & system sizing runs
 - Set the model to edit (normally the real model)
+- Optionally set a fidelity ladder so that only promising scenarios are simulated at
+  full fidelity (see utils_fidelity.py)
 - Remember to set the options on the Apachesim dialog!
 
 Decide if you do not want to delete each aps/asp file after each iteration; comment-out.
@@ -72,11 +75,13 @@ The script will archive the model before making any changes.
 import iesve
 import importlib
 import utils_parametric as utils_parametric
+import utils_fidelity as utils_fidelity
 from datetime import datetime
 from pathlib import Path
 
 # Reload pu to pick up any edits in the current session
 importlib.reload(utils_parametric)
+importlib.reload(utils_fidelity)
 
 # Main loop
 if __name__ == "__main__":
@@ -109,6 +114,9 @@ if __name__ == "__main__":
     # 'Ta_max_degC',
     # 'Boiler_max_kW',
     # 'Chiller_max_kW'
+    # 'TM52_fail_rooms',    (CIBSE TM52, see overheating_engine.py)
+    # 'TM52_fail_%',
+    # 'TM59_fail_rooms'    (rooms of a TM59 room grouping scheme, see utils_model_mod.tm59_rooms)
 
     # Energy end use breakdown entries:
     #'Interior_lighting_kWh/m2',
@@ -214,6 +222,21 @@ if __name__ == "__main__":
     #   data is updated following edits in accordance with relevant compliance rules
     model_index = 0
 
+    ### Optionally screen scenarios with cheap simulation options (fidelity ladder)
+    # All scenarios are simulated at the first level; only those within fidelity_margin
+    # of the best fidelity_target are simulated at the next level and finally at full
+    # fidelity (the Apachesim dialog options). Leave the list empty to simulate every
+    # scenario at full fidelity
+    fidelity_levels = []
+    #fidelity_levels.append({'name': 'coarse',
+    #                        'options': {'simulation_timestep': 4,    # 30 minutes
+    #                                    'reporting_interval': 3,     # 60 minutes
+    #                                    'suncast': False,
+    #                                    'radiance': False},
+    #                        'loads_on': False})
+    fidelity_target = 'CE_kgCO2/m2'
+    fidelity_margin = 0.05
+
     # Create dataframe of scenarios
     scenarios_df = utils_parametric.scenarios(inputs)
     # ... optionally export the scenarios
@@ -222,10 +245,22 @@ if __name__ == "__main__":
 
     # Run parametric simulations
     simulations_output_name = project_folder + 'Para_sim_table.csv'
-    utils_parametric.simulations( project,
+    if fidelity_levels:
+        utils_fidelity.ladder_sweep(project,
                                     model_index,
                                     route,
                                     loads_on,
                                     scenarios_df,
                                     simulations_output_name,
-                                    outputs)
\ No newline at end of file
+                                    outputs,
+                                    fidelity_levels,
+                                    fidelity_target,
+                                    fidelity_margin)
+    else:
+        utils_parametric.simulations( project,
+                                        model_index,
+                                        route,
+                                        loads_on,
+                                        scenarios_df,
+                                        simulations_output_name,
+                                        outputs)
\ No newline at end of file
@@ -0,0 +1,334 @@
+"""
+===================================================
+Genetic optimization - island model
+===================================================
+
+Module description
+------------------
+Functions to run an island model (archipelago) genetic optimization on isolated
+copies of the current project. Required by ga_so.py, ga_mo.py and ga_island.py
+
+Pygmo's archipelago() runs islands in threads or Python processes that cannot reach the
+live VE project, so here each island is a VE instance with its own project copy (see
+utils_clone_pool.create_clones) running ga_island.py. Each island evolves its own
+population and simulates on its own copy; the islands only share small json files in
+the archipelago folder of the main project:
+
+- GA_island.json in each copy; the island settings written by setup_islands()
+- algorithm.pkl; the Pygmo algorithm of the main script
+- migrants_<island>.json; the best individuals of an island, rewritten every
+  migration_interval generations and read by the next island(s)
+- final_<island>.json; the final population of an island
+
+Migration is asynchronous: an island takes the latest migrants of its source islands
+whenever it migrates, so fast and slow islands do not wait for each other. The main
+script waits for the final files and merges the islands into one champion
+(single objective) or one Pareto front (multi-objective).
+
+Notes
+-----
+Input (pre-simulation) constraints are functions and are not passed to the islands;
+output constraints are. Fidelity ladders are not used on islands.
+
+"""
+
+import os
+import json
+import time
+import pickle
+import numpy as np
+import pygmo as pg
+import utils_clone_pool
+from pathlib import Path
+
+# Name of the shared folder in the main project
+ARCHIPELAGO_FOLDER = 'GA_archipelago'
+# Name of the island settings file in each project copy
+ISLAND_CONFIG = 'GA_island.json'
+# Name of the pickled algorithm in the archipelago folder
+ALGORITHM_FILE = 'algorithm.pkl'
+
+
+def setup_islands(udp, algo, island_folders, project_folder, pop_size, generations,
+                  migration_interval=2, migrants=1, topology='ring', seed=0,
+                  cache_file=None):
+    """ Writes the island settings to each project copy and clears previous results
+
+    Args:
+        udp (ga_function) : optimization problem of the main script
+        algo (pygmo algorithm) : algorithm set to one generation per evolve call
+        island_folders (list[str]) : project copy folder paths, one per island
+        project_folder (str) : main project folder path
+        pop_size (int) : population size of each island
+        generations (int) : generations per island
+        migration_interval (int) : generations between migrations
+        migrants (int) : best individuals sent at each migration
+        topology (str) : 'ring' (from the previous island) or 'all' (from every island)
+        seed (int) : random seed; island i uses seed + i
+        cache_file (str, optional) : fitness cache file name in each project copy
+
+    Returns:
+        folder (str) : archipelago folder path
+    """
+
+    folder = Path(project_folder, ARCHIPELAGO_FOLDER)
+    folder.mkdir(exist_ok=True)
+    for path in list(folder.glob('migrants_*.json')) + list(folder.glob('final_*.json')):
+        os.remove(path)
+
+    with open(Path(folder, ALGORITHM_FILE), 'wb') as f:
+        pickle.dump(algo, f)
+
+    config = udp.job_config()
+    config.update({
+        'resolution': udp.resolution,
+        'cache_file': cache_file,
+        # functions cannot be written to json; only output constraints are passed
+        'constraints': [c for c in udp.constraints if 'input' not in c],
+        'constraint_mode': udp.constraint_mode,
+        'penalty': udp.penalty,
+        'archipelago_folder': str(folder),
+        'islands': len(island_folders),
+        'pop_size': pop_size,
+        'generations': generations,
+        'migration_interval': migration_interval,
+        'migrants': migrants,
+        'topology': topology
+    })
+
+    for island, island_folder in enumerate(island_folders):
+        config['island'] = island
+        config['seed'] = seed + island
+        utils_clone_pool.write_json(Path(island_folder, ISLAND_CONFIG), config)
+        print(f'Island {island} settings written to {island_folder}')
+
+    return str(folder)
+
+
+def load_algorithm(folder, seed):
+    """ Loads the algorithm of the main script and sets the island seed
+
+    Args:
+        folder (str) : archipelago folder path
+        seed (int) : island random seed
+
+    Returns:
+        algo (pygmo algorithm) : algorithm
+    """
+
+    with open(Path(folder, ALGORITHM_FILE), 'rb') as f:
+        algo = pickle.load(f)
+    if algo.has_set_seed():
+        algo.set_seed(seed)
+    return algo
+
+
+def violations(fs, nobj, nec=0, c_tol=None):
+    """ Returns the total constraint violation of each individual (Pygmo form: the
+        equality constraints then the inequality constraints after the objectives)
+
+    Args:
+        fs (numpy array) : fitness vectors
+        nobj (int) : number of objectives
+        nec (int) : number of equality constraints
+        c_tol (list[float], optional) : constraint tolerances; None = 0
+
+    Returns:
+        violation (numpy array) : 0 for feasible individuals
+    """
+
+    fs = np.asarray(fs, dtype=float)
+    cs = fs[:, nobj:]
+    tol = np.zeros(cs.shape[1]) if c_tol is None or len(c_tol) == 0 else np.asarray(c_tol, dtype=float)
+    over = np.concatenate([np.abs(cs[:, :nec]) - tol[:nec], cs[:, nec:] - tol[nec:]], axis=1)
+    return np.maximum(over, 0).sum(axis=1)
+
+
+def best_indices(fs, number, nobj, nec=0, c_tol=None):
+    """ Returns the indices of the best individuals
+        With constraints in Pygmo form (constraint_mode='pygmo') feasible individuals
+        come first; infeasible ones follow by increasing violation
+
+    Args:
+        fs (numpy array) : fitness vectors
+        number (int) : number of individuals
+        nobj (int) : number of objectives
+        nec (int) : number of equality constraints
+        c_tol (list[float], optional) : constraint tolerances; None = 0
+
+    Returns:
+        indices (list[int]) : best first
+    """
+
+    fs = np.asarray(fs, dtype=float)
+    if fs.shape[1] > nobj and nobj == 1:
+        tol = np.zeros(fs.shape[1] - 1) if c_tol is None or len(c_tol) == 0 else np.asarray(c_tol, dtype=float)
+        order = pg.sort_population_con(fs, nec, tol)
+    elif fs.shape[1] > nobj:
+        violation = violations(fs, nobj, nec, c_tol)
+        feasible = np.flatnonzero(violation == 0)
+        infeasible = np.flatnonzero(violation > 0)
+        order = list(feasible[pg.sort_population_mo(fs[feasible, :nobj])]) if len(feasible) else []
+        order += list(infeasible[np.argsort(violation[infeasible], kind='stable')])
+    elif nobj == 1:
+        order = np.argsort(fs[:, 0], kind='stable')
+    else:
+        order = pg.sort_population_mo(fs[:, :nobj])
+    return [int(i) for i in order[:number]]
+
+
+def sources(island, islands, topology):
+    """ Returns the islands an island receives migrants from
+
+    Args:
+        island (int) : island index
+        islands (int) : number of islands
+        topology (str) : 'ring' or 'all'
+
+    Returns:
+        sources (list[int]) : island indices
+    """
+
+    if islands < 2:
+        return []
+    if topology == 'all':
+        return [i for i in range(islands) if i != island]
+    return [(island - 1) % islands]
+
+
+def migrate(config, generation, pop, udp, received):
+    """ Sends the best individuals of the island and replaces its worst individuals
+        with the latest migrants from its source islands
+
+    Args:
+        config (dict) : island settings
+        generation (int) : current generation of the island
+        pop (pygmo population) : island population
+        udp (ga_function) : island problem (for duplicate checks)
+        received (dict) : source island : generation of the migrants already taken
+
+    Returns:
+        pop (pygmo population) : population with the migrants
+    """
+
+    folder = config['archipelago_folder']
+    island = config['island']
+    nobj = udp.get_nobj()
+    nec = udp.get_nec()
+    c_tol = udp.c_tol()
+
+    # Send
+    fs = pop.get_f()
+    xs = pop.get_x()
+    indices = best_indices(fs, config['migrants'], nobj, nec, c_tol)
+    utils_clone_pool.write_json(Path(folder, f'migrants_{island}.json'),
+                                {'generation': generation,
+                                 'xs': [list(xs[i]) for i in indices],
+                                 'fs': [list(fs[i]) for i in indices]})
+
+    # Receive; migrants already in the population (same model) are not taken
+    present = set(tuple(udp.canonical_x(x)) for x in xs)
+    incoming = []
+    for source in sources(island, config['islands'], config['topology']):
+        path = Path(folder, f'migrants_{source}.json')
+        if not path.exists():
+            continue
+        try:
+            with open(path, 'r') as f:
+                migrants = json.load(f)
+        except ValueError:
+            continue
+        if migrants['generation'] <= received.get(source, -1):
+            continue
+        received[source] = migrants['generation']
+        for x, f in zip(migrants['xs'], migrants['fs']):
+            if tuple(udp.canonical_x(np.array(x))) not in present:
+                present.add(tuple(udp.canonical_x(np.array(x))))
+                incoming.append((np.array(x), np.array(f)))
+
+    if incoming:
+        # worst individuals are replaced
+        worst = best_indices(pop.get_f(), len(pop), nobj, nec, c_tol)[::-1][:len(incoming)]
+        for index, (x, f) in zip(worst, incoming):
+            pop.set_xf(index, x, f)
+        print(f'Island {island} generation {generation}: {len(incoming)} migrants taken')
+
+    return pop
+
+
+def write_final(config, pop):
+    """ Writes the final population of the island
+
+    Args:
+        config (dict) : island settings
+        pop (pygmo population) : island population
+    """
+
+    utils_clone_pool.write_json(Path(config['archipelago_folder'], f'final_{config["island"]}.json'),
+                                {'xs': [list(x) for x in pop.get_x()],
+                                 'fs': [list(f) for f in pop.get_f()]})
+
+
+def wait_for_islands(folder, islands, poll_interval=10, timeout=None):
+    """ Waits for every island to write its final population
+
+    Args:
+        folder (str) : archipelago folder path
+        islands (int) : number of islands
+        poll_interval (float) : seconds between checks
+        timeout (float, optional) : seconds to wait; None = no limit
+
+    Returns:
+        finished (list[int]) : islands that finished
+    """
+
+    start = time.time()
+    while True:
+        finished = [i for i in range(islands) if Path(folder, f'final_{i}.json').exists()]
+        if len(finished) == islands:
+            break
+        if timeout is not None and time.time() - start > timeout:
+            print(f'Timed out waiting for islands; {len(finished)} of {islands} finished')
+            break
+        time.sleep(poll_interval)
+    return finished
+
+
+def merge_islands(folder, islands, nobj, nec=0, c_tol=None):
+    """ Merges the final populations of the islands
+        With constraints in Pygmo form the champion and the front are taken from the
+        feasible individuals (the least infeasible one if there are none)
+
+    Args:
+        folder (str) : archipelago folder path
+        islands (list[int]) : islands to merge
+        nobj (int) : number of objectives
+        nec (int) : number of equality constraints
+        c_tol (list[float], optional) : constraint tolerances; None = 0
+
+    Returns:
+        tuple[numpy array, numpy array] : decision and fitness vectors of the champion
+            (single objective, one row) or of the merged Pareto front
+    """
+
+    xs = []
+    fs = []
+    for island in islands:
+        with open(Path(folder, f'final_{island}.json'), 'r') as f:
+            final = json.load(f)
+        xs += final['xs']
+        fs += final['fs']
+    xs = np.array(xs, dtype=float)
+    fs = np.array(fs, dtype=float)
+
+    if len(fs) == 0:
+        return xs, fs
+    if nobj == 1:
+        best = best_indices(fs, 1, 1, nec, c_tol)
+        return xs[best], fs[best]
+    feasible = np.flatnonzero(violations(fs, nobj, nec, c_tol) == 0)
+    if len(feasible) < 2:
+        best = best_indices(fs, 1, nobj, nec, c_tol)
+        return xs[best], fs[best]
+    front = feasible[pg.fast_non_dominated_sorting(fs[feasible, :nobj])[0][0]]
+    return xs[front], fs[front]
@@ -0,0 +1,215 @@
+"""
+===================================================
+Genetic optimization - project clone pool
+===================================================
+
+Module description
+------------------
+Functions and a class to run genetic optimization simulations on isolated copies of the
+current project. The live VE project cannot be shared between threads, so each copy is
+opened in its own VE instance which runs ga_worker.py; the worker polls a queue folder in
+its project for jobs (a chromosone set plus the problem settings), simulates them and
+writes the results back next to the job file. Required by utils_genetic.py
+
+Usage
+-----
+- Set up and save the model, then create the copies with create_clones()
+- Open each copy in a separate VE instance and run ga_worker.py from its Python editor
+- Pass the copy folders to project_clone_pool and the pool to utils_genetic.clone_pool_bfe
+
+The queue is plain json files so the pool works across VE instances on the same machine
+(or on a shared drive). Jobs are handed out one at a time to whichever copy is free, so
+fast and slow simulations balance across the pool.
+
+"""
+
+import os
+import json
+import time
+import uuid
+import shutil
+from pathlib import Path
+
+# Name of the queue folder inside each project copy
+QUEUE_FOLDER = 'GA_queue'
+# Name of the file that tells a worker to stop
+STOP_FILE = 'stop'
+
+
+def create_clones(project_folder, number, clones_folder=None):
+    """ Copies the project folder to a number of isolated project copies
+        Results, backups and queue folders are not copied; existing copies are re-used
+        so delete them if the base model has changed
+
+    Args:
+        project_folder (str) : project folder path
+        number (int) : number of copies
+        clones_folder (str, optional) : folder to create the copies in; defaults to the
+                                        folder containing the project
+
+    Returns:
+        clone_folders (list[str]) : project copy folder paths
+    """
+
+    source = Path(project_folder)
+    if clones_folder is None:
+        clones_folder = source.parent
+
+    ignore = shutil.ignore_patterns('Backups', QUEUE_FOLDER, '*.aps', '*.asp', '*.shd', '*.gsk')
+
+    clone_folders = []
+    for i in range(number):
+        destination = Path(clones_folder, f'{source.name}_clone_{i}')
+        if destination.exists():
+            print(f'Project copy {destination} exists; re-using it')
+        else:
+            print(f'Copying project to {destination} ...')
+            shutil.copytree(source, destination, ignore=ignore)
+        Path(destination, QUEUE_FOLDER).mkdir(exist_ok=True)
+        clone_folders.append(str(destination))
+
+    return clone_folders
+
+
+def write_json(path, data):
+    """ Writes json to a temporary file then renames it so that a reader never sees a
+        partly written file
+
+    Args:
+        path (Path) : json file path
+        data (dict) : json serialisable data
+    """
+
+    temp_path = Path(str(path) + '.tmp')
+    with open(temp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(temp_path, path)
+
+
+def result_path(job_path):
+    """ Returns the result file path for a job file
+
+    Args:
+        job_path (Path) : job json file path
+
+    Returns:
+        path (Path) : result json file path
+    """
+
+    return Path(job_path.parent, job_path.stem + '.result.json')
+
+
+class project_clone_pool:
+
+    def __init__(self, clone_folders, job_timeout=3600, poll_interval=2):
+        """ Initialise class variables
+
+        Args:
+            clone_folders (list[str]) : project copy folder paths, each served by a
+                                        VE instance running ga_worker.py
+            job_timeout (int) : seconds to wait for a single job before it is failed
+            poll_interval (float) : seconds between checks for finished jobs
+        """
+
+        self.clone_folders = list(clone_folders)
+        self.job_timeout = job_timeout
+        self.poll_interval = poll_interval
+        # result files of timed out jobs, deleted if a worker writes them late
+        self.timed_out = []
+
+        for folder in self.clone_folders:
+            Path(folder, QUEUE_FOLDER).mkdir(exist_ok=True)
+            # Clear a stop request, jobs and results left by a previous session
+            stop_path = Path(folder, QUEUE_FOLDER, STOP_FILE)
+            if stop_path.exists():
+                os.remove(stop_path)
+            for path in Path(folder, QUEUE_FOLDER).glob('job_*'):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def evaluate(self, xs, config):
+        """ Simulates a list of chromosone sets on the project copies
+            Each copy is given one job at a time; the results are gathered in the order
+            of xs regardless of which copy finished first
+
+        Args:
+            xs (list[list[float]]) : chromosone sets
+            config (dict) : problem settings (see ga_function.job_config)
+
+        Returns:
+            outputs (list[dict or None]) : output name : value for each chromosone set;
+                                           None if the simulation failed
+        """
+
+        # pygmo copies the pool (the algorithm's bfe and the bfe used to build the
+        # population each hold one) so a counter kept on the pool would repeat job names
+        # across copies; a random batch name stops a copy reading another's late result
+        batch = uuid.uuid4().hex
+        outputs = [None] * len(xs)
+        pending = list(range(len(xs)))
+        # copy folder : (job index, job path, start time)
+        running = {}
+
+        while pending or running:
+            # Hand out jobs to free copies
+            for folder in self.clone_folders:
+                if folder in running or not pending:
+                    continue
+                index = pending.pop(0)
+                job_path = Path(folder, QUEUE_FOLDER, f'job_{batch}_{index}.json')
+                write_json(job_path, {'x': list(xs[index]), 'config': config})
+                running[folder] = (index, job_path, time.time())
+
+            time.sleep(self.poll_interval)
+
+            # Collect finished jobs
+            for folder in list(running):
+                index, job_path, start = running[folder]
+                path = result_path(job_path)
+                if path.exists():
+                    try:
+                        with open(path, 'r') as f:
+                            result = json.load(f)
+                    except ValueError:
+                        # still being written
+                        continue
+                    outputs[index] = result['output']
+                    if result['output'] is None:
+                        print(f'Job {index} failed on {folder}: {result.get("error")}')
+                    os.remove(path)
+                    del running[folder]
+                elif time.time() - start > self.job_timeout:
+                    print(f'Job {index} timed out on {folder}; it will not be retried')
+                    try:
+                        os.remove(job_path)
+                    except OSError:
+                        pass
+                    self.timed_out.append(path)
+                    del running[folder]
+
+            self.remove_late_results()
+
+        return outputs
+
+    def remove_late_results(self):
+        """ Deletes the results written by a worker after its job timed out
+        """
+
+        for path in list(self.timed_out):
+            if path.exists():
+                try:
+                    os.remove(path)
+                    self.timed_out.remove(path)
+                except OSError:
+                    # still being written
+                    pass
+
+    def shutdown(self):
+        """ Asks the ga_worker.py instances to stop once their current job is done
+        """
+
+        self.remove_late_results()
+        for folder in self.clone_folders:
+            Path(folder, QUEUE_FOLDER, STOP_FILE).touch()
@@ -0,0 +1,402 @@
+"""
+===================================================
+Multi-fidelity evaluation ladder
+===================================================
+
+Module description
+------------------
+Class and functions to screen candidates with cheap simulation settings before they are
+run at full fidelity. Used by utils_genetic.ga_function (ga_so.py / ga_mo.py) and by
+parametric_uncertainty.py through ladder_sweep().
+
+Each candidate is run at the first (cheapest) level; it is only promoted to the next
+level if its targets are within a margin of the best seen so far at that level. Full
+fidelity is always the last level and uses the options set on the Apachesim dialog.
+
+A level is a dict e.g.
+
+    {'name': 'coarse',
+     'options': {'simulation_timestep': 4,      # 30 minutes
+                 'reporting_interval': 3,       # 60 minutes
+                 'suncast': False,
+                 'radiance': False,
+                 'start_day': 1, 'start_month': 6},     # June to December
+     'loads_on': False}
+
+'options' are passed to ApacheSim.set_options() for the simulation and the previous
+options are restored afterwards (see api_examples/apachesim/run_simulation.py for the
+option names); 'loads_on' (optional) overrides the script setting.
+
+Candidates that stop below full fidelity are given their level targets plus the mean
+difference (full - level) seen on the candidates that went on to full fidelity, so that
+all targets passed to Pygmo are on the full fidelity scale.
+
+The evaluation cost (seconds per simulation) and the Spearman rank correlation between
+each level and full fidelity are logged; a low correlation means the level is a poor
+screen and the margin should be opened up (or the level made more detailed).
+
+Notes
+-----
+Only full fidelity results are stored in the fitness cache. The first min_promoted
+candidates at each level are always promoted so that the bias and the correlation can
+be estimated.
+
+"""
+
+import time
+import numpy as np
+import pandas as pd
+import utils_parametric
+from scipy import stats
+
+
+def apply_level(sim, level):
+    """ Sets the simulation options of a fidelity level
+
+    Args:
+        sim (iesve object) : ApacheSim
+        level (dict or None) : fidelity level; None = full fidelity (no change)
+
+    Returns:
+        base_options (dict or None) : options to restore after the simulation
+    """
+
+    if level is None or not level.get('options'):
+        return None
+    base_options = sim.get_options()
+    sim.set_options(level['options'])
+    return base_options
+
+
+def restore_options(sim, base_options):
+    """ Restores the simulation options saved by apply_level
+
+    Args:
+        sim (iesve object) : ApacheSim
+        base_options (dict or None) : options returned by apply_level
+    """
+
+    if base_options is not None:
+        sim.set_options(base_options)
+
+
+def within_margin(values, best, margin):
+    """ Tests whether any target is within a relative margin of the best value
+        (minimisation)
+
+    Args:
+        values (list[float]) : target values
+        best (list[float]) : best target values
+        margin (float) : relative margin e.g. 0.05 = within 5% of the best
+
+    Returns:
+        bool : True if the candidate should be promoted
+    """
+
+    values = np.asarray(values, dtype=float)
+    best = np.asarray(best, dtype=float)
+    return bool(np.any(values <= best + margin * np.abs(best)))
+
+
+class fidelity_ladder:
+    """ Promotion ladder of cheap simulation settings for the genetic optimization
+        Pygmo deep copies the problem; the ladder is shared by all the copies so that
+        the history and the counters are not lost
+    """
+
+    def __init__(self, levels, margin=0.05, min_promoted=5, log_path=None):
+        """ Initialise class variables
+
+        Args:
+            levels (list[dict]) : cheap fidelity levels, cheapest first (full fidelity
+                                  is added as the last level)
+            margin (float) : relative margin to the best value at a level for promotion
+            min_promoted (int) : candidates always promoted at each level
+            log_path (str, optional) : csv file pathname for the evaluation log
+        """
+        self.levels = list(levels) + [{'name': 'full'}]
+        self.margin = margin
+        self.min_promoted = min_promoted
+        self.log_path = log_path
+
+        self.top = len(self.levels) - 1
+        self.best = [None] * len(self.levels)
+        self.promoted = [0] * len(self.levels)
+        # chromosone set : {level : target values}
+        self.history = {}
+        # per evaluation log rows
+        self.rows = []
+        self.evaluations = 0
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def name(self, level):
+        """ Returns the name of a level
+
+        Args:
+            level (int) : level index
+
+        Returns:
+            name (str) : level name
+        """
+        return self.levels[level].get('name', f'level_{level}')
+
+    def add(self, level, x, values, seconds):
+        """ Records an evaluation at a level
+
+        Args:
+            level (int) : level index
+            x (numpy array) : effective chromosone values
+            values (list[float]) : target values
+            seconds (float) : simulation time
+        """
+        self.history.setdefault(tuple(x), {})[level] = list(values)
+        if self.best[level] is None:
+            self.best[level] = list(values)
+        else:
+            self.best[level] = list(np.minimum(self.best[level], values))
+        self.rows.append([self.name(level), seconds] + list(x) + list(values))
+
+    def promote(self, level, values):
+        """ Tests whether a candidate goes on to the next level
+
+        Args:
+            level (int) : level index the candidate was evaluated at
+            values (list[float]) : target values at the level
+
+        Returns:
+            bool : True if the candidate is promoted
+        """
+        if self.promoted[level] < self.min_promoted or \
+                within_margin(values, self.best[level], self.margin):
+            self.promoted[level] += 1
+            return True
+        return False
+
+    def pairs(self, level):
+        """ Returns the target values of the candidates evaluated at a level and at full
+            fidelity
+
+        Args:
+            level (int) : level index
+
+        Returns:
+            tuple[numpy array, numpy array] : level values, full fidelity values
+        """
+        low = []
+        full = []
+        for results in self.history.values():
+            if level in results and self.top in results:
+                low.append(results[level])
+                full.append(results[self.top])
+        return np.array(low), np.array(full)
+
+    def bias(self, level):
+        """ Mean difference between full fidelity and level targets
+
+        Args:
+            level (int) : level index
+
+        Returns:
+            bias (numpy array or float) : full - level per target; 0 if no pairs yet
+        """
+        low, full = self.pairs(level)
+        if len(low) == 0:
+            return 0.0
+        return np.mean(full - low, axis=0)
+
+    def evaluate(self, udp, xs, clone_pool=None):
+        """ Runs a batch of candidates up the ladder
+            Each level is run as a batch (on the clone pool if set) on the candidates
+            promoted from the level below
+
+        Args:
+            udp (ga_function) : optimization problem
+            xs (list[numpy array]) : effective chromosone sets
+            clone_pool (project_clone_pool, optional) : pool of project copies
+
+        Returns:
+            tuple[list, list, list] : outputs (dict or None), target values on the full
+                fidelity scale and the level reached for each chromosone set
+        """
+        outputs = [None] * len(xs)
+        values = [None] * len(xs)
+        reached = [None] * len(xs)
+
+        active = list(range(len(xs)))
+        for level in range(len(self.levels)):
+            if not active:
+                break
+            start = time.time()
+            results = udp.run_batch([xs[i] for i in active], clone_pool,
+                                    None if level == self.top else self.levels[level])
+            seconds = (time.time() - start) / len(active)
+
+            for i, output in zip(active, results):
+                if output is None:
+                    continue
+                outputs[i] = output
+                values[i] = udp.target_values(output)
+                reached[i] = level
+                self.add(level, xs[i], values[i], seconds)
+
+            if level < self.top:
+                # promote after the whole batch has set the best value at this level
+                active = [i for i in active
+                          if outputs[i] is not None and self.promote(level, values[i])]
+                print(f'Fidelity {self.name(level)}: {len(active)} of {len(results)} '
+                      f'candidates promoted')
+
+        # Put the candidates that stopped early on the full fidelity scale
+        for i in range(len(xs)):
+            if reached[i] is not None and reached[i] < self.top:
+                values[i] = list(np.array(values[i]) + self.bias(reached[i]))
+
+        self.save(udp)
+        return outputs, values, reached
+
+    def save(self, udp):
+        """ Saves the evaluation log to csv (if set)
+
+        Args:
+            udp (ga_function) : optimization problem (for the column names)
+        """
+        if self.log_path is None:
+            return
+        targets = [col for col in udp.outputs if col in udp.target]
+        columns = ['fidelity', 'seconds'] + list(udp.input_order) + targets
+        df = pd.DataFrame(self.rows, columns=columns)
+        df.index.name = 'evaluation'
+        df.to_csv(self.log_path, index=True)
+
+    def statistics(self):
+        """ Returns the cost and the rank correlation with full fidelity of each level
+
+        Returns:
+            df (pandas df) : one row per level
+        """
+        seconds = {}
+        counts = {}
+        for row in self.rows:
+            seconds[row[0]] = seconds.get(row[0], 0.0) + row[1]
+            counts[row[0]] = counts.get(row[0], 0) + 1
+
+        records = []
+        for level in range(len(self.levels)):
+            name = self.name(level)
+            count = counts.get(name, 0)
+            rho = np.nan
+            if level < self.top:
+                low, full = self.pairs(level)
+                if len(low) > 2:
+                    # first target; rank order is what promotion relies on
+                    rho = stats.spearmanr(low[:, 0], full[:, 0])[0]
+            records.append({'fidelity': name,
+                            'evaluations': count,
+                            'mean_seconds': seconds.get(name, 0.0) / count if count else np.nan,
+                            'spearman_rho': rho})
+        return pd.DataFrame(records)
+
+    def count_evaluations(self, n, generation_size):
+        """ Counts evaluations and logs the level statistics at the end of each
+            generation
+
+        Args:
+            n (int) : number of evaluations just made
+            generation_size (int or None) : evaluations per generation; None = no logs
+        """
+        for _ in range(n):
+            self.evaluations += 1
+            if generation_size and self.evaluations % generation_size == 0:
+                print(f'Fidelity ladder generation {self.evaluations // generation_size - 1}:')
+                print(self.statistics().to_string(index=False))
+
+
+def ladder_sweep(project, model_index, route, loads_on, df, simulations_output_name,
+                 new_columns, levels, target, margin=0.05, min_promoted=5):
+    """ Runs a parametric sweep up a fidelity ladder
+        Every scenario is run at the first level; only the scenarios within the margin
+        of the best value of the target at a level (and at least the min_promoted best
+        scenarios) are run at the next level. Each
+        level is saved to its own csv (level name suffix) and the final table holds the
+        results of the highest level each scenario reached plus a fidelity column
+
+    Args:
+        project (iesve object) : object
+        model_index (int) : index for real, proposed model etc
+        route (int) : sim (0) or compliance sim flag (1)
+        loads_on (bool) : loads sims on / off for full fidelity
+        df (pandas df) : list of scenarios & assignments
+        simulations_output_name (str) : output csv file pathname
+        new_columns (list (str)) : aps variable names
+        levels (list[dict]) : cheap fidelity levels, cheapest first
+        target (str) : aps variable name used for promotion (minimised)
+        margin (float) : relative margin to the best target value for promotion
+        min_promoted (int) : best scenarios always promoted so that the rank
+                             correlation between levels can be estimated
+
+    Returns:
+        df2 (pandas df) : dataframe of scenarios with results added
+    """
+
+    levels = list(levels) + [{'name': 'full'}]
+    top = len(levels) - 1
+    stem = simulations_output_name.rsplit('.', 1)[0]
+
+    df2 = df.copy()
+    for column in new_columns:
+        df2[column] = 0.0
+    df2['fidelity'] = ''
+
+    tables = []
+    records = []
+    scenarios = df
+    for count, level in enumerate(levels):
+        name = level.get('name', f'level_{count}')
+        if count < top:
+            output_name = f'{stem}_{name}.csv'
+            level_loads_on = level.get('loads_on', loads_on)
+            options = level.get('options')
+        else:
+            output_name = simulations_output_name
+            level_loads_on = loads_on
+            options = None
+
+        print(f'\nFidelity {name}: {len(scenarios)} scenarios ...')
+        start = time.time()
+        table = utils_parametric.simulations(project, model_index, route, level_loads_on,
+                                             scenarios, output_name, new_columns,
+                                             sim_options=options)
+        seconds = (time.time() - start) / max(len(scenarios), 1)
+        tables.append(table)
+
+        # Failed simulations are left at zero
+        done = table[table[new_columns].any(axis=1)]
+        df2.loc[done.index, new_columns] = done[new_columns]
+        df2.loc[done.index, 'fidelity'] = name
+
+        rho = np.nan
+        if count > 0:
+            common = tables[count - 1].index.intersection(done.index)
+            if len(common) > 2:
+                rho = stats.spearmanr(tables[count - 1].loc[common, target],
+                                      done.loc[common, target])[0]
+        records.append({'fidelity': name, 'evaluations': len(scenarios),
+                        'mean_seconds': seconds, 'spearman_rho_with_previous': rho})
+
+        if count < top:
+            if done.empty:
+                break
+            best = done[target].min()
+            ranked = done[target].sort_values()
+            promoted = [index for count, index in enumerate(ranked.index)
+                        if count < min_promoted or
+                        within_margin([ranked[index]], [best], margin)]
+            scenarios = df.loc[sorted(promoted)]
+
+    df2.to_csv(simulations_output_name, encoding='utf-8', index=True)
+    print('\nFidelity ladder summary:')
+    print(pd.DataFrame(records).to_string(index=False))
+
+    return df2
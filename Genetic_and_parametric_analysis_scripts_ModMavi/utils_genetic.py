@@ -8,23 +8,232 @@ Module description
 Class to provide Pygmo access and class functions for modifying the model, simulating
 the model and returning simulation results. Required by ga_so.py
 
+Populations can also be evaluated in batches on a pool of project copies (see
+utils_clone_pool.py and ga_worker.py) through the clone_pool_bfe batch fitness evaluator.
+
+Candidates can be screened with cheap simulation settings before full fidelity
+simulation (see utils_fidelity.py) and the non-dominated results can be kept in an
+online Pareto archive (see utils_pareto.py).
+
+Constraints are defined as a list of dicts:
+
+- {'output': 'Ta_max_degC', 'max': 28.0} or {'output': name, 'min': value}; an
+  inequality on a simulation output
+- {'output': name, 'equal': value, 'tolerance': 0.5}; an equality on a simulation output
+- {'input': function, 'name': 'my_check'}; a pre-simulation check of the inputs dict
+  (see ga_function.decode) that returns the violation (<= 0 is feasible); input sets
+  that fail are given the penalty without simulating. u_value_constraints() gives
+  checks for U value targets the constructions cannot reach
+
+With constraint_mode 'pygmo' the constraints are returned to Pygmo (get_nec, get_nic)
+for algorithms that handle constraints (e.g. gaco, ihs) or pg.unconstrain; with
+'penalty' they are folded into the targets so any algorithm can be used.
+
 """
 
 import os
+import json
 import time
 import iesve
 import numpy as np
 import pandas as pd
+import pygmo as pg
 from pathlib import Path
 import utils_model_mod
+import utils_fidelity
+import utils_journal
 
 # Reload utils
 import importlib
 importlib.reload(utils_model_mod)
+importlib.reload(utils_fidelity)
+importlib.reload(utils_journal)
+
+# Inputs whose model changes are cumulative (each call moves the geometry again), so the
+# same decision vector does not produce the same model twice and cannot be memoised
+CUMULATIVE_INPUTS = ['local_shade_overhang', 'local_shade_depth']
+
+
+class fitness_cache:
+    """ Persistent memo of simulation outputs keyed on the effective model inputs
+        The effective inputs are the values actually applied to the model i.e. after
+        rounding of mapped ids and quantising of numeric inputs; all outputs of a
+        simulation are stored so the cache can serve any target from the same outputs
+        list (e.g. ga_so.py and ga_mo.py sharing one cache file)
+        Pygmo deep copies the problem (e.g. for every batch fitness call); the cache is
+        shared by all the copies so that entries and hit counts are not lost
+    """
+
+    def __init__(self, cache_path, context):
+        """ Initialise the cache and load any entries saved by previous sessions
+
+        Args:
+            cache_path (str) : json file pathname
+            context (dict) : settings that change results for the same inputs
+                             (e.g. route, loads_on, model_index); part of every key
+        """
+        self.cache_path = cache_path
+        self.context = context
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.evaluations = 0
+        self.load()
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def key(self, data):
+        """ Returns a hashable key for a dict of effective inputs
+
+        Args:
+            data (dict) : input name : effective value (float or string)
+
+        Returns:
+            key (str) : json string of the sorted inputs and the context
+        """
+        inputs = {}
+        for name, value in data.items():
+            if isinstance(value, str):
+                inputs[name] = value
+            else:
+                # strip float noise so equal models give equal keys
+                inputs[name] = round(float(value), 10)
+        return json.dumps({'inputs': inputs, 'context': self.context}, sort_keys=True)
+
+    def get(self, data, names):
+        """ Returns cached outputs for the inputs or None if they are not cached
+
+        Args:
+            data (dict) : input name : effective value
+            names (list[str]) : output names that must be present in the entry
+
+        Returns:
+            output (dict or None) : output name : value
+        """
+        output = self.entries.get(self.key(data))
+        if output is not None and all(name in output for name in names):
+            self.hits += 1
+            return output
+        self.misses += 1
+        return None
+
+    def put(self, data, output):
+        """ Adds (or updates) an entry and saves the cache to disk
+
+        Args:
+            data (dict) : input name : effective value
+            output (dict) : output name : value
+        """
+        key = self.key(data)
+        entry = self.entries.get(key, {})
+        entry.update({name: float(value) for name, value in output.items()})
+        self.entries[key] = entry
+        self.save()
+
+    def load(self):
+        """ Loads the cache file if it exists
+        """
+        if not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, 'r') as f:
+                records = json.load(f)
+        except (OSError, ValueError):
+            print(f'Fitness cache {self.cache_path} could not be read; starting empty')
+            return
+        for record in records:
+            self.entries[record['key']] = record['outputs']
+        print(f'Fitness cache loaded: {len(self.entries)} entries')
+
+    def save(self):
+        """ Saves the cache; written to a temporary file first so that an interrupted
+            script cannot leave a truncated cache behind
+        """
+        records = [{'key': key, 'outputs': output} for key, output in self.entries.items()]
+        temp_path = self.cache_path + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(records, f)
+        os.replace(temp_path, self.cache_path)
+
+    def log_generation(self, generation):
+        """ Prints the hit rate since the last call and resets the counters
+
+        Args:
+            generation (int) : generation number (0 is the initial population)
+        """
+        total = self.hits + self.misses
+        rate = 100 * self.hits / total if total else 0.0
+        print(f'Fitness cache generation {generation}: {self.hits}/{total} hits '
+              f'({rate:.0f}%), {len(self.entries)} entries')
+        self.hits = 0
+        self.misses = 0
+
+    def count_evaluations(self, n, generation_size):
+        """ Counts evaluations and logs the hit rate at the end of each generation
+
+        Args:
+            n (int) : number of evaluations just made
+            generation_size (int or None) : evaluations per generation; None = no logs
+        """
+        for _ in range(n):
+            self.evaluations += 1
+            if generation_size and self.evaluations % generation_size == 0:
+                self.log_generation(self.evaluations // generation_size - 1)
+
+
+class results_dump:
+    """ Csv dump of the inputs and outputs of every simulation of an optimization run
+        Saved after each simulation so that the results are safe should the run be
+        interrupted; shared by Pygmo's copies of the problem like fitness_cache. Each
+        simulation is also appended to a journal for chart_dashboard.py (see
+        utils_journal.py)
+    """
+
+    def __init__(self, df_path, cols_list, targets=None):
+        """ Initialise the dump
+
+        Args:
+            df_path (str) : csv file pathname; overwritten
+            cols_list (list[str]) : input names followed by output names
+            targets (list[str], optional) : target names for the journal
+        """
+        self.df_path = df_path
+        self.cols_list = cols_list
+        self.df_dump = pd.DataFrame(columns=cols_list)
+        # input sets simulated; failed simulations count, cache hits and the screening
+        # levels a set passed through on the way to full fidelity do not
+        self.simulations = 0
+        self.journal = utils_journal.run_journal(df_path, cols_list, targets)
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def add(self, data, output):
+        """ Adds a simulation to the dump and saves / overwrites the csv file
+
+        Args:
+            data (dict) : input name : value
+            output (dict) : output name : value
+        """
+        new_row = list(data.values()) + list(output.values())
+        # create new df
+        new_df = pd.DataFrame([new_row], columns = self.cols_list)
+        # add new df to existing
+        self.df_dump = pd.concat([self.df_dump, new_df], ignore_index=True)
+        # Name the index column to work with ga_chart.py
+        self.df_dump.index.name = 'run'
+        # save to csv
+        self.df_dump.to_csv(self.df_path, index=True)
+        self.journal.add(dict(zip(self.cols_list, new_row)), len(self.df_dump) - 1)
+
 
 class ga_function:
 
-    def __init__(self, target, outputs, boundaries, mapped_ids, route, loads_on, model_index, output_file_name):
+    def __init__(self, target, outputs, boundaries, mapped_ids, route, loads_on, model_index,
+                 output_file_name, resolution=None, cache_file=None, generation_size=None,
+                 ladder=None, archive=None, constraints=None, constraint_mode='penalty',
+                 penalty=1e6):
         """ Initialise class variables
 
         Args:
@@ -37,6 +246,27 @@ class ga_function:
             route (int) : 0/1 flag for type of simulation
             loads_on (bool) : loads sims on / off (True/False)
             model_index (int) : index of ve model to be modified
+            output_file_name (str) : csv file name for the results dump
+            resolution (float or dict, optional) : step that numeric inputs are quantised
+                                to before simulation; a float applies to all numeric
+                                inputs, a dict gives input name : step. None = no
+                                quantising
+            cache_file (str, optional) : json file name for the persistent fitness
+                                cache; None = no caching
+            generation_size (int, optional) : evaluations per generation (population
+                                size) used to log the cache hit rate per generation
+            ladder (fidelity_ladder, optional) : cheap simulation levels candidates must
+                                pass before a full fidelity simulation; None = full
+                                fidelity only
+            archive (pareto_archive, optional) : non-dominated archive updated with
+                                every full fidelity simulation
+            constraints (list[dict], optional) : output and pre-simulation input
+                                constraints (see module description)
+            constraint_mode (str) : 'penalty' adds penalty x total violation to the
+                                targets; 'pygmo' returns the constraints to Pygmo
+            penalty (float) : penalty factor; input sets failing a pre-simulation check
+                                get penalty x (1 + violation) for every target, as do
+                                failed or timed out simulations
         """
 
         # Create vars to pass meta data into the class simulation(x) function without
@@ -52,6 +282,11 @@ class ga_function:
         # Set dimension of Pygmo problem (number of inputs)
         self.dim = len(boundaries)
 
+        # Mapped id inputs are integer dimensions; Pygmo requires these to be the last
+        # dimensions of the decision vector so the inputs are ordered numeric first
+        self.input_order = [key for key in boundaries if key not in mapped_ids] + \
+                           [key for key in boundaries if key in mapped_ids]
+
         # Set up a pandas df for a results dump
         project = iesve.VEProject.get_current_project()
         project_folder = project.path
@@ -60,20 +295,256 @@ class ga_function:
         self.cols_list = list(boundaries.keys())
         # add output names
         self.cols_list += self.outputs
-        self.df_dump = pd.DataFrame(columns=self.cols_list)
+        # the fidelity level each row was simulated at
+        self.ladder = ladder
+        self.archive = archive
+        if ladder is not None:
+            self.cols_list += ['fidelity']
+        self.dump = results_dump(self.df_path, self.cols_list, self.target)
+
+        # Constraints; pre-simulation (input) checks are evaluated in this process
+        # before any simulation is launched
+        self.constraints = constraints if constraints is not None else []
+        self.constraint_mode = constraint_mode
+        self.penalty = penalty
+
+        # Set up the fitness cache; cumulative inputs give a different model for the
+        # same inputs so caching is switched off for them
+        self.resolution = resolution if resolution is not None else {}
+        self.generation_size = generation_size
+        self.clone_pool = None
+        self.cache = None
+        if cache_file is not None:
+            cumulative = [key for key in boundaries if key in CUMULATIVE_INPUTS]
+            if cumulative:
+                print(f'Fitness cache disabled; cumulative inputs {cumulative} defined')
+            else:
+                context = {'route': route, 'loads_on': loads_on, 'model_index': model_index}
+                self.cache = fitness_cache(os.path.join(project_folder, cache_file), context)
 
     def fitness(self, x):
         """ Pygmo mandatory fitness test
             Calls the function to modify the model, simulate and return the target
-            aps variable
+            aps variable; repeat evaluations of the same effective inputs are returned
+            from the fitness cache (if set) and input sets failing a pre-simulation
+            constraint are penalised, both without simulating
 
         Args:
             x (numpy array) : chromosones (inputs that are changed in the model by the
                               Pygmo evolve function)
         """
 
-        return self.simulation(x)
+        # A single candidate is a batch of one (cache, pre-screen, ladder, constraints)
+        return list(self.evaluate_batch(x, None))
+
+    def canonical_x(self, x):
+        """ Returns the effective decision vector for x
+            Mapped id inputs are rounded to their integer index and numeric inputs are
+            quantised to the resolution step (if set) and clipped to the bounds
+
+        Args:
+            x (numpy array) : chromosone values len=dim from Pygmo
+
+        Returns:
+            x (numpy array) : effective chromosone values
+        """
+
+        effective = []
+        for count, key in enumerate(self.input_order):
+            lower, upper = self.boundaries[key]
+            value = float(x[count])
+            if key in self.mapped_ids:
+                value = float(round(value))
+            else:
+                if isinstance(self.resolution, dict):
+                    step = self.resolution.get(key)
+                else:
+                    step = self.resolution
+                if step:
+                    value = lower + round((value - lower) / step) * step
+                value = round(value, 10)
+            effective.append(min(max(value, lower), upper))
+        return np.array(effective)
+
+    def decode(self, x):
+        """ Returns a dict of the model inputs for decision vector x
+
+        Args:
+            x (numpy array) : chromosone values len=dim from Pygmo
+
+        Returns:
+            data (dict) : input name : value (float or mapped string id) in the order of
+                          the boundaries dict
+        """
+
+        # Create a dict with the boundary keys and the current values in the np array x
+        # that has been passed in by Pygmo evolve (the values in the np array x are in
+        # input_order; the dict is in the boundaries order used for the csv columns)
+        position = {key: count for count, key in enumerate(self.input_order)}
+        data = {}
+        for key in self.boundaries.keys():
+            data[key] = x[position[key]]
+
+        # For string based inputs replace index with the mapped id
+        # As Pygmo uses floats use round to get an integer index
+        for key in self.mapped_ids.keys():
+            data[key] = self.mapped_ids[key][round(data[key])]
+
+        return data
+
+    def target_values(self, output):
+        """ Returns the target values from an outputs dict in the order Pygmo expects
+
+        Args:
+            output (dict) : output name : value
+
+        Returns:
+            output_list (list[float]) : target values
+        """
+
+        output_list = [] # For single-objective only one value will be returned.
+        for key in output:
+            if key in self.target:
+                output_list.append(float(output[key]))
+        return output_list
+
+
+    def get_nix(self):
+        """ Returns the number of integer dimensions (the mapped id inputs, which are
+            the last dimensions of the decision vector)
+            Integer-aware algorithms (e.g. gaco, sga, nsga2) then sample and mutate
+            these as whole indices so that every id is equally likely
+
+        """
+        return len([key for key in self.input_order if key in self.mapped_ids])
+
+    def get_nec(self):
+        """ Returns the number of equality constraints (output 'equal' constraints)
+            Zero in penalty mode as the constraints are folded into the targets
+
+        """
+        if self.constraint_mode != 'pygmo':
+            return 0
+        return len([c for c in self.constraints if 'equal' in c])
+
+    def get_nic(self):
+        """ Returns the number of inequality constraints (input checks and output
+            'min' / 'max' constraints)
+            Zero in penalty mode as the constraints are folded into the targets
+
+        """
+        if self.constraint_mode != 'pygmo':
+            return 0
+        return len([c for c in self.constraints if 'equal' not in c])
 
+    def c_tol(self):
+        """ Returns the constraint tolerances in Pygmo order for pg.problem.c_tol
+            (equality tolerance from the constraint, 0 for inequalities)
+
+        Returns:
+            tolerances (list[float]) : equality then inequality tolerances; empty in
+                                       penalty mode
+        """
+        if self.constraint_mode != 'pygmo':
+            return []
+        return [c.get('tolerance', 0.0) for c in self.constraints if 'equal' in c] + \
+               [0.0 for c in self.constraints if 'equal' not in c]
+
+    def constraint_outputs(self):
+        """ Returns the output names used by the output constraints
+
+        Returns:
+            names (list[str]) : output names
+        """
+        return [c['output'] for c in self.constraints if 'output' in c]
+
+    def pre_screen(self, data):
+        """ Evaluates the pre-simulation (input) constraints
+
+        Args:
+            data (dict) : input name : value (see decode)
+
+        Returns:
+            violations (list[float]) : value of each input check (<= 0 is feasible)
+        """
+        return [float(c['input'](data)) for c in self.constraints if 'input' in c]
+
+    def constraint_values(self, data, output):
+        """ Returns the constraint values in Pygmo form; output constraints of an input
+            set that was not simulated are set to the penalty (violated)
+
+        Args:
+            data (dict) : input name : value
+            output (dict or None) : output name : value; None if not simulated
+
+        Returns:
+            tuple[list[float], list[float]] : equality values (0 is feasible) and
+                                              inequality values (<= 0 is feasible)
+        """
+        equalities = []
+        inequalities = []
+        for c in self.constraints:
+            if 'input' in c:
+                inequalities.append(float(c['input'](data)))
+                continue
+            if output is None:
+                value = self.penalty
+            elif 'equal' in c:
+                value = float(output[c['output']]) - c['equal']
+            elif 'max' in c:
+                value = float(output[c['output']]) - c['max']
+            else:
+                value = c['min'] - float(output[c['output']])
+            if 'equal' in c:
+                equalities.append(value)
+            else:
+                inequalities.append(value)
+        return equalities, inequalities
+
+    def violation(self, data, output):
+        """ Returns the total constraint violation (0 if feasible)
+
+        Args:
+            data (dict) : input name : value
+            output (dict or None) : output name : value; None if not simulated
+
+        Returns:
+            violation (float) : sum of the violations beyond the tolerances
+        """
+        equalities, inequalities = self.constraint_values(data, output)
+        tolerances = [c.get('tolerance', 0.0) for c in self.constraints if 'equal' in c]
+        total = sum(max(0.0, abs(value) - tol) for value, tol in zip(equalities, tolerances))
+        total += sum(max(0.0, value) for value in inequalities)
+        return total
+
+    def fitness_vector(self, values, data, output):
+        """ Returns the Pygmo fitness vector for target values and their constraints
+
+        Args:
+            values (list[float] or None) : target values; None if not simulated (or the
+                                           simulation failed)
+            data (dict) : input name : value
+            output (dict or None) : output name : value; None if not simulated
+
+        Returns:
+            f (list[float]) : targets (penalised in penalty mode) followed by the
+                              equality and inequality constraints in pygmo mode
+        """
+        if not self.constraints:
+            if values is None:
+                return [self.penalty] * len(self.target)
+            return list(values)
+
+        if self.constraint_mode == 'pygmo':
+            if values is None:
+                values = [self.penalty] * len(self.target)
+            equalities, inequalities = self.constraint_values(data, output)
+            return list(values) + equalities + inequalities
+
+        violation = self.violation(data, output)
+        if values is None:
+            return [self.penalty * (1 + violation)] * len(self.target)
+        return [value + self.penalty * violation for value in values]
 
     def get_nobj(self):
         """ Returns number of objectives
@@ -92,13 +563,191 @@ class ga_function:
 
         lower = []
         upper = []
-        for key in self.boundaries:
+        for key in self.input_order:
             lower.append(self.boundaries[key][0])
             upper.append(self.boundaries[key][1])
         bounds = (lower, upper)
         return bounds
 
-    def simulation(self, x):
+    def batch_fitness(self, dvs):
+        """ Pygmo optional batch fitness
+            Evaluates a whole population; uses the project clone pool if one has been
+            set on the class, otherwise simulates each individual in turn
+
+        Args:
+            dvs (numpy array) : decision vectors concatenated in one array
+
+        Returns:
+            fvs (numpy array) : fitness vectors concatenated in the same order
+        """
+
+        return self.evaluate_batch(dvs, self.clone_pool)
+
+    def evaluate_batch(self, dvs, clone_pool):
+        """ Evaluates a batch of decision vectors
+            Cached and repeated input sets are only simulated once; the remaining
+            input sets are fanned out to the clone pool and gathered in order; with a
+            fidelity ladder the input sets are run up the ladder instead
+
+        Args:
+            dvs (numpy array) : decision vectors concatenated in one array
+            clone_pool (project_clone_pool or None) : pool of project copies
+
+        Returns:
+            fvs (numpy array) : fitness vectors concatenated in the same order
+        """
+
+        xs = np.reshape(np.asarray(dvs, dtype=float), (-1, self.dim))
+
+        # Find the input sets that need a simulation; repeats within the batch share
+        # one simulation
+        results = [None] * len(xs)
+        jobs = {}
+        for i, x in enumerate(xs):
+            x = self.canonical_x(x)
+            data = self.decode(x)
+
+            # Reject input sets that fail a pre-simulation check
+            if any(value > 0 for value in self.pre_screen(data)):
+                print('Pre-simulation constraint failed; simulation skipped')
+                results[i] = self.fitness_vector(None, data, None)
+                continue
+
+            if self.cache is not None:
+                output = self.checked_output(
+                    self.cache.get(data, self.target + self.constraint_outputs()))
+                if output is not None:
+                    print('Fitness cache hit; simulation skipped')
+                    results[i] = self.fitness_vector(self.target_values(output), data, output)
+                    continue
+            key = tuple(x)
+            if key not in jobs:
+                jobs[key] = []
+            jobs[key].append(i)
+
+        if jobs:
+            keys = list(jobs)
+            self.dump.simulations += len(keys)
+            if self.ladder is None:
+                outputs = self.run_batch([np.array(key) for key in keys], clone_pool)
+                values = [None if output is None else self.target_values(output)
+                          for output in outputs]
+                levels = [None] * len(keys)
+            else:
+                outputs, values, levels = self.ladder.evaluate(
+                    self, [np.array(key) for key in keys], clone_pool)
+
+            for key, output, value, level in zip(keys, outputs, values, levels):
+                data = self.decode(np.array(key))
+                if output is None:
+                    # Failed or timed out; penalised and not recorded so that the run
+                    # goes on
+                    print(f'Simulation failed for chromosone set {list(key)}; penalised')
+                    for i in jobs[key]:
+                        results[i] = self.fitness_vector(None, data, None)
+                    continue
+                self.record(data, output, level)
+                print(value)
+                for i in jobs[key]:
+                    results[i] = self.fitness_vector(value, data, output)
+
+        if self.cache is not None:
+            self.cache.count_evaluations(len(xs), self.generation_size)
+        if self.ladder is not None:
+            self.ladder.count_evaluations(len(xs), self.generation_size)
+
+        return np.array(results, dtype=float).flatten()
+
+    def run_batch(self, xs, clone_pool, level=None):
+        """ Simulates a list of chromosone sets in turn or on the clone pool
+
+        Args:
+            xs (list[numpy array]) : chromosone sets
+            clone_pool (project_clone_pool or None) : pool of project copies
+            level (dict, optional) : fidelity level; None = full fidelity
+
+        Returns:
+            outputs (list[dict or None]) : output name : value for each chromosone set
+        """
+
+        if clone_pool is None:
+            outputs = [self.run_model(x, level) for x in xs]
+        else:
+            print(f'Evaluating {len(xs)} chromosone sets on {len(clone_pool.clone_folders)} project clones ...')
+            config = self.job_config()
+            config['level'] = level
+            outputs = clone_pool.evaluate([list(x) for x in xs], config)
+
+        return [self.checked_output(output) for output in outputs]
+
+    def checked_output(self, output):
+        """ Treats outputs with a missing or non-finite target value (e.g. a failed
+            overheating assessment returns nan) as a failed simulation so that they are
+            penalised rather than recorded
+
+        Args:
+            output (dict or None) : output name : value
+
+        Returns:
+            output (dict or None) : the outputs; None if the simulation failed
+        """
+
+        if output is None:
+            return None
+        try:
+            values = self.target_values(output)
+        except (TypeError, ValueError):
+            values = [float('nan')]
+        if len(values) != len(self.target) or not np.isfinite(values).all():
+            print(f'Missing or non-finite target values {values}; treated as a failed simulation')
+            return None
+        return output
+
+    def job_config(self):
+        """ Returns the settings a ga_worker.py instance needs to evaluate a job
+
+        Returns:
+            config (dict) : json serialisable problem settings
+        """
+
+        return {
+            'target': self.target,
+            'outputs': self.outputs,
+            'boundaries': self.boundaries,
+            'mapped_ids': self.mapped_ids,
+            'route': self.route,
+            'loads_on': self.loads_on,
+            'model_index': self.model_index
+        }
+
+    def record(self, data, output, level=None):
+        """ Dumps a simulation result to the csv file and the fitness cache
+
+        Args:
+            data (dict) : input name : value
+            output (dict) : output name : value
+            level (int, optional) : fidelity ladder level the outputs came from
+        """
+
+        full = self.ladder is None or level is None or level == self.ladder.top
+
+        # Dump results in to the initialized df and save / overwrite to csv file
+        if self.ladder is not None:
+            name = self.ladder.name(self.ladder.top if level is None else level)
+            self.dump.add(data, dict(output, fidelity=name))
+        else:
+            self.dump.add(data, output)
+
+        # Memoise the outputs for repeat evaluations of the same inputs; screening
+        # levels are not memoised
+        if self.cache is not None and full:
+            self.cache.put(data, output)
+
+        # Offer the result to the Pareto archive; infeasible results are not offered
+        if self.archive is not None and full and not self.violation(data, output):
+            self.archive.add(data, output, self.target_values(output))
+
+    def run_model(self, x, level=None):
         """ Modifies the specified model for chromosone set x and runs a simulation
             Each successive chromosone change will overwrite the last change
             Optionally runs sizing and thermal simulations set by the class variables
@@ -106,9 +755,11 @@ class ga_function:
 
         Args:
             x (numpy array) : array of chromosone values len=dim from Pygmo
+            level (dict, optional) : fidelity level (see utils_fidelity.py); None = the
+                                     options set on the Apachesim dialog
 
         Returns:
-            result (float) :
+            output (dict or None) : output name : value; None if the simulation failed
         """
 
         project = iesve.VEProject.get_current_project()
@@ -116,19 +767,7 @@ class ga_function:
         project_folder = project.path
         sim = iesve.ApacheSim()
 
-        # Create a dict with the boundary keys and the current values in the np array x
-        # that has been passed in by Pygmo evolve (the order in the ordered  dict will
-        # match that of the values in the np array  x)
-        data = {}
-        count = 0
-        for key in self.boundaries.keys():
-            data[key] = x[count]
-            count += 1
-
-        # For string based inputs replace index with the mapped id
-        # As Pygmo uses floats use round to get an integer index
-        for key in self.mapped_ids.keys():
-            data[key] = self.mapped_ids[key][round(data[key])]
+        data = self.decode(x)
 
         # Apply model changes
         print('Applying chromosone set model changes ... ')
@@ -166,10 +805,14 @@ class ga_function:
         if 'asp_file' in data:
             utils_model_mod.set_sim_options(data['asp_file'])
 
+        # ... set simulation options - fidelity level (restored after the simulation)
+        base_options = utils_fidelity.apply_level(sim, level)
+        loads_on = self.loads_on if level is None else level.get('loads_on', self.loads_on)
+
         # Simulate scenario (row)
         print('Simulating chromosone set ...')
 
-        if self.loads_on:
+        if loads_on:
             # ... Set the HVAC network
             sim.set_hvac_network(data['asp_file'])
             # ... Room / zone loads simulation
@@ -189,6 +832,8 @@ class ga_function:
             print('Route flag set incorrectly')
             return
 
+        utils_fidelity.restore_options(sim, base_options)
+
         # ... wait for aps to be saved to vista folder or break after 15 mins
         time_counter = 0
         time_out = 900
@@ -212,17 +857,6 @@ class ga_function:
             elif self.route == 1:
                 time.sleep(10)
 
-            # Dump results in to the initialized df and save / overwrite to csv file
-            new_row = list(data.values()) + list(output.values())
-            # create new df
-            new_df = pd.DataFrame([new_row], columns = self.cols_list)
-            # add new df to existing
-            self.df_dump = pd.concat([self.df_dump, new_df], ignore_index=True)
-            # Name the index column to work with ga_chart.py
-            self.df_dump.index.name = 'run'
-            # save to csv
-            self.df_dump.to_csv(self.df_path, index=True)
-
             # Delete aps & asp file to avoid filling up the hard drive
             # Comment this out if you want to keep the files; but you must manually
             # delete them before running the script again on the same project
@@ -232,11 +866,143 @@ class ga_function:
                 except:
                     pass
 
+            return output
+
+
+def u_value_constraints(model, boundaries):
+    """ Pre-simulation constraints for the U value inputs
+        The U value functions revise the insulation (opaque) or cavity (glazed) layer
+        resistance; U values above that with zero layer resistance cannot be reached,
+        so those input sets are penalised without simulating
+
+    Args:
+        model (iesve object) : model to edit
+        boundaries (dict) : input name : lower/upper bounds
+
+    Returns:
+        constraints (list[dict]) : input constraints (see ga_function)
+    """
+
+    subtypes = {'wall_const_u_value': iesve.element_categories.wall,
+                'window_const_u_value': None,
+                'roof_const_u_value': iesve.element_categories.roof,
+                'floor_const_u_value': iesve.element_categories.ground_floor}
+
+    constraints = []
+    for key, subtype in subtypes.items():
+        if key not in boundaries:
+            continue
+        # the limit is fixed by the other layers so it is found once
+        limit = utils_model_mod.get_max_u_value(model, subtype)
+        if limit is None:
+            continue
+        print(f'{key} limited to {limit:.3f} W/m2K by the active constructions')
+        constraints.append({'input': lambda data, key=key, limit=limit: data[key] - limit,
+                            'name': f'{key}_reachable'})
+    return constraints
+
+
+def unique_population(prob, pop_size, b=None, exclude=None, seed=None, max_tries=100):
+    """ Creates a random population in which every individual is a different model
+        Random decision vectors are drawn and rejected if their effective inputs (see
+        ga_function.canonical_x) repeat an individual already drawn or excluded, so no
+        simulation is spent on a duplicate model; with few distinct models (e.g. only
+        mapped id inputs) the population is topped up to pop_size with repeats of the
+        individuals drawn (see fill_population)
+
+    Args:
+        prob (pygmo problem) : problem wrapping a ga_function
+        pop_size (int) : population size
+        b (pygmo bfe, optional) : batch fitness evaluator
+        exclude (list[numpy array], optional) : decision vectors already taken e.g.
+                                                warm-start seeds
+        seed (int, optional) : random seed
+        max_tries (int) : draws per individual before giving up
+
+    Returns:
+        pop (pygmo population) : evaluated population
+    """
+
+    udp = prob.extract(ga_function)
+    pop = pg.population(prob, 0, seed=seed) if seed is not None else pg.population(prob, 0)
+
+    seen = set(tuple(udp.canonical_x(x)) for x in (exclude if exclude is not None else []))
+    xs = []
+    tries = 0
+    while len(xs) < pop_size and tries < pop_size * max_tries:
+        tries += 1
+        x = pop.random_decision_vector()
+        key = tuple(udp.canonical_x(x))
+        if key in seen:
+            continue
+        seen.add(key)
+        xs.append(x)
+
+    if b is not None and xs:
+        fs = np.reshape(b(prob, np.concatenate(xs)), (len(xs), -1))
+        for x, f in zip(xs, fs):
+            pop.push_back(x, f)
+    else:
+        for x in xs:
+            pop.push_back(x)
+
+    if len(xs) < pop_size:
+        print(f'Only {len(xs)} distinct models found for a population of {pop_size}')
+        fill_population(pop, pop_size)
+
+    return pop
+
+
+def fill_population(pop, pop_size):
+    """ Tops a population up to pop_size with repeats of its individuals (with their
+        fitness, so nothing is simulated); algorithms such as nsga2 fail on a population
+        smaller than they were set up for
+
+    Args:
+        pop (pygmo population) : evaluated population
+        pop_size (int) : population size
+    """
+
+    xs = pop.get_x()
+    fs = pop.get_f()
+    if len(xs) == 0 or len(pop) >= pop_size:
+        return
+    print(f'Population topped up with {pop_size - len(pop)} repeated individuals')
+    for i in range(pop_size - len(pop)):
+        pop.push_back(xs[i % len(xs)], fs[i % len(xs)])
+
+
+class clone_pool_bfe:
+    """ Pygmo user-defined batch fitness evaluator
+        Fans a whole population out to a pool of isolated project copies, each served
+        by its own VE instance running ga_worker.py; set it on algorithms that support
+        bfe e.g. nsga2, gaco, pso_gen with algo.set_bfe(pg.bfe(clone_pool_bfe(pool)))
+    """
+
+    def __init__(self, clone_pool):
+        """ Initialise class variables
 
-            output_list = [] # For single-objective only one value will be returned.
-            for key in output:
-                if key in self.target:
-                    output_list.append(float(output[key]))
-            print(output_list)
+        Args:
+            clone_pool (project_clone_pool) : pool of project copies
+        """
+        self.clone_pool = clone_pool
 
-            return output_list
\ No newline at end of file
+    def __call__(self, prob, dvs):
+        """ Pygmo mandatory bfe call
+
+        Args:
+            prob (pygmo problem) : problem wrapping a ga_function
+            dvs (numpy array) : decision vectors concatenated in one array
+
+        Returns:
+            fvs (numpy array) : fitness vectors concatenated in the same order
+        """
+        udp = prob.extract(ga_function)
+        if udp is None:
+            # Not a VE problem; nothing to fan out so evaluate in series
+            xs = np.reshape(dvs, (-1, prob.get_nx()))
+            return np.concatenate([prob.fitness(x) for x in xs])
+        return udp.evaluate_batch(dvs, self.clone_pool)
+
+    def get_name(self):
+        return 'VE project clone pool bfe'
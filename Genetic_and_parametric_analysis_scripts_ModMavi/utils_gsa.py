@@ -0,0 +1,269 @@
+"""
+===================================================
+Global sensitivity analysis - utilities
+===================================================
+
+Module description
+------------------
+Functions to generate global sensitivity analysis designs, simulate them and compute
+sensitivity indices. Required by parametric_gsa.py
+
+Two methods are provided; both vary every input at once so interactions are included
+and all inputs are ranked from one set of simulations:
+
+- Sobol (variance-based): a Saltelli design of N * (d + 2) scenarios for d inputs gives
+  the first-order (S1, the share of the output variance due to the input alone) and
+  total (ST, incl. all interactions) indices. N should be a power of 2 (e.g. 64-512).
+- Morris (elementary effects): r trajectories of d + 1 scenarios give mu* (the mean
+  absolute effect of moving an input by delta; the ranking measure) and sigma (the
+  spread of the effects; high sigma = non-linear or interacting input). Far cheaper
+  than Sobol (r = 10-20 is typical) and suited to screening many inputs.
+
+The inputs are defined as in ga_so.py: boundaries {name: [min, max]} and mapped_ids
+{name: [ids]} with the boundaries of mapped inputs set to [0, len(ids) - 1]. Mapped
+inputs are sampled as indices. Effects are in units of the output per unit of the
+normalised [0, 1] input range so that all inputs can be compared. Confidence intervals
+are bootstrapped (half-widths at the given confidence level).
+
+Notes
+-----
+Cumulative inputs (local shades) are not supported; each scenario sets every input.
+
+Identical scenarios (common with mapped inputs) are simulated once.
+
+"""
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+from scipy.stats import qmc
+import utils_parametric
+
+from importlib import reload
+reload(utils_parametric)
+
+
+def scale(unit, boundaries, mapped_ids):
+    """ Scales a design in the unit hypercube to the model inputs
+
+    Args:
+        unit (numpy array) : design rows in [0, 1], columns in boundaries order
+        boundaries (dict) : {name: [min, max]}
+        mapped_ids (dict) : {name: [ids]} for the string id inputs
+
+    Returns:
+        df (pandas df) : scenarios with an input column per boundaries key
+    """
+
+    df = pd.DataFrame(index=range(len(unit)))
+    for i, (key, (low, high)) in enumerate(boundaries.items()):
+        if key in mapped_ids:
+            # equal shares of the unit range for each id
+            ids = mapped_ids[key]
+            index = np.minimum(np.floor(unit[:, i] * len(ids)), len(ids) - 1).astype(int)
+            df[key] = [ids[j] for j in index]
+        else:
+            df[key] = low + unit[:, i] * (high - low)
+    df.index.name = 'run'
+    return df
+
+
+def saltelli_design(d, n, seed=0):
+    """ Generates a Saltelli design for first-order and total Sobol indices
+
+    Args:
+        d (int) : number of inputs
+        n (int) : base sample size (power of 2)
+        seed (int) : random seed
+
+    Returns:
+        unit (numpy array) : n * (d + 2) rows in [0, 1]; for each base row j the rows
+                             are A_j, AB_1j ... AB_dj, B_j
+    """
+
+    base = qmc.Sobol(2 * d, scramble=True, seed=seed).random(n)
+    a = base[:, :d]
+    b = base[:, d:]
+    blocks = np.empty((n, d + 2, d))
+    blocks[:, 0] = a
+    for i in range(d):
+        blocks[:, i + 1] = a
+        blocks[:, i + 1, i] = b[:, i]
+    blocks[:, d + 1] = b
+    return blocks.reshape(n * (d + 2), d)
+
+
+def sobol_estimates(y, d):
+    """ First-order (Saltelli 2010) and total (Jansen) Sobol indices
+
+    Args:
+        y (numpy array) : outputs, n x (d + 2) in saltelli_design order
+        d (int) : number of inputs
+
+    Returns:
+        tuple[numpy array, numpy array] : S1 and ST of each input
+    """
+
+    fa = y[:, 0]
+    fb = y[:, d + 1]
+    fab = y[:, 1:d + 1]
+    variance = np.var(np.concatenate([fa, fb]))
+    if variance == 0:
+        return np.zeros(d), np.zeros(d)
+    s1 = np.mean(fb[:, None] * (fab - fa[:, None]), axis=0) / variance
+    st = 0.5 * np.mean((fa[:, None] - fab) ** 2, axis=0) / variance
+    return s1, st
+
+
+def sobol_indices(y, d, names, bootstrap=500, confidence=0.95, seed=0):
+    """ Computes the Sobol indices with bootstrap confidence intervals
+
+    Args:
+        y (numpy array) : outputs in saltelli_design order
+        d (int) : number of inputs
+        names (list[str]) : input names
+        bootstrap (int) : number of bootstrap resamples of the base rows
+        confidence (float) : confidence level
+
+    Returns:
+        df (pandas df) : S1, S1_conf, ST, ST_conf for each input
+    """
+
+    y = np.asarray(y, dtype=float).reshape(-1, d + 2)
+    s1, st = sobol_estimates(y, d)
+
+    rng = np.random.default_rng(seed)
+    samples = np.array([np.concatenate(sobol_estimates(y[rng.integers(0, len(y), len(y))], d))
+                        for _ in range(bootstrap)])
+    z = stats.norm.ppf(0.5 + confidence / 2)
+    conf = z * samples.std(axis=0, ddof=1)
+
+    return pd.DataFrame({'S1': s1, 'S1_conf': conf[:d], 'ST': st, 'ST_conf': conf[d:]},
+                        index=pd.Index(names, name='input'))
+
+
+def morris_design(d, trajectories, levels=4, seed=0):
+    """ Generates a Morris design of one-at-a-time trajectories on a grid
+
+    Args:
+        d (int) : number of inputs
+        trajectories (int) : number of trajectories (r)
+        levels (int) : number of grid levels (even)
+        seed (int) : random seed
+
+    Returns:
+        unit (numpy array) : trajectories * (d + 1) rows in [0, 1]
+    """
+
+    rng = np.random.default_rng(seed)
+    delta = levels / (2 * (levels - 1))
+    # base points on the grid from which a step of delta stays in [0, 1]
+    grid = np.arange(levels // 2) / (levels - 1)
+
+    unit = np.empty((trajectories, d + 1, d))
+    for t in range(trajectories):
+        signs = rng.choice([-1.0, 1.0], d)
+        x = rng.choice(grid, d) + delta * (signs < 0)
+        unit[t, 0] = x
+        for step, i in enumerate(rng.permutation(d)):
+            x = x.copy()
+            x[i] += signs[i] * delta
+            unit[t, step + 1] = x
+    return unit.reshape(trajectories * (d + 1), d)
+
+
+def morris_indices(unit, y, d, names, bootstrap=500, confidence=0.95, seed=0):
+    """ Computes mu, mu* and sigma of the elementary effects with a bootstrap
+        confidence interval for mu*
+
+    Args:
+        unit (numpy array) : design in morris_design order
+        y (numpy array) : outputs of the design rows
+        d (int) : number of inputs
+        names (list[str]) : input names
+        bootstrap (int) : number of bootstrap resamples of the effects
+        confidence (float) : confidence level
+
+    Returns:
+        df (pandas df) : mu, mu_star, mu_star_conf, sigma for each input
+    """
+
+    unit = np.asarray(unit, dtype=float).reshape(-1, d + 1, d)
+    y = np.asarray(y, dtype=float).reshape(-1, d + 1)
+
+    # each step of a trajectory moves one input; effect = dy / dx (normalised)
+    dx = np.diff(unit, axis=1)
+    moved = np.argmax(np.abs(dx), axis=2)
+    step = np.take_along_axis(dx, moved[:, :, None], axis=2)[:, :, 0]
+    effects = np.empty((len(y), d))
+    rows = np.arange(len(y))[:, None]
+    effects[rows, moved] = np.diff(y, axis=1) / step
+
+    rng = np.random.default_rng(seed)
+    samples = np.array([np.abs(effects[rng.integers(0, len(effects), len(effects))]).mean(axis=0)
+                        for _ in range(bootstrap)])
+    z = stats.norm.ppf(0.5 + confidence / 2)
+
+    return pd.DataFrame({'mu': effects.mean(axis=0),
+                         'mu_star': np.abs(effects).mean(axis=0),
+                         'mu_star_conf': z * samples.std(axis=0, ddof=1),
+                         'sigma': effects.std(axis=0, ddof=1) if len(effects) > 1 else 0.0},
+                        index=pd.Index(names, name='input'))
+
+
+def simulate_design(project, model_index, route, loads_on, df, simulations_output_name,
+                    new_columns):
+    """ Simulates the unique scenarios of a design and returns the results of every row
+
+    Args:
+        project (iesve object) : object
+        model_index (int) : index for real, proposed model etc
+        route (int) : sim (0) or compliance sim flag (1)
+        loads_on (bool) : loads sims on / off
+        df (pandas df) : design scenarios
+        simulations_output_name (str) : output csv file pathname (unique scenarios)
+        new_columns (list (str)) : output metric names
+
+    Returns:
+        df (pandas df) : design scenarios with results added
+    """
+
+    inputs = list(df.columns)
+    unique = df.drop_duplicates().reset_index(drop=True)
+    unique.index.name = 'run'
+    print(f'Design of {len(df)} scenarios; {len(unique)} unique scenarios to simulate')
+
+    results = utils_parametric.simulations(project, model_index, route, loads_on, unique,
+                                           simulations_output_name, new_columns)
+    merged = df.merge(results, on=inputs, how='left')
+    merged.index = df.index
+    return merged
+
+
+def indices(method, unit, df, targets, names, bootstrap=500, confidence=0.95):
+    """ Computes the sensitivity indices of each target
+
+    Args:
+        method (str) : 'sobol' or 'morris'
+        unit (numpy array) : design in [0, 1]
+        df (pandas df) : design scenarios with results
+        targets (list[str]) : output metrics
+        names (list[str]) : input names
+        bootstrap (int) : number of bootstrap resamples
+        confidence (float) : confidence level
+
+    Returns:
+        df (pandas df) : indices with a target column
+    """
+
+    d = len(names)
+    frames = []
+    for target in targets:
+        y = df[target].to_numpy(dtype=float)
+        if method == 'sobol':
+            frame = sobol_indices(y, d, names, bootstrap, confidence)
+        else:
+            frame = morris_indices(unit, y, d, names, bootstrap, confidence)
+        frame.insert(0, 'target', target)
+        frames.append(frame)
+    return pd.concat(frames)
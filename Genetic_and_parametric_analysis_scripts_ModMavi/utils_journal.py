@@ -0,0 +1,115 @@
+"""
+===================================================
+Run journal
+===================================================
+
+Module description
+------------------
+Class to append each simulation result of a parametric sweep or genetic optimization to
+a journal file next to the results csv. Required by utils_parametric.py and
+utils_genetic.py
+
+The results csv is rewritten after every simulation, so opening it (e.g. in Excel) can
+lock the file and stop the run, and a reader has to re-read it in full each time. The
+journal is only ever appended to: one json line per event, written with a short-lived
+append handle that is closed straight away. charting/chart_dashboard.py tails it from
+the last byte read, so monitoring costs the run nothing.
+
+Journal lines:
+
+- {"event": "start", "time": ..., "columns": [...], "targets": [...], "total": ...}
+  written when the run starts (the journal is overwritten); total is the number of
+  planned simulations (None if not known e.g. a genetic optimization)
+- {"event": "result", "time": ..., "run": ..., "values": {...}} for each simulation
+
+Notes
+-----
+The journal name is the results csv name with a .jsonl suffix e.g. Para_sim_table.jsonl
+
+"""
+
+import json
+import time
+from pathlib import Path
+
+
+def journal_path(csv_path):
+    """ Returns the journal pathname of a results csv
+
+    Args:
+        csv_path (str) : results csv pathname
+
+    Returns:
+        path (str) : journal pathname
+    """
+
+    return str(Path(csv_path).with_suffix('.jsonl'))
+
+
+def json_value(value):
+    """ Converts numpy scalars to python values for json
+
+    Args:
+        value : value
+
+    Returns:
+        value : json serialisable value
+    """
+
+    if hasattr(value, 'item'):
+        return value.item()
+    return value
+
+
+class run_journal:
+    """ Append-only journal of a run
+        Pygmo deep copies the problem; the journal is shared by all the copies
+    """
+
+    def __init__(self, csv_path, columns, targets=None, total=None):
+        """ Starts (overwrites) the journal
+
+        Args:
+            csv_path (str) : results csv pathname
+            columns (list[str]) : input names followed by output names
+            targets (list[str], optional) : output names to track the best of
+            total (int, optional) : number of planned simulations
+        """
+        self.path = journal_path(csv_path)
+        self.runs = 0
+        self.write({'event': 'start',
+                    'time': time.time(),
+                    'columns': list(columns),
+                    'targets': list(targets) if targets else [],
+                    'total': total}, 'w')
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def write(self, entry, mode='a'):
+        """ Writes one line; the file is closed straight away
+
+        Args:
+            entry (dict) : journal line
+            mode (str) : 'a' append or 'w' overwrite
+        """
+        line = json.dumps(entry, default=json_value) + '\n'
+        try:
+            with open(self.path, mode, encoding='utf-8') as f:
+                f.write(line)
+        except OSError as error:
+            # the journal must never stop a run
+            print(f'Journal not written: {error}')
+
+    def add(self, values, run=None):
+        """ Appends a simulation result
+
+        Args:
+            values (dict) : column name : value
+            run (int, optional) : run number; None = count of results so far
+        """
+        self.write({'event': 'result',
+                    'time': time.time(),
+                    'run': self.runs if run is None else run,
+                    'values': {key: json_value(value) for key, value in values.items()}})
+        self.runs += 1
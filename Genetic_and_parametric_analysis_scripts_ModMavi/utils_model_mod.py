@@ -9,6 +9,7 @@ Functions for modifying the model and returning simulation results.
 
 """
 import os
+import sys
 import iesve
 import numpy as np
 from os import listdir
@@ -878,6 +879,63 @@ def revise_opaque_constr_u_value(model, value, subtype):
     # To handle inner volumes and differing construction thickness
     model.rebuild_adjacencies()
 
+def get_max_u_value(model, subtype=None):
+    """ Highest U value that the U value functions can reach for the active
+        constructions i.e. with zero insulation layer (opaque) or cavity (glazed)
+        resistance; higher target values cannot be met
+        enum for u-value set to iso to match the U value functions
+
+    Args:
+        model (iesve object) : object
+        subtype (enum, optional) : iesve.element_categories.wall/roof/ground_floor for
+                                   opaque constructions; None for glazed constructions
+
+    Returns:
+        max_u_value (float or None) : lowest limit of the matching constructions
+                                      w/m2.k; None if there are none to revise
+    """
+    active_constr_list = get_active_constructions(model)
+
+    if subtype is None:
+        c_class = iesve.construction_class.glazed
+        is_opaque = False
+    else:
+        c_class = iesve.construction_class.opaque
+        is_opaque = True
+
+    project = get_cdb_project()
+
+    limits = []
+    for constr in project.get_construction_ids(c_class):
+        if constr not in active_constr_list:
+            continue
+        construction = project.get_construction(constr, c_class)
+        if is_opaque and construction.get_properties()['category'] != subtype:
+            continue
+        layers = construction.get_layers()
+
+        # find the layer the U value functions revise (as those functions)
+        index = -1
+        for idx, layer in enumerate(layers):
+            material = layer.get_material(is_opaque)
+            if is_opaque:
+                if material is not None and \
+                        material.get_properties()['category'] == iesve.material_categories.insulating:
+                    index = idx
+            elif material is None:
+                index = idx
+                break
+        if index == -1 or (not is_opaque and len(layers) < 2):
+            continue
+
+        layer_resistance = layers[index].get_properties(iesve.uvalue_types.iso)['resistance']
+        total_resistance = 1 / construction.get_u_factor(iesve.uvalue_types.iso)
+        remaining = total_resistance - layer_resistance
+        if remaining > 0:
+            limits.append(1 / remaining)
+
+    return min(limits) if limits else None
+
 def get_bodies_local_shaded(model):
     """Gets a list of locally shaded bodies from model
 
@@ -1083,6 +1141,11 @@ def summary_vars_map():
         'max_kW':{
         'Boiler_max_kW':('Boilers energy', 'Boilers energy', 'e'),
         'Chiller_max_kW':('Chillers energy', 'Chillers energy', 'e')
+        },
+        'overheating':{
+        'TM52_fail_rooms':('tm52', 'tm52_pass'),
+        'TM52_fail_%':('tm52', 'tm52_pass'),
+        'TM59_fail_rooms':('tm59', 'tm59_pass')
         }
     }
 
@@ -1121,6 +1184,99 @@ def get_end_use_map():
 
     return end_uses_mapping
 
+def import_overheating_engine():
+    """ Imports overheating_engine.py from Software_Scripts/tools (shared with
+        overheating_test.py)
+
+    Returns:
+        module : overheating_engine
+    """
+
+    tools_folder = str(Path(__file__).resolve().parents[1] / 'Software_Scripts' / 'tools')
+    if tools_folder not in sys.path:
+        sys.path.append(tools_folder)
+    import overheating_engine
+    return overheating_engine
+
+
+def overheating_data(results, model):
+    """ Reads the hourly results of all rooms needed for the overheating assessments
+
+    Args:
+        results (iesve object) : open results reader
+        model (iesve object) : model
+
+    Returns:
+        tuple : rooms, operative temperature and occupancy (rooms, hours) and outdoor
+                temperature (hours)
+    """
+
+    engine = import_overheating_engine()
+    rpd = results.results_per_day
+    rooms = get_all_rooms(model)
+    room_temp = np.array([results.get_room_results(body.id, 'Comfort temperature', 'Dry resultant temperature', 'z')
+                          for body in rooms], dtype=float).reshape(len(rooms), -1)
+    occupancy = np.array([results.get_room_results(body.id, 'Number of people', 'Number of people', 'z')
+                          for body in rooms], dtype=float).reshape(len(rooms), -1)
+    outdoor_temp = results.get_weather_results('Temperature', 'Dry-bulb temperature')
+
+    return (rooms, engine.hourly(room_temp, rpd), engine.hourly(occupancy, rpd),
+            engine.hourly(outdoor_temp, rpd))
+
+
+def tm59_rooms(rooms, scheme_name='TM59', bedroom_group='Bedrooms'):
+    """ Finds the rooms assessed with TM59 from a room grouping scheme
+        Rooms in the bedroom group are assessed on criteria a and b, rooms in the other
+        groups of the scheme (living rooms, kitchens) on criterion a only; rooms not in
+        the scheme (corridors, plant) are not assessed
+
+    Args:
+        rooms (list) : iesve room objects
+        scheme_name (str) : room grouping scheme name
+        bedroom_group (str) : name of the bedroom group of the scheme
+
+    Returns:
+        tuple[numpy array, numpy array] : assessed and bedroom masks (rooms)
+    """
+
+    room_groups = iesve.RoomGroups()
+    schemes = [scheme for scheme in room_groups.get_grouping_schemes() if scheme['name'] == scheme_name]
+    if not schemes:
+        raise ValueError(f'TM59 needs a room grouping scheme named {scheme_name}')
+
+    assessed = set()
+    bedrooms = set()
+    for group in room_groups.get_room_groups(schemes[0]['handle']):
+        assessed.update(group['rooms'])
+        if group['name'] == bedroom_group:
+            bedrooms.update(group['rooms'])
+
+    ids = [body.id for body in rooms]
+    return (np.array([id in assessed for id in ids], dtype=bool),
+            np.array([id in bedrooms for id in ids], dtype=bool))
+
+
+def overheating_results(data, assessment):
+    """ Runs an overheating assessment of all rooms (TM52) or of the rooms of the TM59
+        room grouping scheme (see tm59_rooms)
+
+    Args:
+        data (tuple) : overheating_data
+        assessment (str) : 'tm52' or 'tm59'
+
+    Returns:
+        results (dict) : tm52 or tm59 results of overheating_engine
+    """
+
+    engine = import_overheating_engine()
+    rooms, room_temp, occupancy, outdoor_temp = data
+    if assessment == 'tm52':
+        return engine.tm52(room_temp, occupancy, outdoor_temp)
+
+    assessed, bedrooms = tm59_rooms(rooms)
+    return engine.tm59(room_temp[assessed], occupancy[assessed], outdoor_temp, bedrooms[assessed])
+
+
 def get_results(project, aps_name, results_list):
     """ Gets model level sim results and processes the data for output
 
@@ -1162,6 +1318,10 @@ def get_results(project, aps_name, results_list):
     sv_map = summary_vars_map()
     ee_map = get_end_use_map()
 
+    # Overheating results are read and each assessment is run once for all overheating
+    # results
+    overheating = {}
+
     # Get the results data, apply divisor, convert to usable units and round to 2 dp
     # then assign value to dict
     for result in results_list:
@@ -1210,6 +1370,23 @@ def get_results(project, aps_name, results_list):
             except:
                 output[result] = 0
 
+        elif result in sv_map['overheating']:
+            # nan if the assessment fails (the GA penalises it); 0 rooms failing is the best result
+            try:
+                idx = sv_map['overheating'][result]
+                if 'data' not in overheating:
+                    overheating['data'] = overheating_data(results, model)
+                if idx[0] not in overheating:
+                    overheating[idx[0]] = overheating_results(overheating['data'], idx[0])
+                failed = ~overheating[idx[0]][idx[1]]
+                if result.endswith('%'):
+                    output[result] = round(100 * failed.mean(), 2) if len(failed) else 0
+                else:
+                    output[result] = int(failed.sum())
+            except Exception as e:
+                print(f'{result} not calculated: {e}')
+                output[result] = float('nan')
+
         # Energy end use entries:
 
         elif result in ee_map:
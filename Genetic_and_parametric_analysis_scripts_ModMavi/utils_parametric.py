@@ -18,9 +18,11 @@ from typing import List
 from pathlib import Path
 from itertools import product
 import utils_model_mod
+import utils_journal
 
 from importlib import reload
 reload(utils_model_mod)
+reload(utils_journal)
 
 
 def diagnose_templates(project):
@@ -79,11 +81,13 @@ def reset_changes(project, model_index, df):
 
     utils_model_mod.apply_model_modifications(project, model, df.columns, df.loc[df.index[0]])
 
-def simulations(project, model_index, route, loads_on, df: pd.DataFrame, simulations_output_name, new_columns: List[str]):
+def simulations(project, model_index, route, loads_on, df: pd.DataFrame, simulations_output_name, new_columns: List[str],
+                sim_options=None):
     """ Modifies the specified model for each scenario
         Thus each successive scenario overwrites the last
         Optionally runs sizing and thermal simulations for each scenario
         Deletes output files after the results have been extracted
+        Appends each result to a journal for chart_dashboard.py (see utils_journal.py)
 
     Args:
         project (iesve object) : object
@@ -93,6 +97,9 @@ def simulations(project, model_index, route, loads_on, df: pd.DataFrame, simulat
         df (pandas df) : list of scenarios & assignments
         simulations_output_name (str) : output csv file pathname
         new_columns (list (str)) : aps variable names
+        sim_options (dict, optional) : ApacheSim options for these simulations e.g. a
+                                       coarse timestep (see utils_fidelity.py); the
+                                       previous options are restored at the end
 
     Returns:
         df2 (pandas df) : dataframe of scenarios with results added
@@ -103,12 +110,21 @@ def simulations(project, model_index, route, loads_on, df: pd.DataFrame, simulat
     project_folder = project.path
     sim = iesve.ApacheSim()
 
+    # Optional simulation options e.g. a fidelity ladder level
+    base_options = None
+    if sim_options:
+        base_options = sim.get_options()
+        sim.set_options(sim_options)
+
     # As you should not modify something you are iterating over we will make a copy of df
     # We add labelled columns to the dataframe for the required simulation results
     df2 = df.copy()
     for column in new_columns:
         df2[column] = 0.0
 
+    # Journal of the results for chart_dashboard.py (the csv is rewritten each time)
+    journal = utils_journal.run_journal(simulations_output_name, df2.columns, total=len(df))
+
     # Iterate over the the scenarios in the df
     # iterrows is slow but the VE simulations are the speed limiting factor here
     # and iterrows facilitates using row index and column names for easy access
@@ -224,6 +240,7 @@ def simulations(project, model_index, route, loads_on, df: pd.DataFrame, simulat
             # Export results
             # Includes an index in the export to match with the aps filename suffix
             df2.to_csv(simulations_output_name, encoding='utf-8', index=True)
+            journal.add(df2.loc[index].to_dict(), index)
 
             # Allow time for resources to be freed
             # For UK Compliance allow BRUKL additional process to complete
@@ -240,3 +257,8 @@ def simulations(project, model_index, route, loads_on, df: pd.DataFrame, simulat
                     os.remove(path)
                 except:
                     pass
+
+    if base_options is not None:
+        sim.set_options(base_options)
+
+    return df2
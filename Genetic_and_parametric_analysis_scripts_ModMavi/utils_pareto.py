@@ -0,0 +1,153 @@
+"""
+===================================================
+Genetic optimization - Pareto archive
+===================================================
+
+Module description
+------------------
+Class to keep the non-dominated set (Pareto front) of every simulation of a
+multi-objective optimization as it runs. Required by ga_mo.py
+
+The archive is updated after each simulation and saved to csv (inputs and outputs of
+the front only) so the current front can be charted with chart_parallel.py at any time.
+The hypervolume and the front size are logged each generation; utils_run_control.py
+uses the hypervolume to stop the run early when it stops improving.
+
+Notes
+-----
+The hypervolume reference point should be worse than every point of interest in all
+objectives. If it is not set it is taken from the worst values of the initial
+population plus 10% of their range and then held fixed, so that the hypervolume of
+successive generations can be compared. Front points that do not dominate the reference
+point do not add to the hypervolume.
+
+"""
+
+import numpy as np
+import pandas as pd
+import pygmo as pg
+
+
+def dominates(a, b):
+    """ Tests whether fitness vector a dominates b (minimisation)
+
+    Args:
+        a (numpy array) : fitness vector
+        b (numpy array) : fitness vector
+
+    Returns:
+        bool : True if a is no worse in every objective and better in at least one
+    """
+
+    return bool(np.all(a <= b) and np.any(a < b))
+
+
+class pareto_archive:
+    """ Online non-dominated archive of simulation results
+        Pygmo deep copies the problem; the archive is shared by all the copies so that
+        no update is lost
+    """
+
+    def __init__(self, archive_path, cols_list, ref_point=None):
+        """ Initialise class variables
+
+        Args:
+            archive_path (str) : csv file pathname for the front; overwritten
+            cols_list (list[str]) : input names followed by output names
+            ref_point (list[float], optional) : hypervolume reference point; None = set
+                                                from the initial population
+        """
+        self.archive_path = archive_path
+        self.cols_list = cols_list
+        self.ref_point = None if ref_point is None else np.array(ref_point, dtype=float)
+
+        # front members: fitness vectors and csv rows in the same order
+        self.fs = []
+        self.rows = []
+        self.evaluations = 0
+        # worst and best values seen; used to set the reference point
+        self.worst = None
+        self.best = None
+        # per generation log rows
+        self.history = []
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def add(self, data, output, f):
+        """ Offers a simulation result to the archive and saves the front if it changed
+
+        Args:
+            data (dict) : input name : value
+            output (dict) : output name : value
+            f (list[float]) : target values (fitness vector)
+
+        Returns:
+            bool : True if the result joined the front
+        """
+        f = np.array(f, dtype=float)
+        self.evaluations += 1
+        self.worst = f.copy() if self.worst is None else np.maximum(self.worst, f)
+        self.best = f.copy() if self.best is None else np.minimum(self.best, f)
+
+        for member in self.fs:
+            if dominates(member, f) or np.array_equal(member, f):
+                return False
+
+        keep = [i for i, member in enumerate(self.fs) if not dominates(f, member)]
+        self.fs = [self.fs[i] for i in keep] + [f]
+        self.rows = [self.rows[i] for i in keep] + [list(data.values()) + list(output.values())]
+        self.save()
+        return True
+
+    def save(self):
+        """ Saves / overwrites the front to the csv file
+        """
+        df = pd.DataFrame(self.rows, columns=self.cols_list)
+        df.index.name = 'member'
+        df.to_csv(self.archive_path, index=True)
+
+    def hypervolume(self):
+        """ Returns the hypervolume of the front; fixes the reference point on the
+            first call if it has not been set
+
+        Returns:
+            hv (float) : hypervolume (0 if no member dominates the reference point)
+        """
+        if not self.fs:
+            return 0.0
+        if self.ref_point is None:
+            span = np.where(self.worst > self.best, self.worst - self.best, 1.0)
+            self.ref_point = self.worst + 0.1 * span
+            print(f'Hypervolume reference point set to {self.ref_point}')
+
+        points = np.array([f for f in self.fs if np.all(f < self.ref_point)])
+        if len(points) == 0:
+            return 0.0
+        return float(pg.hypervolume(points).compute(self.ref_point))
+
+    def log_generation(self, generation):
+        """ Prints and stores the hypervolume and front size
+
+        Args:
+            generation (int) : generation number (0 is the initial population)
+
+        Returns:
+            hv (float) : hypervolume
+        """
+        hv = self.hypervolume()
+        self.history.append({'generation': generation,
+                             'evaluations': self.evaluations,
+                             'front_size': len(self.fs),
+                             'hypervolume': hv})
+        print(f'Pareto archive generation {generation}: {len(self.fs)} members, '
+              f'hypervolume {hv:.6g}')
+        return hv
+
+    def get_front(self):
+        """ Returns the front as a dataframe
+
+        Returns:
+            df (pandas df) : inputs and outputs of the front members
+        """
+        return pd.DataFrame(self.rows, columns=self.cols_list)
@@ -0,0 +1,200 @@
+"""
+===================================================
+Genetic optimization - run controller
+===================================================
+
+Module description
+------------------
+Class to evolve a Pygmo population one generation at a time and stop the run when it
+has converged or its budget is spent. Required by ga_so.py and ga_mo.py
+
+After each generation the controller logs:
+
+- the champion fitness (single objective) or the Pareto archive hypervolume and front
+  size (multi-objective; see utils_pareto.py)
+- the population diversity (mean distance of the decision vectors from their centroid,
+  bounds-normalised, so 0 = collapsed onto one point)
+- the number of simulations and the wall-clock time
+
+The run stops at the first of:
+
+- the maximum number of generations
+- a stall: the relative improvement over the last stall_generations generations is
+  below stall_tolerance
+- a diversity collapse below min_diversity (optional)
+- the wall-clock or simulation budget; the cost of the next generation is estimated
+  from the generations so far, so a generation is not started if it would overrun
+
+The log is saved to csv after each generation for post-hoc analysis (see the plot
+example at the end of ga_so.py).
+
+Notes
+-----
+The algorithm must be set to one generation per evolve call (gen=1). Set memory=True
+on pso_gen so that the particle velocities carry over between calls.
+
+"""
+
+import time
+import numpy as np
+import pandas as pd
+import utils_genetic
+
+
+def diversity(pop):
+    """ Mean distance of the decision vectors from their centroid (bounds-normalised)
+
+    Args:
+        pop (pygmo population) : population
+
+    Returns:
+        diversity (float) : mean normalised distance
+    """
+
+    xs = np.array(pop.get_x(), dtype=float)
+    if len(xs) == 0:
+        return 0.0
+    lower, upper = [np.array(bound, dtype=float) for bound in pop.problem.get_bounds()]
+    span = np.where(upper > lower, upper - lower, 1.0)
+    xn = (xs - lower) / span
+    return float(np.mean(np.linalg.norm(xn - xn.mean(axis=0), axis=1)))
+
+
+class run_controller:
+
+    def __init__(self, generations, stall_generations=5, stall_tolerance=0.001,
+                 min_diversity=None, max_seconds=None, max_simulations=None, log_path=None):
+        """ Initialise class variables
+
+        Args:
+            generations (int) : maximum number of generations
+            stall_generations (int) : generations to look back over for the stall test
+            stall_tolerance (float) : relative improvement treated as a stall
+            min_diversity (float, optional) : stop when the population diversity falls
+                                              below this value
+            max_seconds (float, optional) : wall-clock budget for the evolution
+            max_simulations (int, optional) : simulation budget (incl. the initial
+                                              population)
+            log_path (str, optional) : csv file pathname for the generation log
+        """
+        self.generations = generations
+        self.stall_generations = stall_generations
+        self.stall_tolerance = stall_tolerance
+        self.min_diversity = min_diversity
+        self.max_seconds = max_seconds
+        self.max_simulations = max_simulations
+        self.log_path = log_path
+        self.history = []
+        self.stop_reason = None
+
+    def log_generation(self, generation, pop, udp, archive, start):
+        """ Adds a generation to the log, prints it and saves the log
+
+        Args:
+            generation (int) : generation number (0 is the initial population)
+            pop (pygmo population) : population
+            udp (ga_function) : optimization problem
+            archive (pareto_archive or None) : Pareto archive (multi-objective)
+            start (float) : evolution start time
+
+        Returns:
+            entry (dict) : log row
+        """
+        entry = {'generation': generation,
+                 'fevals': pop.problem.get_fevals(),
+                 'simulations': len(udp.dump.df_dump),
+                 'seconds': time.time() - start,
+                 'diversity': diversity(pop)}
+        if archive is not None:
+            entry['front_size'] = len(archive.fs)
+            entry['hypervolume'] = archive.log_generation(generation)
+            entry['metric'] = -entry['hypervolume']
+        else:
+            for name, value in zip(udp.target, pop.champion_f):
+                entry[name] = value
+            entry['metric'] = float(pop.champion_f[0])
+        self.history.append(entry)
+
+        print(f'Generation {generation}: metric {entry["metric"]:.6g}, diversity '
+              f'{entry["diversity"]:.3f}, {entry["simulations"]} simulations, '
+              f'{entry["seconds"]:.0f} s')
+
+        if self.log_path is not None:
+            pd.DataFrame(self.history).to_csv(self.log_path, index=False)
+        return entry
+
+    def stalled(self):
+        """ Tests whether the metric has stopped improving (minimisation)
+
+        Returns:
+            bool : True if the relative improvement over the last stall_generations
+                   generations is below stall_tolerance
+        """
+        if len(self.history) <= self.stall_generations:
+            return False
+        old = self.history[-1 - self.stall_generations]['metric']
+        new = self.history[-1]['metric']
+        improvement = (old - new) / abs(old) if old != 0 else old - new
+        return improvement < self.stall_tolerance
+
+    def over_budget(self):
+        """ Tests whether the next generation would overrun the wall-clock or simulation
+            budget, estimated from the mean cost of the generations so far
+
+        Returns:
+            reason (str or None) : the budget that would be overrun
+        """
+        last = self.history[-1]
+        generations = len(self.history) - 1
+        if generations == 0:
+            # only the initial population; no estimate yet
+            per_seconds = 0.0
+            per_simulations = 0.0
+        else:
+            per_seconds = (last['seconds'] - self.history[0]['seconds']) / generations
+            per_simulations = (last['simulations'] - self.history[0]['simulations']) / generations
+
+        if self.max_seconds is not None and last['seconds'] + per_seconds > self.max_seconds:
+            return 'wall-clock budget'
+        if self.max_simulations is not None and \
+                last['simulations'] + per_simulations > self.max_simulations:
+            return 'simulation budget'
+        return None
+
+    def evolve(self, algo, pop, archive=None):
+        """ Evolves the population one generation at a time until a stop criterion
+
+        Args:
+            algo (pygmo algorithm) : algorithm set to one generation per call
+            pop (pygmo population) : evaluated initial population
+            archive (pareto_archive, optional) : Pareto archive for multi-objective runs;
+                                                 the hypervolume is then the metric
+
+        Returns:
+            pop (pygmo population) : evolved population
+        """
+        udp = pop.problem.extract(utils_genetic.ga_function)
+        start = time.time()
+        self.log_generation(0, pop, udp, archive, start)
+
+        self.stop_reason = 'maximum generations'
+        for generation in range(1, self.generations + 1):
+            reason = self.over_budget()
+            if reason is not None:
+                self.stop_reason = reason
+                break
+
+            pop = algo.evolve(pop)
+            entry = self.log_generation(generation, pop, udp, archive, start)
+
+            if self.stalled():
+                self.stop_reason = (f'improvement below {self.stall_tolerance} over '
+                                    f'{self.stall_generations} generations')
+                break
+            if self.min_diversity is not None and entry['diversity'] < self.min_diversity:
+                self.stop_reason = 'diversity collapse'
+                break
+
+        print(f'Evolution stopped after generation {self.history[-1]["generation"]}: '
+              f'{self.stop_reason}')
+        return pop
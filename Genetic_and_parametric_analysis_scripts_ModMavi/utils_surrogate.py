@@ -0,0 +1,316 @@
+"""
+===================================================
+Genetic optimization - surrogate-assisted utilities
+===================================================
+
+Module description
+------------------
+Surrogate-assisted optimization for expensive simulations. Required by ga_so.py and
+ga_mo.py when surrogate mode is set.
+
+Each iteration:
+
+- fits a Gaussian process surrogate to every simulation so far
+- runs the Pygmo algorithm against the surrogate expected improvement (cheap; no
+  simulations)
+- simulates only the top candidates by expected improvement
+
+Multi-objective targets use ParEGO: each iteration the normalised objectives are combined
+with a random weight vector (augmented Tchebycheff), so successive iterations fill in
+different parts of the Pareto front.
+
+The number of true simulations is reported each iteration; cached input sets (see
+utils_genetic.fitness_cache) cost nothing and are not counted.
+
+Notes
+-----
+Surrogates work best with a small number of inputs (< ~10) and a smooth response; start
+with 5-10 x the number of inputs as initial simulations.
+
+"""
+
+import numpy as np
+import pygmo as pg
+import utils_genetic
+from scipy import optimize, stats
+from scipy.linalg import cho_factor, cho_solve
+
+
+class gaussian_process:
+    """ Gaussian process regression with an anisotropic squared exponential kernel
+        Inputs are expected in [0, 1]; outputs are standardised internally
+    """
+
+    def __init__(self, noise=1e-6):
+        """ Initialise class variables
+
+        Args:
+            noise (float) : minimum noise variance (standardised units) for stability
+        """
+        self.noise = noise
+
+    def kernel(self, xa, xb, length):
+        """ Squared exponential kernel matrix
+
+        Args:
+            xa (numpy array) : inputs (n, d)
+            xb (numpy array) : inputs (m, d)
+            length (numpy array) : length scales (d)
+
+        Returns:
+            k (numpy array) : kernel matrix (n, m)
+        """
+        diff = (xa[:, None, :] - xb[None, :, :]) / length
+        return np.exp(-0.5 * np.sum(diff ** 2, axis=2))
+
+    def negative_log_likelihood(self, params):
+        """ Negative log marginal likelihood for log length scales, log signal variance
+            and log noise variance
+
+        Args:
+            params (numpy array) : log hyperparameters
+
+        Returns:
+            nll (float) : negative log marginal likelihood
+        """
+        d = self.x.shape[1]
+        length = np.exp(params[:d])
+        signal = np.exp(params[d])
+        noise = np.exp(params[d + 1]) + self.noise
+        k = signal * self.kernel(self.x, self.x, length) + noise * np.eye(len(self.x))
+        try:
+            factor = cho_factor(k, lower=True)
+        except np.linalg.LinAlgError:
+            return 1e10
+        alpha = cho_solve(factor, self.y)
+        return 0.5 * self.y @ alpha + np.sum(np.log(np.diag(factor[0])))
+
+    def fit(self, x, y):
+        """ Fits the hyperparameters by maximum likelihood
+
+        Args:
+            x (numpy array) : inputs (n, d) in [0, 1]
+            y (numpy array) : outputs (n)
+
+        Returns:
+            self (gaussian_process)
+        """
+        self.x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        self.y_mean = y.mean()
+        self.y_std = y.std() if y.std() > 0 else 1.0
+        self.y = (y - self.y_mean) / self.y_std
+
+        d = self.x.shape[1]
+        start = np.concatenate([np.full(d, np.log(0.3)), [0.0, np.log(1e-2)]])
+        bounds = [(np.log(1e-2), np.log(10.0))] * d + [(np.log(1e-2), np.log(10.0)),
+                                                        (np.log(1e-8), np.log(1.0))]
+        result = optimize.minimize(self.negative_log_likelihood, start, method='L-BFGS-B',
+                                   bounds=bounds)
+        params = result.x
+
+        self.length = np.exp(params[:d])
+        self.signal = np.exp(params[d])
+        noise = np.exp(params[d + 1]) + self.noise
+        k = self.signal * self.kernel(self.x, self.x, self.length) + noise * np.eye(len(self.x))
+        self.factor = cho_factor(k, lower=True)
+        self.alpha = cho_solve(self.factor, self.y)
+        return self
+
+    def predict(self, x):
+        """ Predicts the mean and standard deviation
+
+        Args:
+            x (numpy array) : inputs (m, d) in [0, 1]
+
+        Returns:
+            tuple[numpy array, numpy array] : mean (m), standard deviation (m)
+        """
+        x = np.atleast_2d(x)
+        k_star = self.signal * self.kernel(x, self.x, self.length)
+        mean = k_star @ self.alpha
+        v = cho_solve(self.factor, k_star.T)
+        var = np.maximum(self.signal - np.sum(k_star * v.T, axis=1), 1e-12)
+        return mean * self.y_std + self.y_mean, np.sqrt(var) * self.y_std
+
+
+def expected_improvement(mean, std, best):
+    """ Expected improvement below the best value (minimisation)
+
+    Args:
+        mean (numpy array) : predicted mean
+        std (numpy array) : predicted standard deviation
+        best (float) : best value so far
+
+    Returns:
+        ei (numpy array) : expected improvement
+    """
+    z = (best - mean) / std
+    return (best - mean) * stats.norm.cdf(z) + std * stats.norm.pdf(z)
+
+
+def scalarise(fs, weights, rho=0.05):
+    """ Augmented Tchebycheff scalarisation of normalised objectives (ParEGO)
+
+    Args:
+        fs (numpy array) : fitness vectors (n, nobj)
+        weights (numpy array) : weights (nobj) summing to 1
+        rho (float) : augmentation factor
+
+    Returns:
+        y (numpy array) : scalar values (n)
+    """
+    low = fs.min(axis=0)
+    span = np.where(fs.max(axis=0) > low, fs.max(axis=0) - low, 1.0)
+    weighted = weights * (fs - low) / span
+    return weighted.max(axis=1) + rho * weighted.sum(axis=1)
+
+
+class surrogate_problem:
+    """ Pygmo problem minimising the negative expected improvement of a surrogate
+    """
+
+    def __init__(self, gp, lower, upper, best):
+        """ Initialise class variables
+
+        Args:
+            gp (gaussian_process) : fitted surrogate
+            lower (numpy array) : lower bounds
+            upper (numpy array) : upper bounds
+            best (float) : best value so far
+        """
+        self.gp = gp
+        self.lower = np.asarray(lower, dtype=float)
+        self.upper = np.asarray(upper, dtype=float)
+        self.best = best
+
+    def normalise(self, x):
+        span = np.where(self.upper > self.lower, self.upper - self.lower, 1.0)
+        return (np.atleast_2d(x) - self.lower) / span
+
+    def fitness(self, x):
+        mean, std = self.gp.predict(self.normalise(x))
+        return [-float(expected_improvement(mean, std, self.best)[0])]
+
+    def batch_fitness(self, dvs):
+        xs = np.reshape(dvs, (-1, len(self.lower)))
+        mean, std = self.gp.predict(self.normalise(xs))
+        return -expected_improvement(mean, std, self.best)
+
+    def get_bounds(self):
+        return (list(self.lower), list(self.upper))
+
+
+def surrogate_optimise(prob, pop, iterations, batch_size, uda=None, clone_pool=None,
+                       max_simulations=None, min_distance=0.05, seed=None):
+    """ Runs surrogate-assisted optimization from an evaluated population
+
+    Args:
+        prob (pygmo problem) : problem wrapping a ga_function
+        pop (pygmo population) : initial evaluated population (random or warm-started)
+        iterations (int) : number of surrogate iterations
+        batch_size (int) : number of candidates simulated per iteration
+        uda (pygmo algorithm, optional) : single objective algorithm run on the
+                                          surrogate; defaults to pso_gen
+        clone_pool (project_clone_pool, optional) : pool of project copies
+        max_simulations (int, optional) : stop when this many simulations have run
+        min_distance (float) : minimum distance (bounds-normalised) between a candidate
+                               and any simulated or other candidate point, so a batch
+                               does not spend simulations on near-identical models
+        seed (int, optional) : random seed for weights and the surrogate algorithm
+
+    Returns:
+        tuple[numpy array, numpy array, int] : all evaluated decision vectors, fitness
+            vectors and the number of true simulations run (including the initial
+            population)
+    """
+
+    udp = prob.extract(utils_genetic.ga_function)
+    rng = np.random.default_rng(seed)
+    lower, upper = [np.array(bound, dtype=float) for bound in prob.get_bounds()]
+
+    # Evaluated points; repeats of an effective input set are dropped. Only the targets
+    # are modelled (constraints in pygmo mode are not)
+    nobj = udp.get_nobj()
+    nf = prob.get_nf()
+    xs = np.array([udp.canonical_x(x) for x in pop.get_x()])
+    xs, unique = np.unique(xs, axis=0, return_index=True)
+    fs = np.array(pop.get_f())[unique][:, :nobj]
+
+    if uda is None:
+        uda = pg.pso_gen(gen=50, seed=int(rng.integers(1000000)))
+    algo = pg.algorithm(uda)
+
+    for iteration in range(iterations):
+        # Do not run past the simulation budget
+        number = batch_size
+        if max_simulations is not None:
+            number = min(batch_size, max_simulations - udp.dump.simulations)
+            if number <= 0:
+                print('Simulation budget reached; stopping')
+                break
+
+        # Penalised points (failed, pre-screened or infeasible in penalty mode) would
+        # flatten the standardised surrogate; they are clipped to the worst feasible
+        # values so they still mark the region as poor
+        fit_fs = fs
+        feasible = (fs < udp.penalty).all(axis=1)
+        if feasible.any():
+            fit_fs = np.minimum(fs, fs[feasible].max(axis=0))
+
+        # Scalarise multiple objectives with a random weight vector (ParEGO)
+        if nobj == 1:
+            y = fit_fs[:, 0]
+        else:
+            weights = rng.dirichlet(np.ones(nobj))
+            y = scalarise(fit_fs, weights)
+
+        # Fit the surrogate on all evaluated points
+        span = np.where(upper > lower, upper - lower, 1.0)
+        gp = gaussian_process().fit((xs - lower) / span, y)
+
+        # Search the surrogate; start from the best evaluated points
+        sp = pg.problem(surrogate_problem(gp, lower, upper, y.min()))
+        sur_pop = pg.population(sp, 0)
+        for i in np.argsort(y)[:10]:
+            sur_pop.push_back(xs[i])
+        while len(sur_pop) < 50:
+            sur_pop.push_back(sur_pop.random_decision_vector())
+        sur_pop = algo.evolve(sur_pop)
+
+        # Pick the top candidates by expected improvement from the searched population
+        # and a random sample (the population may have collapsed onto one point), each
+        # at least min_distance from the simulated points and the other candidates
+        pool = np.vstack([sur_pop.get_x(), lower + rng.random((1000, len(lower))) * span])
+        pool = np.array([udp.canonical_x(x) for x in pool])
+        ei = -sp.batch_fitness(pool.flatten())
+        taken = list((xs - lower) / span)
+        candidates = []
+        for i in np.argsort(-ei):
+            xn = (pool[i] - lower) / span
+            if np.min(np.linalg.norm(np.array(taken) - xn, axis=1)) < min_distance:
+                continue
+            taken.append(xn)
+            candidates.append(pool[i])
+            if len(candidates) >= number:
+                break
+
+        if not candidates:
+            print(f'Surrogate iteration {iteration}: no new candidates; stopping')
+            break
+
+        # Truly simulate the candidates
+        new_f = udp.evaluate_batch(np.concatenate(candidates), clone_pool)
+        xs = np.vstack([xs] + candidates)
+        fs = np.vstack([fs, np.reshape(new_f, (-1, nf))[:, :nobj]])
+
+        simulations = udp.dump.simulations
+        print(f'Surrogate iteration {iteration}: {len(candidates)} candidates, best '
+              f'{fs.min(axis=0)}, {simulations} simulations used')
+
+        if max_simulations is not None and simulations >= max_simulations:
+            print('Simulation budget reached; stopping')
+            break
+
+    simulations = udp.dump.simulations
+    return xs, fs, simulations
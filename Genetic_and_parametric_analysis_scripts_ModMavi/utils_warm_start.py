@@ -0,0 +1,230 @@
+"""
+===================================================
+Genetic optimization - warm start utilities
+===================================================
+
+Module description
+------------------
+Functions to seed a genetic optimization population from the result tables of earlier
+studies on the same project (Para_sim_table.csv from parametric_uncertainty.py, the
+sensitivity csv files from parametric_sensitivity.py and GA_*_output.csv dumps from
+ga_so.py / ga_mo.py). Required by ga_so.py and ga_mo.py
+
+The rows are added to the population with their recorded outputs so they are not
+simulated again. A share of the seeds are the best rows and the rest are picked to be as
+different from each other as possible so that the search does not collapse onto one
+region straight away.
+
+Notes
+-----
+A row can only be used if it holds every optimization input and every target; the
+inputs that are not in a table are unknown (the model state at the time), so tables
+that do not cover all inputs are skipped. Numeric inputs outside the bounds and string
+inputs not in mapped_ids are skipped too. Rows with a fidelity column (GA runs with a
+fidelity ladder) are only used if they were simulated at full fidelity.
+
+Only seed from studies run with the same model and sim options; the recorded outputs
+are taken as they are.
+
+"""
+
+import math
+import numpy as np
+import pandas as pd
+import pygmo as pg
+import utils_genetic
+from pathlib import Path
+
+
+def find_result_tables(project_folder):
+    """ Lists the result tables in the project folder that may hold seeds
+
+    Args:
+        project_folder (str) : project folder path
+
+    Returns:
+        table_paths (list[str]) : csv file pathnames
+    """
+
+    return [str(path) for path in sorted(Path(project_folder).glob('*.csv'))]
+
+
+def load_seeds(udp, table_paths, prime_cache=False):
+    """ Loads the usable rows of the result tables as decision and fitness vectors
+
+    Args:
+        udp (ga_function) : optimization problem
+        table_paths (list[str]) : csv file pathnames
+        prime_cache (bool) : also add the rows to the fitness cache (if set)
+
+    Returns:
+        tuple[numpy array, numpy array] : decision vectors, fitness vectors
+    """
+
+    # Decision vectors are in the problem input order (mapped ids last)
+    inputs = list(udp.input_order)
+    # Fitness values are in outputs order (see ga_function.target_values)
+    targets = [col for col in udp.outputs if col in udp.target]
+    # outputs needed for the output constraints (if any)
+    required = targets + [col for col in udp.constraint_outputs() if col not in targets]
+    lower, upper = [np.array(bound, dtype=float) for bound in udp.get_bounds()]
+    # Name of the full fidelity level in the fidelity column (GA runs with a ladder)
+    full = 'full' if udp.ladder is None else udp.ladder.name(udp.ladder.top)
+
+    xs = []
+    fs = []
+    seen = set()
+    for table_path in table_paths:
+        try:
+            df = pd.read_csv(table_path)
+        except (OSError, ValueError):
+            print(f'Seed table {table_path} could not be read; skipped')
+            continue
+
+        missing = [col for col in inputs + required if col not in df.columns]
+        if missing:
+            print(f'Seed table {Path(table_path).name} skipped; missing columns {missing}')
+            continue
+
+        # Screening rows (below full fidelity) are not real results
+        if 'fidelity' in df.columns:
+            screened = df['fidelity'] != full
+            if screened.any():
+                print(f'Seed table {Path(table_path).name}: {int(screened.sum())} rows below full fidelity skipped')
+            df = df[~screened]
+
+        count = 0
+        for _, row in df.iterrows():
+            # Skip failed simulations and empty rows (missing or non-finite outputs);
+            # zero is a valid result (e.g. no rooms failing an overheating assessment)
+            try:
+                f = row[targets].to_numpy(dtype=float)
+                values = row[required].to_numpy(dtype=float)
+            except (TypeError, ValueError):
+                continue
+            if not np.isfinite(values).all():
+                continue
+
+            # Map string inputs back to their index
+            x = []
+            for key in inputs:
+                value = row[key]
+                if key in udp.mapped_ids:
+                    if value not in udp.mapped_ids[key]:
+                        break
+                    value = udp.mapped_ids[key].index(value)
+                try:
+                    x.append(float(value))
+                except (TypeError, ValueError):
+                    break
+            if len(x) != len(inputs):
+                continue
+
+            x = np.array(x)
+            if np.isnan(x).any() or (x < lower).any() or (x > upper).any():
+                continue
+
+            # Keep the first occurrence of each effective input set
+            x = udp.canonical_x(x)
+            if tuple(x) in seen:
+                continue
+            seen.add(tuple(x))
+
+            # Fitness vector with the constraints (penalised or in pygmo form)
+            data = udp.decode(x)
+            outputs = {col: row[col] for col in udp.outputs if col in df.columns}
+            xs.append(x)
+            fs.append(udp.fitness_vector(list(f), data, outputs))
+            count += 1
+
+            if prime_cache and udp.cache is not None:
+                udp.cache.put(data, outputs)
+
+        print(f'Seed table {Path(table_path).name}: {count} usable rows')
+
+    nf = len(targets) + udp.get_nec() + udp.get_nic()
+    return np.array(xs).reshape(-1, len(inputs)), np.array(fs).reshape(-1, nf)
+
+
+def select_seeds(xs, fs, number, lower, upper, best_fraction=0.5):
+    """ Selects the best and most diverse rows
+        The best rows are taken first (ranked by fitness, or by non-dominated front and
+        crowding distance for multi-objective problems); the rest are added one at a
+        time as the row furthest (in bounds-normalised input space) from those already
+        selected
+
+    Args:
+        xs (numpy array) : decision vectors
+        fs (numpy array) : fitness vectors
+        number (int) : number of seeds to select
+        lower (list[float]) : lower bounds
+        upper (list[float]) : upper bounds
+        best_fraction (float) : share of the seeds taken as the best rows
+
+    Returns:
+        indices (list[int]) : selected row indices
+    """
+
+    number = min(number, len(xs))
+    if number == 0:
+        return []
+
+    if fs.shape[1] == 1:
+        order = np.argsort(fs[:, 0], kind='stable')
+    else:
+        order = pg.sort_population_mo(fs)
+    order = [int(i) for i in order]
+
+    n_best = max(1, math.ceil(number * best_fraction))
+    selected = order[:n_best]
+
+    # Normalise inputs so that each has equal weight in the distance
+    span = np.where(np.array(upper) > np.array(lower), np.array(upper) - np.array(lower), 1.0)
+    xn = (xs - np.array(lower)) / span
+
+    # Distance from each row to its nearest selected row
+    distance = np.min(np.linalg.norm(xn[:, None, :] - xn[None, selected, :], axis=2), axis=1)
+    while len(selected) < number:
+        distance[selected] = -1.0
+        index = int(np.argmax(distance))
+        selected.append(index)
+        distance = np.minimum(distance, np.linalg.norm(xn - xn[index], axis=1))
+
+    return selected
+
+
+def seeded_population(prob, pop_size, table_paths, seed_fraction=0.5, b=None, prime_cache=False):
+    """ Creates a population with seeds from earlier result tables
+        The seeds are added with their recorded fitness (no simulation); the rest of the
+        population is random and is evaluated as normal
+
+    Args:
+        prob (pygmo problem) : problem wrapping a ga_function
+        pop_size (int) : population size
+        table_paths (list[str]) : csv file pathnames
+        seed_fraction (float) : maximum share of the population taken from the tables
+        b (pygmo bfe, optional) : batch fitness evaluator for the random individuals
+        prime_cache (bool) : also add all usable rows to the fitness cache
+
+    Returns:
+        pop (pygmo population) : population
+    """
+
+    # Load the tables before any simulation as the run overwrites its own csv dump
+    udp = prob.extract(utils_genetic.ga_function)
+    xs, fs = load_seeds(udp, table_paths, prime_cache)
+
+    lower, upper = prob.get_bounds()
+    # rank on the targets only (constraints follow them in pygmo mode)
+    indices = select_seeds(xs, fs[:, :udp.get_nobj()], int(round(pop_size * seed_fraction)),
+                           lower, upper)
+    print(f'Warm start: {len(indices)} seeds from {len(xs)} usable rows')
+
+    # The random individuals are distinct models that do not repeat a seed
+    pop = utils_genetic.unique_population(prob, pop_size - len(indices), b=b,
+                                          exclude=[xs[i] for i in indices])
+    for i in indices:
+        pop.push_back(xs[i], fs[i])
+    utils_genetic.fill_population(pop, pop_size)
+
+    return pop
@@ -1,7 +1,10 @@
 import base64
 import csv
 import datetime
+import io
 import json
+import os
+import time
 
 import numpy as np
 import pandas as pd
@@ -103,6 +106,11 @@ def load(fp):
 def loads(s):
     """Creates an APPFile object from a newline-delimited string.
 
+    Numeric columns are parsed in one pass by the pandas C parser and the
+    timestamps are generated from the first timestamp and the header rpd
+    (checked against the file). Columns that are not entirely numeric, and
+    files the fast path cannot read, are parsed row by row.
+
     Args:
         s (str): Newline-delimited string representing the APP file.
 
@@ -114,7 +122,26 @@ def loads(s):
     header = lines[0]
     names, variables, metadata = parse_header(header)
 
-    reader = csv.DictReader(lines[1:], fieldnames=names)
+    try:
+        parse_columns(lines[1:], names, variables)
+    except (ValueError, pd.errors.ParserError):
+        # the file has ragged rows or another irregularity; parse it row by row
+        for name in names:
+            variables[name]['data'] = []
+        parse_rows(lines[1:], names, variables)
+
+    return APPFile(variables, order=names, global_metadata=metadata)
+
+def parse_rows(lines, names, variables):
+    """Parses the body of an APP file row by row into the variables dict.
+
+    Args:
+        lines (list[str]): The body lines (no header).
+        names (list[str]): The variable names in column order.
+        variables (dict): The variables dict from parse_header; the data
+            lists are appended to.
+    """
+    reader = csv.DictReader(lines, fieldnames=names)
 
     for row in reader:
         for el in row:
@@ -131,37 +158,185 @@ def loads(s):
                     # something didn't work, fall back to string
                     variables[el]['data'].append(row[el])
 
-    return APPFile(variables, order=names, global_metadata=metadata)
+def parse_column(values):
+    """Parses a column that is not entirely numeric cell by cell, as
+    parse_rows does.
+
+    Args:
+        values (iterable[str]): The cell strings.
+
+    Returns:
+        list: Floats where the cell is numeric, otherwise the string.
+    """
+    data = []
+    for value in values:
+        try:
+            data.append(float(value))
+        except ValueError:
+            data.append(value)
+    return data
+
+def parse_timestamps(stamps, rpd):
+    """Generates the timestamps of a column from the first timestamp and the
+    reporting interval instead of parsing every string. The whole column is
+    parsed if the generated timestamps do not match the file (e.g. gaps).
+
+    Args:
+        stamps (numpy.ndarray): The timestamp strings.
+        rpd (int): Results per day.
+
+    Returns:
+        numpy.ndarray: The datetime64 timestamps.
+    """
+    if len(stamps) == 0:
+        return np.array([], dtype='datetime64[s]')
+
+    if rpd > 0 and 86400 % rpd == 0:
+        start = np.datetime64(datetime.datetime.strptime(stamps[0], DATE_FMT), 's')
+        generated = start + np.arange(len(stamps)) * np.timedelta64(86400 // rpd, 's')
+
+        # check the last timestamp and a sample through the file
+        check = np.unique(np.linspace(0, len(stamps) - 1, min(len(stamps), 50)).astype(int))
+        expected = pd.DatetimeIndex(generated[check]).strftime(DATE_FMT)
+        if list(expected) == list(stamps[check]):
+            return generated
+
+    return pd.to_datetime(pd.Series(stamps), format=DATE_FMT).to_numpy().astype('datetime64[s]')
+
+def parse_columns(lines, names, variables):
+    """Parses the body of an APP file column-wise into the variables dict.
 
-def dump(obj, fp):
+    Args:
+        lines (list[str]): The body lines (no header).
+        names (list[str]): The variable names in column order.
+        variables (dict): The variables dict from parse_header; the data
+            lists are replaced by arrays (lists for mixed columns).
+
+    Raises:
+        ValueError: If the body cannot be read as a regular table.
+    """
+    if not lines:
+        return
+
+    # na_filter=False keeps empty cells as strings, as parse_rows does; the round
+    # trip float parser gives the same values as float()
+    df = pd.read_csv(io.StringIO('\n'.join(lines)), header=None, names=range(len(names)),
+                     dtype={names.index('Date/Time Stamp'): str}, na_filter=False,
+                     engine='c', low_memory=False, float_precision='round_trip')
+    if len(df) != len(lines) or df.shape[1] != len(names):
+        raise ValueError('Irregular APP file body.')
+
+    for i, name in enumerate(names):
+        column = df[i]
+        if name == 'Date/Time Stamp':
+            variables[name]['data'] = parse_timestamps(column.to_numpy(dtype=str),
+                                                       variables[name]['rpd'])
+        elif pd.api.types.is_numeric_dtype(column) and not pd.api.types.is_bool_dtype(column):
+            variables[name]['data'] = column.to_numpy(dtype=np.float64)
+        else:
+            # genuinely mixed column
+            variables[name]['data'] = parse_column(column.astype(str))
+
+def benchmark_loads(rows=8760, variables=100, repeat=3):
+    """Times loads against the row by row parser on a generated APP file.
+
+    Args:
+        rows (int, optional): The number of rows. Defaults to 8760.
+        variables (int, optional): The number of variables. Defaults to 100.
+        repeat (int, optional): The number of timings (the best is
+            kept). Defaults to 3.
+
+    Returns:
+        dict: The best seconds of each parser.
+    """
+    rng = np.random.default_rng(0)
+    rpd = int(round(rows / 365)) if rows >= 365 else 24
+    data = {'Date/Time Stamp': {'year': 2023, 'rpd': rpd,
+                                'data': [datetime.datetime(2023, 1, 1) + datetime.timedelta(seconds=86400 // rpd * (i + 1))
+                                         for i in range(rows)]}}
+    for j in range(variables):
+        data[f'var_{j}'] = {'unit': 'Temperature', 'category': ['Benchmark'],
+                            'data': rng.normal(20, 5, rows).tolist()}
+    s = dumps(APPFile(data))
+
+    def slow(s):
+        lines = s.splitlines()
+        names, variables, metadata = parse_header(lines[0])
+        parse_rows(lines[1:], names, variables)
+        return APPFile(variables, order=names, global_metadata=metadata)
+
+    seconds = {}
+    results = {}
+    for name, parser in (('row by row', slow), ('loads', loads)):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            results[name] = parser(s)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        seconds[name] = best
+
+    same = np.array_equal(results['loads'].values, results['row by row'].values) and \
+        np.array_equal(results['loads'].index, results['row by row'].index)
+    print(f'{rows} rows x {variables} variables: {seconds}; identical results: {same}')
+    return seconds
+
+def dump(obj, fp, chunk_rows=10000, decimals=None):
     """Writes an APPFile object to a file handle.
 
+    The header is written first and then the rows in chunks, so memory use
+    is bounded by the chunk size rather than the file size.
+
     Args:
         obj (APPFile): The APPFile to be written.
         fp (file): The handle of the file to be written.
+        chunk_rows (int, optional): The number of rows formatted and written
+            at a time. Defaults to 10000.
+        decimals (int, optional): Write values with a fixed number of
+            decimals, formatted vectorised (much faster). Defaults to None
+            (each value as str()).
+
+    Raises:
+        APPFileError: If there is missing variable information in the APPFile
+            instance or the variables differ in length.
     """
-    fp.write(dumps(obj))
+    for text in iter_dump(obj, chunk_rows, decimals):
+        fp.write(text)
 
-def dumps(obj):
+def dumps(obj, decimals=None):
     """Returns the string representation of the APP format from an APPFile.
 
     Args:
         obj (APPFile): The APPFile to be written.
+        decimals (int, optional): Write values with a fixed number of
+            decimals, formatted vectorised (much faster). Defaults to None
+            (each value as str()).
 
     Raises:
-        APPFileError: If there is missing variable information in the APPFile instance.
+        APPFileError: If there is missing variable information in the APPFile
+            instance or the variables differ in length.
 
     Returns:
         str: A newline-delimited string representing the APP file.
     """
-    lines = []
+    return ''.join(iter_dump(obj, decimals=decimals))
+
+def header_line(obj):
+    """Returns the header line of an APPFile.
+
+    Args:
+        obj (APPFile): The APPFile to be written.
+
+    Raises:
+        APPFileError: If there is missing variable information in the APPFile
+            instance.
 
-    names, cats, units, var_metadata, data = [], [], [], [], []
+    Returns:
+        str: The header (no newline).
+    """
+    names, cats, units, var_metadata = [], [], [], []
 
-    # encode metadata
-    j = json.dumps(obj.metadata)
-    encoded = base64.b64encode(bytes(j, encoding='utf8'))
-    var_metadata.append(encoded.decode('utf8'))
+    var_metadata.append(encode_metadata(obj.metadata))
 
     for key in obj.order:
         names.append(key)
@@ -170,38 +345,570 @@ def dumps(obj):
             if key == 'Date/Time Stamp':
                 cats.append([str(obj[key]['year'])])
                 units.append(str(obj[key]['rpd']))
-                if type(obj[key]['data'][0]) == np.datetime64:
-                    data.append([pd.to_datetime(date).strftime(DATE_FMT) for date in obj[key]['data']])
-                elif type(obj[key]['data'][0]) == tuple:
-                    data.append([pd.to_datetime(date[1]).strftime(DATE_FMT) for date in obj[key]['data']])
-                else:
-                    data.append([date.strftime(DATE_FMT) for date in obj[key]['data']])
             else:
                 cats.append(obj[key]['category'])
                 units.append(obj[key]['unit'])
-                data.append(obj[key]['data'])
-
-                j = json.dumps(obj[key]['metadata'])
-                encoded = base64.b64encode(bytes(j, encoding='utf8'))
-                var_metadata.append(encoded.decode('utf8'))
+                var_metadata.append(encode_metadata(obj[key]['metadata']))
         except KeyError as e:
             raise APPFileError('Missing variable information in {}.'.format(key)) from e
 
     var_amount = len(names)
     var_headers = ['|'.join([names[i], '>'.join(cats[i]), units[i], var_metadata[i]]) for i in range(var_amount)]
 
-    header = ','.join(var_headers)
+    return ','.join(var_headers)
+
+# DATE_FMT character positions in a numpy ISO datetime string (YYYY-MM-DDTHH:MM:SS)
+ISO_TO_DATE_FMT = [8, 9, 4, 5, 6, 4, 0, 1, 2, 3, 10, 11, 12, 13, 14, 15, 16, 17, 18]
+
+def format_timestamps(values):
+    """Formats timestamps with DATE_FMT without calling strftime per value.
+
+    Args:
+        values (list): datetime.datetime, numpy.datetime64 or (index, date)
+            tuple values.
+
+    Returns:
+        numpy.ndarray: The formatted strings.
+    """
+    if len(values) == 0:
+        return np.array([], dtype=str)
+    if type(values[0]) == tuple:
+        values = [date[1] for date in values]
+    iso = np.asarray(values, dtype='datetime64[s]').astype('U19')
+    chars = iso.view('U1').reshape(len(iso), 19)
+    # ISO 'YYYY-MM-DDTHH:MM:SS' -> 'DD/MM/YYYY HH:MM:SS'
+    fmt = chars[:, ISO_TO_DATE_FMT]
+    fmt[:, [2, 5]] = '/'
+    fmt[:, 10] = ' '
+    return np.ascontiguousarray(fmt).view('U19').ravel()
+
+def format_column(values, decimals=None):
+    """Formats a chunk of a variable column cell by cell.
+
+    Args:
+        values (list or numpy.ndarray): The values.
+        decimals (int, optional): Fixed decimals for float values.
+
+    Returns:
+        list[str]: The formatted strings.
+    """
+    if isinstance(values, np.ndarray):
+        values = values.tolist()
+    if decimals is not None:
+        float_format = '%.{}f'.format(decimals)
+        return [float_format % x if isinstance(x, float) else str(x) for x in values]
+    # the C repr of each value is faster than numpy's string conversion
+    return list(map(str, values))
+
+def format_fixed(block, decimals):
+    """Formats a numeric block with a fixed number of decimals as comma
+    separated rows, building the characters with array arithmetic instead of
+    formatting each value. The characters are the same as '%.{decimals}f'
+    gives (the exact binary value correctly rounded, -0.000 for small
+    negative values).
+
+    Args:
+        block (numpy.ndarray): A (rows, columns) float array of finite values.
+        decimals (int): The number of decimals.
+
+    Returns:
+        numpy.ndarray: A (rows, width) uint8 array of the row characters
+            with 0 as padding (to be removed); each row ends with a newline.
+    """
+    magnitude = np.abs(block)
+    product = magnitude * 10 ** decimals
+    scaled = np.rint(product)
+    # the product is rounded, so values it puts within rounding error of a half
+    # may round the other way; these are rounded by the C formatter instead
+    near = np.abs(product - np.floor(product) - 0.5) <= np.maximum(product, 1) * 1e-12
+    if near.any():
+        float_format = '%.{}f'.format(decimals)
+        scaled[near] = [int((float_format % x).replace('.', '')) for x in magnitude[near].tolist()]
+    scaled = scaled.astype(np.int64)
+    negative = np.signbit(block)
+    digits = max(len(str(int(scaled.max()))) if scaled.size else 1, decimals + 1)
+
+    # cell: sign, integer digits, point, decimals, separator
+    width = 1 + digits + (1 if decimals else 0) + 1
+    rows, columns = block.shape
+    chars = np.zeros((rows, columns, width), dtype=np.uint8)
+    chars[:, :, 0] = np.where(negative, ord('-'), 0)
+
+    position = width - 2
+    for power in range(digits):
+        digit = (scaled // 10 ** power) % 10
+        if power <= decimals:
+            chars[:, :, position] = ord('0') + digit
+        else:
+            # leading zeros are padding
+            chars[:, :, position] = np.where(scaled >= 10 ** power, ord('0') + digit, 0)
+        position -= 1
+        if decimals and power == decimals - 1:
+            chars[:, :, position] = ord('.')
+            position -= 1
+
+    chars[:, :, -1] = ord(',')
+    chars[:, -1, -1] = ord('\n')
+    return chars.reshape(rows, columns * width)
+
+def format_chunk(stamps, columns, decimals=None):
+    """Formats a chunk of rows.
 
-    lines.append(header)
+    Args:
+        stamps (list): The timestamps of the chunk.
+        columns (list): The variable values of the chunk, one per variable.
+        decimals (int, optional): Fixed decimals; all-numeric finite chunks
+            are then formatted vectorised.
+
+    Returns:
+        str: The rows, newline-delimited (no trailing newline).
+    """
+    stamps = format_timestamps(stamps)
+
+    if decimals is not None and columns:
+        arrays = [np.asarray(x) for x in columns]
+        # integer columns are not given decimals (see format_column)
+        if all(x.dtype.kind == 'f' for x in arrays):
+            block = np.column_stack(arrays).astype(np.float64)
+            if np.isfinite(block).all() and np.abs(block).max() * 10 ** decimals < 2 ** 62:
+                chars = format_fixed(block, decimals)
+                prefix = np.frombuffer(np.char.add(stamps, ',').astype('S20').tobytes(),
+                                       dtype=np.uint8).reshape(len(stamps), 20)
+                chars = np.concatenate([prefix, chars], axis=1)
+                # drop the padding and the last newline
+                return chars[chars != 0].tobytes().decode('ascii')[:-1]
+
+    cells = [stamps] + [format_column(x, decimals) for x in columns]
+    return '\n'.join(','.join(row) for row in zip(*cells))
+
+def iter_dump(obj, chunk_rows=10000, decimals=None):
+    """Yields the APP file text: the header and then the rows in chunks.
+
+    Args:
+        obj (APPFile): The APPFile to be written.
+        chunk_rows (int, optional): The number of rows per chunk.
+            Defaults to 10000.
+        decimals (int, optional): Fixed decimals; numeric chunks are then
+            formatted vectorised.
+
+    Raises:
+        APPFileError: If there is missing variable information in the APPFile
+            instance or the variables differ in length.
 
+    Yields:
+        str: The header, then newline-prefixed chunks of rows.
+    """
+    header = header_line(obj)
+
+    data = [obj[key]['data'] for key in obj.order]
     if not all(len(x) == len(data[0]) for x in data):
         raise APPFileError('Data length mismatch.')
 
-    len_data = len(data[0])
-    for i in range(len_data):
-        lines.append(','.join([str(x[i]) for x in data]))
+    yield header
+
+    for start in range(0, len(data[0]), chunk_rows):
+        stop = start + chunk_rows
+        yield '\n' + format_chunk(data[0][start:stop],
+                                  [dump_column(obj, key, x[start:stop])
+                                   for key, x in zip(obj.order[1:], data[1:])],
+                                  decimals)
 
-    return '\n'.join(lines)
+def dump_column(obj, key, values):
+    """Returns a chunk of a variable column in the type it was given in: the
+    values array holds every variable as float, but integer and boolean
+    variables are written as 1 and True rather than 1.0 and 1.0.
+
+    Args:
+        obj (APPFile): The APPFile being written.
+        key (str): The variable name.
+        values (list or numpy.ndarray): The chunk of the variable data.
+
+    Returns:
+        list or numpy.ndarray: The values to be formatted.
+    """
+    kind = getattr(obj, 'kinds', {}).get(key)
+    if kind is None or not isinstance(values, np.ndarray) or not np.isfinite(values).all():
+        return values
+    return values.astype(bool if kind == 'b' else np.int64)
+
+def benchmark_dumps(rows=87600, variables=100):
+    """Times dumps, the chunked dump and the chunked dump with fixed decimals
+    on a generated APP file and reports the peak memory of each.
+
+    Args:
+        rows (int, optional): The number of rows. Defaults to 87600
+            (6 minute steps).
+        variables (int, optional): The number of variables. Defaults to 100.
+
+    Returns:
+        dict: The seconds and peak MB of each writer.
+    """
+    import os
+    import tempfile
+    import tracemalloc
+
+    rng = np.random.default_rng(0)
+    rpd = int(round(rows / 365)) if rows >= 365 else 24
+    data = {'Date/Time Stamp': {'year': 2023, 'rpd': rpd,
+                                'data': [datetime.datetime(2023, 1, 1) + datetime.timedelta(seconds=86400 // rpd * (i + 1))
+                                         for i in range(rows)]}}
+    for j in range(variables):
+        data[f'var_{j}'] = {'unit': 'Temperature', 'category': ['Benchmark'],
+                            'data': rng.normal(20, 5, rows).round(3).tolist()}
+    obj = APPFile(data)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'benchmark.app')
+        for name, decimals in (('dumps', None), ('dump', None), ('dump decimals=3', 3)):
+            # the time is measured without tracing, which slows python code
+            start = time.perf_counter()
+            if name == 'dumps':
+                text = dumps(obj)
+            else:
+                with open(path, 'w') as fp:
+                    dump(obj, fp, decimals=decimals)
+            seconds = time.perf_counter() - start
+
+            tracemalloc.start()
+            if name == 'dumps':
+                dumps(obj)
+            else:
+                with open(path, 'w') as fp:
+                    dump(obj, fp, decimals=decimals)
+            peak = tracemalloc.get_traced_memory()[1] / 1e6
+            tracemalloc.stop()
+            results[name] = {'seconds': seconds, 'peak_MB': peak}
+
+            if name == 'dump':
+                with open(path) as fp:
+                    same = fp.read() == text
+
+    print(f'{rows} rows x {variables} variables: {results}; identical output: {same}')
+    return results
+
+
+def benchmark_memory(rows=8760, variables=500):
+    """Compares the memory of the data held as lists of Python floats (the
+    previous representation) with the values array of an APPFile.
+
+    Args:
+        rows (int, optional): The number of rows. Defaults to 8760.
+        variables (int, optional): The number of variables. Defaults to 500.
+
+    Returns:
+        dict: The MB of each representation.
+    """
+    import tracemalloc
+
+    rng = np.random.default_rng(0)
+    block = rng.normal(20, 5, (variables, rows))
+    stamps = np.datetime64('2023-01-01T01:00:00') + np.arange(rows) * np.timedelta64(3600, 's')
+
+    tracemalloc.start()
+    lists = [column.tolist() for column in block]
+    dates = stamps.astype(datetime.datetime).tolist()
+    list_mb = tracemalloc.get_traced_memory()[0] / 1e6
+    tracemalloc.stop()
+
+    data = {'Date/Time Stamp': {'year': 2023, 'rpd': 24, 'data': stamps}}
+    for j in range(variables):
+        data[f'var_{j}'] = {'unit': 'Temperature', 'category': ['Benchmark'], 'data': block[j]}
+    tracemalloc.start()
+    obj = APPFile(data)
+    array_mb = tracemalloc.get_traced_memory()[0] / 1e6
+    tracemalloc.stop()
+
+    del lists, dates
+    results = {'lists_MB': list_mb, 'APPFile_MB': array_mb,
+               'values_MB': obj.values.nbytes / 1e6}
+    print(f'{rows} rows x {variables} variables: {results}')
+    return results
+
+CACHE_VERSION = 1
+
+def cache_paths(path):
+    """Returns the sidecar cache pathnames of an APP file.
+
+    Args:
+        path (str): The APP file pathname.
+
+    Returns:
+        A 2-tuple of str: the .npy column block and the .json header.
+    """
+    return path + '.cache.npy', path + '.cache.json'
+
+def source_stamp(path):
+    """Returns the size and modification time of a file, used to invalidate
+    its sidecar cache.
+
+    Args:
+        path (str): The file pathname.
+
+    Returns:
+        dict: size and mtime_ns.
+    """
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+def write_cache(path, obj):
+    """Writes the sidecar cache of an APP file: one contiguous float64 row per
+    variable (the timestamps as epoch seconds in row 0) and a json header
+    with the variable information, metadata and source stamp. Variables that
+    are not numbers are kept in the json.
+
+    Args:
+        path (str): The APP file pathname.
+        obj (APPFile): The parsed APP file.
+    """
+    npy_path, json_path = cache_paths(path)
+
+    block = np.empty((len(obj.order), len(obj.index)), dtype=np.float64)
+    block[0] = obj.index.astype('datetime64[s]').astype(np.int64)
+    block[1:] = obj.values.T
+    variables = {}
+    for name in obj.order:
+        info = {key: value for key, value in obj[name].items() if key != 'data'}
+        if name != 'Date/Time Stamp' and not isinstance(obj[name]['data'], np.ndarray):
+            info['data'] = list(obj[name]['data'])
+        variables[name] = info
+
+    header = {'version': CACHE_VERSION, 'source': source_stamp(path), 'order': obj.order,
+              'variables': variables, 'metadata': obj.metadata, 'rows': len(obj.index)}
+
+    # written to temporary files and renamed so a reader never sees a partial cache
+    with open(npy_path + '.tmp', 'wb') as f:
+        np.save(f, block)
+    with open(json_path + '.tmp', 'w', encoding='utf8') as f:
+        json.dump(header, f)
+    os.replace(npy_path + '.tmp', npy_path)
+    os.replace(json_path + '.tmp', json_path)
+
+def read_cache(path):
+    """Returns the sidecar cache of an APP file if it is valid.
+
+    Args:
+        path (str): The APP file pathname.
+
+    Returns:
+        A 2-tuple of the json header (dict) and the memory-mapped column block
+        (numpy.memmap), or (None, None) if there is no valid cache.
+    """
+    npy_path, json_path = cache_paths(path)
+    try:
+        with open(json_path, encoding='utf8') as f:
+            header = json.load(f)
+        if header.get('version') != CACHE_VERSION or header['source'] != source_stamp(path):
+            return None, None
+        block = np.load(npy_path, mmap_mode='r')
+    except (OSError, ValueError, KeyError):
+        return None, None
+    if block.shape != (len(header['order']), header['rows']):
+        return None, None
+    return header, block
+
+def open_cached(path, variables=None, use_cache=True):
+    """Opens an APP file through its columnar sidecar cache.
+
+    On the first open the file is parsed and the cache is written next to it
+    (<file>.cache.npy and <file>.cache.json). Later opens memory-map the cache
+    so the data of a variable is only read from disk when it is used; the
+    cache is rebuilt if the APP file size or modification time has changed.
+
+    Args:
+        path (str): The APP file pathname.
+        variables (list[str], optional): The variables to include (only these
+            are read from the cache). Defaults to None (all).
+        use_cache (bool, optional): Read and write the cache. Defaults to True.
+
+    Returns:
+        APPFile: The APP file.
+    """
+    header, block = read_cache(path) if use_cache else (None, None)
+
+    if header is None:
+        with open(path, encoding='utf8') as fp:
+            obj = load(fp)
+        if use_cache:
+            try:
+                write_cache(path, obj)
+            except OSError as e:
+                print('APP cache not written: {}'.format(e))
+        if variables is None:
+            return obj
+        order = ['Date/Time Stamp'] + [name for name in variables if name != 'Date/Time Stamp']
+        data = {name: dict(obj[name]) for name in order}
+        subset = APPFile(data, order=order, global_metadata=obj.metadata)
+        subset.kinds = {name: kind for name, kind in obj.kinds.items() if name in order}
+        return subset
+
+    order = header['order'] if variables is None else \
+        ['Date/Time Stamp'] + [name for name in variables if name != 'Date/Time Stamp']
+    rows = [header['order'].index(name) for name in order]
+    if variables is None:
+        # a view of the memory map; pages are read as they are used
+        values = block[1:].T
+    else:
+        values = np.asarray(block[rows[1:]]).T
+
+    data = {name: dict(header['variables'][name]) for name in order}
+    data['Date/Time Stamp']['data'] = block[0].astype(np.int64).astype('datetime64[s]')
+    return APPFile(data, order=order, global_metadata=header['metadata'], values=values)
+
+
+def encode_metadata(metadata):
+    """Encodes a metadata dict for an APP header.
+
+    Args:
+        metadata (dict): The metadata.
+
+    Returns:
+        str: The base64 encoded json.
+    """
+    return base64.b64encode(bytes(json.dumps(metadata), encoding='utf8')).decode('utf8')
+
+def read_header(path):
+    """Reads only the header line of an APP file.
+
+    Args:
+        path (str): The APP file pathname.
+
+    Returns:
+        A 3-tuple of the header line (str), whether it has metadata fields
+        (bool) and the parsed header (names, variables, metadata).
+    """
+    with open(path, encoding='utf8') as fp:
+        header = fp.readline().rstrip('\r\n')
+    has_metadata = len(header.split(',')[0].split('|')) == 4
+    return header, has_metadata, parse_header(header)
+
+def new_file(path, index, year, rpd, global_metadata=None):
+    """Writes an APP file with only the timestamps, for variables to be
+    added as they become available with append_variables.
+
+    Args:
+        path (str): The APP file pathname; overwritten.
+        index (list or numpy.ndarray): The timestamps.
+        year (int): The year of the header.
+        rpd (int): Results per day.
+        global_metadata (dict, optional): The global metadata.
+    """
+    obj = APPFile({'Date/Time Stamp': {'year': year, 'rpd': rpd, 'data': index}},
+                  global_metadata=global_metadata)
+    with open(path, 'w', encoding='utf8') as fp:
+        dump(obj, fp)
+
+def append_rows(path, index, values, chunk_rows=10000, decimals=None):
+    """Appends rows to an APP file without reading or rewriting its body.
+
+    Args:
+        path (str): The APP file pathname.
+        index (list or numpy.ndarray): The timestamps of the new rows.
+        values (numpy.ndarray or dict): A (rows, variables) array in the
+            file's variable order, or a dict of variable name: values with
+            every variable of the file.
+        chunk_rows (int, optional): The number of rows formatted at a time.
+            Defaults to 10000.
+        decimals (int, optional): Fixed decimals. Defaults to None (str()).
+
+    Raises:
+        APPFileError: If the values do not match the file's variables.
+    """
+    _, _, (names, _, _) = read_header(path)
+    names = names[1:]
+    if isinstance(values, dict):
+        if set(values) != set(names):
+            raise APPFileError('Appended rows must have every variable of the file.')
+        columns = [values[name] for name in names]
+    else:
+        values = np.asarray(values, dtype=np.float64).reshape(len(index), -1)
+        if values.shape[1] != len(names):
+            raise APPFileError('Appended rows must have every variable of the file.')
+        columns = list(values.T)
+    if not all(len(column) == len(index) for column in columns):
+        raise APPFileError('Data length mismatch.')
+
+    # the file may or may not end with a newline (dumps does not write one)
+    with open(path, 'rb') as fp:
+        fp.seek(0, os.SEEK_END)
+        newline = fp.tell() > 0
+        if newline:
+            fp.seek(-1, os.SEEK_END)
+            newline = fp.read(1) != b'\n'
+
+    with open(path, 'a', encoding='utf8') as fp:
+        for start in range(0, len(index), chunk_rows):
+            stop = start + chunk_rows
+            text = format_chunk(index[start:stop], [column[start:stop] for column in columns],
+                                decimals)
+            fp.write(('\n' if newline or start > 0 else '') + text)
+
+def append_variables(path, variables, order=None, chunk_rows=10000, decimals=None):
+    """Adds variable columns to an APP file.
+
+    Each line of the file has to be extended, so the file is rewritten, but
+    as a stream: the existing rows are read and written chunk_rows at a time
+    to a temporary file that then replaces the original, so memory use does
+    not grow with the file.
+
+    Args:
+        path (str): The APP file pathname.
+        variables (dict): name: {'unit', 'category', 'metadata' (optional),
+            'data'} of each new variable; data has a value per row.
+        order (list[str], optional): The order of the new variables. Defaults
+            to None (dict order).
+        chunk_rows (int, optional): The number of rows processed at a time.
+            Defaults to 10000.
+        decimals (int, optional): Fixed decimals for the new values. Defaults
+            to None (str()).
+
+    Raises:
+        APPFileError: If a variable already exists, has missing information or
+            its length differs from the file's rows.
+    """
+    header, has_metadata, (names, _, _) = read_header(path)
+    order = order if order is not None else list(variables.keys())
+
+    cells = []
+    for name in order:
+        if name in names:
+            raise APPFileError('Variable {} already exists.'.format(name))
+        try:
+            fields = [name, '>'.join(variables[name]['category']), variables[name]['unit']]
+        except KeyError as e:
+            raise APPFileError('Missing variable information in {}.'.format(name)) from e
+        if has_metadata:
+            fields.append(encode_metadata(variables[name].get('metadata', {})))
+        cells.append('|'.join(fields))
+    columns = [variables[name]['data'] for name in order]
+    rows = len(columns[0]) if columns else 0
+    if not all(len(column) == rows for column in columns):
+        raise APPFileError('Data length mismatch.')
+
+    temp_path = path + '.tmp'
+    try:
+        with open(path, encoding='utf8') as source, \
+                open(temp_path, 'w', encoding='utf8') as target:
+            source.readline()
+            target.write(','.join([header] + cells))
+            row = 0
+            while True:
+                lines = [line.rstrip('\r\n') for _, line in zip(range(chunk_rows), source)]
+                lines = [line for line in lines if line]
+                if not lines:
+                    break
+                if row + len(lines) > rows:
+                    raise APPFileError('Data length mismatch.')
+                new = [format_column(column[row:row + len(lines)], decimals) for column in columns]
+                for i, line in enumerate(lines):
+                    target.write('\n' + ','.join([line] + [cell[i] for cell in new]))
+                row += len(lines)
+        if row != rows:
+            raise APPFileError('Data length mismatch.')
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
 
 
 class APPFile:
@@ -257,9 +964,17 @@ class APPFile:
     pretty much indefinitely, though I would advise against it, as you're
     likely to hit some stack limit somewhere else eventually.
     """
-    def __init__(self, data, order=None, global_metadata=None):
+    def __init__(self, data, order=None, global_metadata=None, values=None):
         """The constructor.
 
+        The variable data is held in a single 2-D float64 array (values, one
+        column per variable in order, each column contiguous) and the
+        timestamps in a datetime64 array (index). The "data" of each variable
+        dict is a view of its column, so nothing is copied when it is read.
+        Variables with values that are not numbers keep them as a list (their
+        column holds NaN). Integer and boolean variables are still written to
+        the APP file as integers and booleans (kinds).
+
         Args:
             data (dict): A dict of variables, containing the category,
                 units, and data.
@@ -267,10 +982,15 @@ class APPFile:
                 of the variables in the APP file. Defaults to None.
             global_metadata (dict, optional): A dict containing the
                 global metadata.
+            values (numpy.ndarray, optional): A (rows, variables) float array
+                holding the data of the variables (in order, without the
+                timestamps), used as is; the variable dicts then need no
+                "data" key (except non-numeric variables). Defaults to None.
 
         Raises:
             TypeError: If initialised with anything other than a dict or
                 pandas DataFrame.
+            APPFileError: If the variables differ in length.
         """
         if type(data) == pd.DataFrame:
             data = data.to_dict()
@@ -278,16 +998,17 @@ class APPFile:
         if type(data) != dict:
             raise TypeError("Must be initialised with a dict or DataFrame.")
 
-        self.data = data
-        self.order = order if order is not None else list(data.keys())
+        # the variable dicts are copied as their data is replaced by views of
+        # values; the caller's dict is left as it was given
+        self.data = {name: dict(var) for name, var in data.items()}
+        self.order = list(order) if order is not None else list(data.keys())
 
         # check for empty metadata and populate the version field
         # if it doesn't exist already
         if global_metadata is None:
             global_metadata = {"version": APP_VERSION}
-        else:
-            if "version" not in global_metadata:
-                global_metadata["version"] = APP_VERSION
+        elif "version" not in global_metadata:
+            global_metadata = dict(global_metadata, version=APP_VERSION)
 
         self.metadata = global_metadata
 
@@ -302,6 +1023,59 @@ class APPFile:
 
         self.order.insert(0, 'Date/Time Stamp')
 
+        self.set_values(values)
+
+    def set_values(self, values=None):
+        """Sets the values array, the index and the column views.
+
+        Args:
+            values (numpy.ndarray, optional): A (rows, variables) float array
+                used as is. Defaults to None (built from the variable data).
+
+        Raises:
+            APPFileError: If the variables differ in length.
+        """
+        names = self.order[1:]
+        self.columns = {name: j for j, name in enumerate(names)}
+
+        stamps = self.data.get('Date/Time Stamp', {}).get('data')
+        if stamps is None:
+            stamps = []
+        elif len(stamps) and type(stamps[0]) == tuple:
+            stamps = [date[1] for date in stamps]
+        self.index = np.asarray(stamps, dtype='datetime64[s]')
+
+        # integer and boolean variables are written as such (see dump_column)
+        self.kinds = {}
+
+        if values is None:
+            rows = len(self.index)
+            if rows == 0 and names:
+                rows = len(self.data[names[0]]['data'])
+            values = np.empty((rows, len(names)), dtype=np.float64, order='F')
+            for j, name in enumerate(names):
+                column = self.data[name]['data']
+                if len(column) != rows:
+                    raise APPFileError('Data length mismatch.')
+                array = np.asarray(column)
+                if array.dtype.kind in 'fiub':
+                    values[:, j] = array
+                    if array.dtype.kind != 'f':
+                        self.kinds[name] = array.dtype.kind
+                else:
+                    # not numbers; kept as a list
+                    values[:, j] = np.nan
+        elif values.shape != (len(self.index), len(names)):
+            raise APPFileError('Data length mismatch.')
+
+        self.values = values
+        if 'Date/Time Stamp' in self.data:
+            self.data['Date/Time Stamp']['data'] = self.index
+        for j, name in enumerate(names):
+            column = self.data[name].get('data')
+            if column is None or np.asarray(column).dtype.kind in 'fiub':
+                self.data[name]['data'] = values[:, j]
+
     @classmethod
     def from_dict(cls, data, global_metadata=None):
         """Creates a new instance from a dict.
@@ -351,6 +1125,9 @@ class APPFile:
         the header format to be already inside the DataFrame column
         names.
 
+        The data is not copied if the DataFrame columns are float64 and held
+        together in the order given (e.g. a DataFrame from dataframe()).
+
         Args:
             df (pandas.DataFrame): The DataFrame containing the data to be
                 stored as APP.
@@ -367,17 +1144,27 @@ class APPFile:
         if variables is None or order is None:
             return loads(df.to_csv())
         else:
-            for var in variables:
-                if var == 'Date/Time Stamp':
-                    variables[var]['data'] = list(df.index.values)
-                else:
+            names = [name for name in order if name != 'Date/Time Stamp']
+            if 'Date/Time Stamp' in variables:
+                variables['Date/Time Stamp']['data'] = df.index.values
+            try:
+                values = df[names].to_numpy(dtype=np.float64, copy=False)
+            except (ValueError, TypeError):
+                # not all numbers
+                for var in names:
                     variables[var]['data'] = list(df[var].values)
-            return cls(variables, order=order, global_metadata=global_metadata)
+                return cls(variables, order=order, global_metadata=global_metadata)
+            obj = cls(variables, order=order, global_metadata=global_metadata, values=values)
+            obj.kinds = {name: df[name].dtype.kind for name in names if df[name].dtype.kind in 'iub'}
+            return obj
 
     def return_dataframe_columns(self, variables):
         """Returns a pandas DataFrame containing the index column
         and the variables specified.
 
+        The columns of numeric variables are views of the values array (no
+        copy).
+
         Args:
             variables (list[str]): A list of variables to be obtained.
 
@@ -385,20 +1172,22 @@ class APPFile:
             pandas.DataFrame: A DataFrame containing the desired variables.
         """
         # remove timestamp, as we're getting it separately
-        if "Date/Time Stamp" in variables:
-            variables.remove("Date/Time Stamp")
+        variables = [var for var in variables if var != "Date/Time Stamp"]
 
-        variable_data = [
-            self.data[var]['data'] for var in variables
-        ]
+        variable_data = {var: self.data[var]['data'] for var in variables}
+        index_data = pd.DatetimeIndex(self.index)
 
-        # transpose data, so pandas can deal with it
-        variable_data = np.array(variable_data).T
-        index_data = np.array(self.data["Date/Time Stamp"]['data']).T
+        return pd.DataFrame(variable_data, columns=variables, index=index_data, copy=False)
 
-        df = pd.DataFrame(variable_data, columns=variables, index=index_data)
+    def dataframe(self):
+        """Returns a pandas DataFrame of all the variables; a view of the
+        values array (no copy).
 
-        return df
+        Returns:
+            pandas.DataFrame: A DataFrame with the timestamps as index.
+        """
+        return pd.DataFrame(self.values, columns=self.order[1:],
+                            index=pd.DatetimeIndex(self.index), copy=False)
 
     def __getitem__(self, key):
         """Allows key indexing to fall through and use the instance's data
@@ -1,15 +1,58 @@
 
 
+import time
+from fractions import Fraction
+
+import numpy as np
 import pint
 # 'import iesve' is conditionally called within '__get_display_units()'
 
+# Registry, context and unit tables shared by every UnitsVE in the process,
+# created by the first instance (see shared_units)
+_shared = {}
+
+def _init_registry():
+    """Creates the pint registry with the VE context and custom units.
+
+    Returns:
+        tuple: The pint UnitRegistry and Context
+    """
+    u = pint.UnitRegistry()
+    ctx = pint.Context('ve')
+
+    if pint.__version__ != '0.7.1': # Context definition arrived in 0.10
+        ctx.redefine('BTU = international_british_thermal_unit')
+        ctx.redefine('Btu = international_british_thermal_unit')
+
+    u.define('kgCO2 = kg')
+    u.define('lbCO2 = lb')
+    if pint.__version__ == '0.7.1':
+        u.define('yr = year = a') # Not defined in 0.7.1
+    return u, ctx
+
+def shared_units():
+    """Returns the process-wide registry, context and conversion tables.
+
+        Creating a pint registry takes hundreds of milliseconds and each one
+        has its own unit definitions, so the registry is created once and
+        shared by all UnitsVE instances along with the lookups derived from it.
+
+    Returns:
+        dict: 'u' registry, 'ctx' context and 'conversions', a dict of
+            (from_unit, to_unit): (factor, offset) filled by UnitsVE
+    """
+    if not _shared:
+        u, ctx = _init_registry()
+        _shared.update({'u': u, 'ctx': ctx, 'conversions': {}})
+    return _shared
+
 class UnitsVE:
     """
     Converts and displays values and units used in calculations and reportage.
 
         Please add tests to scripts/tests/test_units_ve.py, if any changes are made.
 
-        Version 1.0 (Update this when making changes)
+        Version 1.1 (Update this when making changes)
     """
 
     def __init__(self, display_units='auto'):
@@ -20,12 +63,15 @@ class UnitsVE:
                                 units iesve.VEProject.get_display_units()
         """
 
-        self.u = pint.UnitRegistry()
+        shared = shared_units()
+        self.u = shared['u']
         self.Q_ = self.u.Quantity
-        self.ctx = self.__init_context()
-        self.__define_custom_units()
+        self.ctx = shared['ctx']
+        self.conversions = shared['conversions']
 
-        units_data = self.__get_units_data()
+        if 'units_data' not in shared:
+            shared['units_data'] = self.__get_units_data()
+        units_data = shared['units_data']
 
         if display_units=='auto':
             self.is_display_metric = self.__get_ve_display_units()
@@ -46,6 +92,10 @@ class UnitsVE:
         self.all_display = self.metric_display.copy()
         self.all_display.update(self.ip_display) # could use dictionary unpacking in py >3.5
 
+        if 'auto_units' not in shared:
+            shared['auto_units'] = self.__init_conversion_table(units_data)
+        self.auto_units = shared['auto_units']
+
     def __get_units_data(self):
         """Converts a value from one unit to another.
         Args:
@@ -99,24 +149,22 @@ class UnitsVE:
             ('carbon_intensity_yr', 'kgCO2 / a / m ** 2',  'lbCO2 / a / ft ** 2',   'kgCO2/m².year', 'lbCO2/ft².year'),
         )
 
-    def __define_custom_units(self):
-        self.u.define('kgCO2 = kg')
-        self.u.define('lbCO2 = lb')
-
-    def __init_context(self):
-        """Creates a pint context, replacing default Btu with value used in VE.
-            0.7.1 default Btu matches VE, newer version of Pint do not.
+    def __init_conversion_table(self, units_data):
+        """Precomputes the factor and offset of every metric <-> IP pair in the units data.
 
         Args:
+            units_data (tuple[tuple]): Units name, symbols, and display
         Returns:
-            Pint.Context: The pint context
+            dict: metric unit: the IP unit convert_auto converts it to
         """
-        ctx = pint.Context('ve')
-
-        if pint.__version__ != '0.7.1': # Context definition arrived in 0.10
-            ctx.redefine('BTU = international_british_thermal_unit')
-            ctx.redefine('Btu = international_british_thermal_unit')
-        return ctx
+        auto_units = {}
+        for _, metric, ip, _, _ in units_data:
+            self.get_linear_conversion(metric, ip)
+            self.get_linear_conversion(ip, metric)
+            short = self.get_short_units(self.Q_(metric))
+            if short in self.metric_to_ip_conv: # as convert_quantity_auto looks units up
+                auto_units[metric] = self.metric_to_ip_conv[short]
+        return auto_units
 
     def __fix_unit_disparities(self):
         """Resolves disparities between Pint's short unit display and its str comprehension.
@@ -126,8 +174,6 @@ class UnitsVE:
         """
         if pint.__version__ != '0.7.1':
             self.ip_display[self.get_short_units(self.Q_('Btu / ft ** 2 / hr / delta_degF'))] = self.ip_display.pop('Btu / ft ** 2 / hr / delta_degF')
-        else:
-            self.u.define('yr = year = a') # Not defined in 0.7.1
 
     def __get_ve_display_units(self):
         import iesve
@@ -183,8 +229,65 @@ class UnitsVE:
         Returns:
             Number: The converted value
         """
+        if isinstance(value, (int, float)):
+            factor, offset = self.get_linear_conversion(from_unit, to_unit)
+            return self.ve_round(value * factor + offset, decimals)
         return self.ve_round(self.convert_to_quantity(value, from_unit, to_unit).magnitude, decimals)
 
+    def get_linear_conversion(self, from_unit, to_unit):
+        """Returns the factor and offset of a conversion, from the shared table.
+            Pint is only called the first time a pair of units is converted in the process.
+
+        Args:
+            from_unit (str): The current unit
+            to_unit (str): The unit to convert to
+        Returns:
+            tuple[float]: factor and offset; converted = value * factor + offset
+        """
+        key = (from_unit, to_unit)
+        if key not in self.conversions:
+            offset = float(self.convert_to_quantity(0.0, from_unit, to_unit).magnitude)
+            if offset == 0:
+                factor = float(self.convert_to_quantity(1.0, from_unit, to_unit).magnitude)
+            else:
+                # Offset (temperature) units: pint converts through kelvin and leaves
+                # rounding errors in f(1) - f(0) (20 degC gave 67.99999999999989 degF).
+                # The scales are related by exact ratios, so the multiplicative part and
+                # the offset are snapped to them
+                factor = (float(self.convert_to_quantity(100.0, from_unit, to_unit).magnitude) - offset) / 100
+                factor, offset = self.exact_ratio(factor), self.exact_ratio(offset)
+            self.conversions[key] = (factor, offset)
+        return self.conversions[key]
+
+    @staticmethod
+    def exact_ratio(value, max_denominator=10000):
+        """Returns the nearest simple fraction to a value if it is within rounding error.
+
+        Args:
+            value (float): The value
+            max_denominator (int, optional): The largest denominator. Default=10000
+        Returns:
+            float: The value of the fraction, or the value if no fraction is close enough
+        """
+        ratio = float(Fraction(value).limit_denominator(max_denominator))
+        return ratio if abs(ratio - value) <= 1e-9 * max(1.0, abs(value)) else value
+
+    def convert_array(self, values, from_unit, to_unit, decimals=None):
+        """Converts an array of values from one unit to another without a pint
+            object per value.
+
+        Args:
+            values (array_like): The values of the quantity.
+            from_unit (str): The current unit.
+            to_unit (str): The unit to convert to.
+            decimals (int, optional): The number of decimal places. Default=None
+        Returns:
+            numpy.ndarray: The converted values
+        """
+        factor, offset = self.get_linear_conversion(from_unit, to_unit)
+        values = np.asarray(values, dtype=np.float64) * factor + offset
+        return values if decimals is None else np.round(values, decimals)
+
     def get_conversion_factor(self, from_unit, to_unit):
         """Calculates conversion factor between compatible units
 
@@ -224,8 +327,37 @@ class UnitsVE:
             Number: The value converted value if imperial display, or value untouched
                     if metric.
         """
-        value = self.convert_quantity_auto(value, from_unit).magnitude
-        return self.ve_round(value, decimals)
+        if self.is_display_metric:
+            return self.ve_round(value, decimals)
+        return self.convert(value, from_unit, self.get_auto_unit(from_unit), decimals)
+
+    def get_auto_unit(self, from_unit):
+        """Returns the IP unit a metric unit is auto converted to.
+
+        Args:
+            from_unit (str): The current (metric) unit.
+        Returns:
+            str: The IP unit
+        """
+        if from_unit not in self.auto_units:
+            self.auto_units[from_unit] = self.metric_to_ip_conv[self.get_short_units(self.Q_(from_unit))]
+        return self.auto_units[from_unit]
+
+    def convert_auto_array(self, values, from_unit, decimals=None):
+        """Converts an array of values from metric to imperial if the display units require it.
+
+        Args:
+            values (array_like): The values of the quantity.
+            from_unit (str): The current unit.
+            decimals (int, optional): The number of decimal places. Default=None
+        Returns:
+            numpy.ndarray: The values converted if imperial display, or as an array
+                    if metric.
+        """
+        if self.is_display_metric:
+            values = np.asarray(values, dtype=np.float64)
+            return values if decimals is None else np.round(values, decimals)
+        return self.convert_array(values, from_unit, self.get_auto_unit(from_unit), decimals)
 
     def convert_auto_str(self, value, from_unit, decimals=0):
         """Converts a value from metric to imperial if the display units require it.
@@ -239,7 +371,7 @@ class UnitsVE:
             str: The value converted value if imperial display, or value untouched
                     if metric.
         """
-        value = self.convert_quantity_auto(value, from_unit).magnitude
+        value = self.convert_auto(value, from_unit)
         return "{:,.{}f}".format(value, decimals)
 
     def convert_pretty(self, value, from_unit, to_unit, decimal_places=0):
@@ -364,7 +496,41 @@ class UnitsVE:
         return '{:~}'.format(pint_obj.units)
 
 
+def benchmark_convert(values=100000, repeat=3):
+    """Compares converting values one at a time with pint objects (the former
+    path) against the factor table and convert_array.
 
+    Args:
+        values (int, optional): The number of values. Defaults to 100000.
+        repeat (int, optional): The number of timed repeats. Defaults to 3.
 
-
-
+    Returns:
+        dict: Best times in seconds.
+    """
+    start = time.perf_counter()
+    units = UnitsVE('metric')
+    first = time.perf_counter() - start
+    start = time.perf_counter()
+    units = UnitsVE('ip')
+    second = time.perf_counter() - start
+
+    data = np.linspace(-20.0, 40.0, values)
+    scalars = data.tolist()
+
+    def best(function):
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function()
+            times.append(time.perf_counter() - start)
+        return min(times)
+
+    pint_path = best(lambda: [units.convert_quantity_auto(x, 'kWh').magnitude for x in scalars])
+    table_path = best(lambda: [units.convert_auto(x, 'kWh') for x in scalars])
+    array_path = best(lambda: units.convert_auto_array(data, 'kWh'))
+
+    result = {'first_init': first, 'init': second, 'pint_scalars': pint_path,
+              'table_scalars': table_path, 'array': array_path}
+    for key, value in result.items():
+        print('{:<14}{:.4f} s'.format(key, value))
+    return result
@@ -3,8 +3,100 @@ import tkinter as tk
 from tkinter import messagebox
 import xlsxwriter
 import os
-import math
 import datetime
+from collections import OrderedDict
+import numpy as np
+
+# (end use, variable, column heading) of the heat balance
+END_USES = [('System plant etc. gains', 'Space conditioning sensible', 'Space Conditioning Sensible (kW)'),
+            ('Window solar gains', 'Solar gain', 'Solar Gains (kW)'),
+            ('Casual gains', 'Internal gain', 'Internal Gains (kW)'),
+            ('Conduction from ext elements', 'External conduction gain', 'External Conduction Gain (kW)'),
+            ('Conduction from int surfaces', 'Internal conduction gain', 'Internal Conduction Gain (kW)'),
+            ('Aux mech vent gain', 'Aux vent gain', 'Aux Vent Gain (kW)'),
+            ('Natural vent gain', 'Natural vent gain', 'Nat Vent Gain (kW)'),
+            ('Infiltration gain', 'Infiltration gain', 'Infiltration Gain (kW)'),
+            ('Cooling vent gain', 'Free cooling vent gain', 'Free Cooling Vent Gain (kW)'),
+            ('MacroFlo ext vent gain', 'MacroFlo ext vent gain', 'MacroFlo External Vent Gain (kW)'),
+            ('MacroFlo int vent gain', 'MacroFlo int vent gain', 'MacroFlo Internal Vent Gain (kW)')]
+
+
+class RoomResultsCache:
+    """Reads each room variable of a results file at most once
+
+    Results are kept per (room, end use, variable, period), least recently used
+    first out once max_bytes is exceeded; missing variables (None) are kept too
+    so they are not asked for again.
+    """
+    def __init__(self, results_reader_file, max_bytes=256 * 2**20):
+        self.results_reader_file = results_reader_file
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.results = OrderedDict()
+
+    def get(self, room_id, end_use, var, start_day=1, end_day=365):
+        """room results of a variable, or None if the room does not have it
+        """
+        key = (room_id, end_use, var, start_day, end_day)
+        if key in self.results:
+            self.results.move_to_end(key)
+            return self.results[key]
+
+        results = self.results_reader_file.get_room_results(room_id, end_use, var, 'z', start_day, end_day)
+        self.results[key] = results
+        self.bytes += getattr(results, 'nbytes', 0)
+        while self.bytes > self.max_bytes and len(self.results) > 1:
+            _, old = self.results.popitem(last=False)
+            self.bytes -= getattr(old, 'nbytes', 0)
+        return results
+
+
+def peak_day_data(arrays, days):
+    """the 24 hours of each row's day
+    """
+    hours = np.minimum(days[:, None] * 24 + np.arange(24), arrays.shape[1] - 1)
+    return np.take_along_axis(arrays, hours, axis=1)
+
+
+def get_heat_balance_data(results_cache, rooms_to_be_analysed, aps_file):
+    """peak cooling day heat balance of the rooms to be analysed
+
+    The peak day of each room is the day of its max cooling load (min space conditioning
+    sensible); the peak day data of each variable is extracted for all rooms at once.
+
+    Returns:
+        room labels, column headings of each room, peak day data (kW) of each room and heading
+    """
+    rooms = [room for room in results_cache.results_reader_file.get_room_list() if room[1] in rooms_to_be_analysed]
+    print('Reading ' + str(len(rooms)) + ' rooms in ' + aps_file)
+
+    # get the day of the max cooling load (min space conditioning value) of each room
+    end_use, var, _ = END_USES[0]
+    np_space_cond = np.array([results_cache.get(room_id, end_use, var) for _, room_id, _, _ in rooms]).reshape(len(rooms), -1)
+    peak_days = np_space_cond.argmin(axis=1) // 24 if len(rooms) else np.zeros(0, dtype=int)
+
+    room_labels = []
+    for (name, _, _, _), day in zip(rooms, peak_days):
+        peak_date = datetime.datetime(2000, 1, 1) + datetime.timedelta(int(day) + 1)
+        room_labels.append(name + ' (' + peak_date.strftime('%d %b') + ')')
+
+    # declare lists that will contain the column headings and the peak day data of each variable applicable to each room
+    column_headings = [[] for _ in rooms]
+    heat_balance_data = [[] for _ in rooms]
+
+    for end_use, var, heading in END_USES:
+        results = [results_cache.get(room_id, end_use, var) for _, room_id, _, _ in rooms]
+        available = [i for i, result in enumerate(results) if result is not None]
+        if not available:
+            continue
+        np_data = np.array([results[i] for i in available]) / 1000
+        np_peak_day_data = peak_day_data(np_data, peak_days[available])
+        for i, data in zip(available, np_peak_day_data.tolist()):
+            column_headings[i].append(heading)
+            heat_balance_data[i].append(data)
+
+    return (room_labels, column_headings, heat_balance_data)
+
 
 def generate_window(project, ve_folder, results_reader, room_groups):
     class Window(tk.Frame):
@@ -130,104 +222,10 @@ def generate_window(project, ve_folder, results_reader, room_groups):
 
             results_reader_file = results_reader.open(aps_file_name)
 
-            def get_heat_balance_data(results_reader_file, rooms_to_be_analysed, aps_file):
-
-                rooms = results_reader_file.get_room_list()
-
-                # declare list that will contain the heat balance data for each variable for the peak day
-                heat_balance_data = []
-
-                # declare list that will contain the column headings for each variable that is applicable to each room
-                column_headings = []
-
-                for room_number, room in enumerate(rooms):
-                    # unpack the tuples of room data that is returned from the ResultsReader function. the variables 'a' and 'b' and not used here but had to be assigned to something
-                    _, room_id, _, _ = room
-
-                    # prints progress information to the console for the user
-                    if room_number % 10 == 0 and room_number + 10 < len(rooms):
-                        print('Calculating Rooms: ' + str(room_number + 1) + ' - ' + str(room_number + 10) + ' of ' + str(len(rooms)) + ' in ' + aps_file)
-                    elif room_number % 10 == 0 and room_number + 10 >= len(rooms):
-                        print('Calculating Rooms: ' + str(room_number + 1) + ' - ' + str(len(rooms)) + ' of ' + str(len(rooms)) + ' in ' + aps_file)
-
-                    if room_id in rooms_to_be_analysed:
-                        np_space_cond = results_reader_file.get_room_results(room_id, 'System plant etc. gains', 'Space conditioning sensible', 'z', 1, 365)
-
-                        # get the index of the row where this max cooling load occurs (min space conditioning value)
-                        min_space_cond_index = np_space_cond.argmin()
-                        # get the number of the day the max cooling load occurs by dividing by 24 and rounding the result down to the nearest integer
-                        min_space_cond_day_num = math.floor(min_space_cond_index / 24)
-
-                        end_uses = ['System plant etc. gains',
-                                    'Window solar gains',
-                                    'Casual gains',
-                                    'Conduction from ext elements',
-                                    'Conduction from int surfaces',
-                                    'Aux mech vent gain',
-                                    'Natural vent gain',
-                                    'Infiltration gain',
-                                    'Cooling vent gain',
-                                    'MacroFlo ext vent gain',
-                                    'MacroFlo int vent gain']
-
-                        vars = ['Space conditioning sensible',
-                                'Solar gain',
-                                'Internal gain',
-                                'External conduction gain',
-                                'Internal conduction gain',
-                                'Aux vent gain',
-                                'Natural vent gain',
-                                'Infiltration gain',
-                                'Free cooling vent gain',
-                                'MacroFlo ext vent gain',
-                                'MacroFlo int vent gain']
-
-                        heading = ['Space Conditioning Sensible (kW)',
-                                   'Solar Gains (kW)',
-                                   'Internal Gains (kW)',
-                                   'External Conduction Gain (kW)',
-                                   'Internal Conduction Gain (kW)',
-                                   'Aux Vent Gain (kW)',
-                                   'Nat Vent Gain (kW)',
-                                   'Infiltration Gain (kW)',
-                                   'Free Cooling Vent Gain (kW)',
-                                   'MacroFlo External Vent Gain (kW)',
-                                   'MacroFlo Internal Vent Gain (kW)']
-
-                        room_heat_balance_data = []
-                        room_column_headings = []
-                        i = 0
-                        for end_use in end_uses:
-                            if results_reader_file.get_room_results(room_id, end_use, vars[i], 'z', 1, 365) is not None:
-                                np_data = results_reader_file.get_room_results(room_id, end_use, vars[i], 'z', 1, 365)/1000
-                                np_peak_day_data = np_data[24 * min_space_cond_day_num:24 * min_space_cond_day_num + 24]
-                                peak_day_data = np_peak_day_data.tolist()
-                                room_heat_balance_data.append(peak_day_data)
-                                room_column_headings.append(heading[i])
-                                i += 1
-                        column_headings.append(room_column_headings)
-                        heat_balance_data.append(room_heat_balance_data)
-                return (column_headings, heat_balance_data)
-
-            room_labels = []
-
-            rooms = results_reader_file.get_room_list()
-            for room in rooms:
-                if room[1] in rooms_to_be_analysed:
-                    np_space_cond_ = results_reader_file.get_room_results(room[1], 'System plant etc. gains', 'Space conditioning sensible', 'z', 1, 365)
-
-                    # get the index of the row where this max occurs
-                    min_space_cond_index = np_space_cond_.argmin()
-                    # get the number of the day the max occurs by dividing by 24 and rounding the result down to the nearest integer
-                    min_space_cond_day_num = math.floor(min_space_cond_index / 24)
-
-                    peak_date = datetime.datetime(2000, 1, 1) + datetime.timedelta(min_space_cond_day_num + 1)
-                    peak_date = peak_date.strftime('%d %b')
-                    room_label = room[0] + ' (' + str(peak_date) + ')'
-                    room_labels.append(room_label)
+            results_cache = RoomResultsCache(results_reader_file)
 
             print('Running Calculations')
-            (column_headings, heat_balance_data) = get_heat_balance_data(results_reader_file, rooms_to_be_analysed, aps_file_name)
+            (room_labels, column_headings, heat_balance_data) = get_heat_balance_data(results_cache, rooms_to_be_analysed, aps_file_name)
 
             # write data to excel worksheets
             print('Writing results to Excel Sheet')
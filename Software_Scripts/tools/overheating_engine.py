@@ -0,0 +1,271 @@
+"""
+===============================
+Overheating - engine
+===============================
+
+Module description
+------------------
+
+CIBSE TM52 and TM59 overheating criteria and the fixed threshold range test
+for all rooms at once. Required by overheating_test.py; also used by the
+parametric scripts as an output metric (utils_model_mod.get_results).
+
+Room operative temperatures and occupancy are (rooms, hours) arrays. The
+running mean outdoor temperature is a convolution of the daily mean outdoor
+temperatures, the adaptive limits are broadcast over the rooms and daily
+values come from reshaping the hours into (rooms, days, 24).
+
+TM52 (free running buildings, May to September, occupied hours):
+
+- Criterion 1: hours with dT >= 1 K are at most 3% of the occupied hours
+- Criterion 2: the daily weighted exceedance (sum of dT >= 1 K of the
+  occupied hours of a day) is at most 6 on every day
+- Criterion 3: dT does not exceed 4 K
+- a room fails if it fails two or more criteria
+
+dT is the operative temperature less the category II limit
+(0.33 Trm + 18.8 + 3), rounded to the nearest degree (halves up).
+
+TM59 (homes):
+
+- a: TM52 criterion 1 for living rooms, kitchens and bedrooms
+- b: bedrooms above 26 degC for at most 1% of the annual night hours
+  (22:00-07:00, i.e. 32 hours)
+- mechanically ventilated rooms: above 26 degC for at most 3% of the annual
+  occupied hours
+
+Notes
+-----
+Results are hourly, starting 1 January, 365 or 366 days. Sub-hourly results
+are averaged to hours with hourly().
+
+Occupied hours are hours with occupancy > 0.
+
+"""
+
+import math
+import time
+import numpy as np
+
+# category II comfort limit (K above the comfort temperature)
+CATEGORY_II = 3.0
+# running mean weight
+ALPHA = 0.8
+# TM52 period: 1 May to 30 September (day of the year from 0, non-leap year)
+MAY_1 = 120
+OCT_1 = 273
+
+
+def hourly(values, results_per_day=24):
+    """
+    averages sub-hourly results to hours
+    :param values: (..., timesteps) results
+    :param results_per_day: results per day of the results file
+    :return: (..., hours) hourly values
+    """
+    values = np.asarray(values, dtype=float)
+    steps = int(results_per_day // 24)
+    if steps <= 1 or values.shape[-1] <= 8784:
+        # already hourly
+        return values
+    return values.reshape(values.shape[:-1] + (-1, steps)).mean(axis=-1)
+
+
+def running_mean(outdoor_temp, alpha=ALPHA, days=60):
+    """
+    exponentially weighted running mean of the daily mean outdoor temperature
+    (previous days only), the year taken as cyclic for the first days
+    :param outdoor_temp: (hours,) hourly outdoor dry bulb temperature
+    :param alpha: running mean weight
+    :param days: number of previous days weighted (alpha ** days is negligible)
+    :return: (days,) running mean outdoor temperature of each day
+    """
+    daily = np.asarray(outdoor_temp, dtype=float).reshape(-1, 24).mean(axis=1)
+    weights = (1 - alpha) * alpha ** np.arange(days)
+    # Trm(n) = (1 - alpha) * sum(alpha ** k * Tod(n - 1 - k))
+    extended = np.concatenate([daily[-days:], daily])
+    return np.convolve(extended, weights)[days - 1:days - 1 + len(daily)]
+
+
+def comfort_limit(outdoor_temp, category=CATEGORY_II):
+    """
+    adaptive maximum acceptable temperature of each hour
+    :param outdoor_temp: (hours,) hourly outdoor dry bulb temperature
+    :param category: K above the comfort temperature
+    :return: (hours,) Tmax
+    """
+    trm = running_mean(outdoor_temp)
+    return np.repeat(0.33 * trm + 18.8 + category, 24)
+
+
+def summer_hours(hours):
+    """
+    hours of the TM52 period (May to September)
+    :param hours: number of hours in the year
+    :return: (hours,) bool
+    """
+    leap = 1 if hours > 8760 else 0
+    day = np.arange(hours) // 24
+    return (day >= MAY_1 + leap) & (day < OCT_1 + leap)
+
+
+def tm52(operative_temp, occupancy, outdoor_temp):
+    """
+    TM52 criteria of every room
+    :param operative_temp: (rooms, hours) operative (dry resultant) temperature
+    :param occupancy: (rooms, hours) occupancy (people)
+    :param outdoor_temp: (hours,) outdoor dry bulb temperature
+    :return: dict of (rooms,) arrays
+        occupied_hours: occupied hours in May to September
+        c1_hours, c1_percent, c1_pass: hours with dT >= 1 K and their % of the occupied hours
+        c2_max_we, c2_days, c2_pass: max daily weighted exceedance, days above 6
+        c3_max_dt, c3_hours, c3_pass: max dT and hours above 4 K
+        fails: number of failed criteria; tm52_pass: fewer than two fails
+    """
+    operative_temp = np.atleast_2d(np.asarray(operative_temp, dtype=float))
+    occupied = np.atleast_2d(np.asarray(occupancy, dtype=float)) > 0
+    occupied &= summer_hours(operative_temp.shape[1])
+
+    # rounded to the nearest degree, halves up (np.rint rounds halves to even)
+    delta = np.floor(operative_temp - comfort_limit(outdoor_temp) + 0.5)
+    # dT of the occupied hours; 0 when unoccupied
+    exceedance = np.where(occupied & (delta >= 1), delta, 0)
+
+    occupied_hours = occupied.sum(axis=1)
+    c1_hours = (exceedance >= 1).sum(axis=1)
+    c1_percent = np.divide(c1_hours * 100.0, occupied_hours,
+                           out=np.zeros(len(occupied_hours)), where=occupied_hours > 0)
+
+    daily_we = exceedance.reshape(len(exceedance), -1, 24).sum(axis=2)
+    c2_days = (daily_we > 6).sum(axis=1)
+
+    c3_hours = (exceedance > 4).sum(axis=1)
+    c3_max_dt = np.where(occupied, delta, -np.inf).max(axis=1, initial=-np.inf)
+
+    c1_pass = c1_percent <= 3
+    c2_pass = c2_days == 0
+    c3_pass = c3_hours == 0
+    fails = 3 - (c1_pass.astype(int) + c2_pass + c3_pass)
+
+    return {'occupied_hours': occupied_hours,
+            'c1_hours': c1_hours, 'c1_percent': c1_percent, 'c1_pass': c1_pass,
+            'c2_max_we': daily_we.max(axis=1), 'c2_days': c2_days, 'c2_pass': c2_pass,
+            'c3_max_dt': np.where(occupied_hours > 0, c3_max_dt, np.nan), 'c3_hours': c3_hours, 'c3_pass': c3_pass,
+            'fails': fails, 'tm52_pass': fails < 2}
+
+
+def tm59(operative_temp, occupancy, outdoor_temp, bedrooms=None, mechanical=False):
+    """
+    TM59 criteria of every room
+    :param operative_temp: (rooms, hours) operative (dry resultant) temperature
+    :param occupancy: (rooms, hours) occupancy (people)
+    :param outdoor_temp: (hours,) outdoor dry bulb temperature
+    :param bedrooms: (rooms,) bool, bedrooms; None = no bedrooms
+    :param mechanical: mechanically ventilated (the 26 degC criterion only)
+    :return: dict of (rooms,) arrays
+        a_percent, a_pass: TM52 criterion 1 (naturally ventilated)
+        b_hours, b_pass: night hours above 26 degC (bedrooms; pass for other rooms)
+        mech_percent, mech_pass: % of annual occupied hours above 26 degC
+        tm59_pass: all applicable criteria pass
+    """
+    operative_temp = np.atleast_2d(np.asarray(operative_temp, dtype=float))
+    occupied = np.atleast_2d(np.asarray(occupancy, dtype=float)) > 0
+    rooms, hours = operative_temp.shape
+    bedrooms = np.zeros(rooms, dtype=bool) if bedrooms is None else np.asarray(bedrooms, dtype=bool)
+
+    hour_of_day = np.arange(hours) % 24
+    night = (hour_of_day >= 22) | (hour_of_day < 7)
+    b_hours = ((operative_temp > 26) & night).sum(axis=1)
+    night_hours = night.sum()
+    b_pass = ~bedrooms | (b_hours <= np.floor(night_hours * 0.01))
+
+    annual_occupied = occupied.sum(axis=1)
+    mech_hours = ((operative_temp > 26) & occupied).sum(axis=1)
+    mech_percent = np.divide(mech_hours * 100.0, annual_occupied,
+                             out=np.zeros(rooms), where=annual_occupied > 0)
+    mech_pass = mech_percent <= 3
+
+    criterion_1 = tm52(operative_temp, occupancy, outdoor_temp)
+    a_pass = criterion_1['c1_pass']
+
+    return {'a_percent': criterion_1['c1_percent'], 'a_pass': a_pass,
+            'b_hours': b_hours, 'b_pass': b_pass,
+            'mech_percent': mech_percent, 'mech_pass': mech_pass,
+            'tm59_pass': mech_pass if mechanical else a_pass & b_pass}
+
+
+def range_test(operative_temp, occupancy, thresholds=(25, 28)):
+    """
+    occupied hours above fixed thresholds
+    :param operative_temp: (rooms, hours) operative (dry resultant) temperature
+    :param occupancy: (rooms, hours) occupancy (people)
+    :param thresholds: degC
+    :return: occupied hours (rooms,), hours above each threshold (thresholds, rooms)
+    """
+    operative_temp = np.atleast_2d(np.asarray(operative_temp, dtype=float))
+    occupied = np.atleast_2d(np.asarray(occupancy, dtype=float)) > 0
+    thresholds = np.asarray(thresholds, dtype=float)[:, None, None]
+    return occupied.sum(axis=1), ((operative_temp > thresholds) & occupied).sum(axis=2)
+
+
+def synthetic_rooms(rooms=500, hours=8760, seed=0):
+    """
+    synthetic room results for testing and benchmarking
+    :param rooms: number of rooms
+    :param hours: number of hours
+    :param seed: random seed
+    :return: operative_temp (rooms, hours), occupancy (rooms, hours), outdoor_temp (hours,)
+    """
+    rng = np.random.default_rng(seed)
+    hour = np.arange(hours)
+    outdoor_temp = 11 - 8 * np.cos(2 * np.pi * (hour / hours - 0.03)) - 4 * np.cos(2 * np.pi * (hour % 24 - 3) / 24)
+    occupancy = np.tile(((hour % 24 >= 8) & (hour % 24 < 18)).astype(float) * 2, (rooms, 1))
+    gains = rng.uniform(0.5, 4, (rooms, 1))
+    operative_temp = 21 + 0.4 * (outdoor_temp - 11) + gains * occupancy / 2 + rng.normal(0, 0.7, (rooms, hours))
+    return operative_temp, occupancy, outdoor_temp
+
+
+def benchmark(rooms=500, hours=8760):
+    """
+    compares a per room, per hour loop (as overheating_test.py did for the range
+    test, extended to TM52) with the engine
+    :param rooms: number of rooms
+    :param hours: number of hours
+    :return: dict of times (s)
+    """
+    operative_temp, occupancy, outdoor_temp = synthetic_rooms(rooms, hours)
+    limit = comfort_limit(outdoor_temp).tolist()
+    summer = summer_hours(hours).tolist()
+
+    start = time.perf_counter()
+    loop_c1 = []
+    for r in range(rooms):
+        temps = operative_temp[r].tolist()
+        people = occupancy[r].tolist()
+        occupied_hours = 0
+        exceeding = 0
+        for h, temp in enumerate(temps):
+            if people[h] > 0 and summer[h]:
+                occupied_hours += 1
+                if math.floor(temp - limit[h] + 0.5) >= 1:
+                    exceeding += 1
+        loop_c1.append(exceeding)
+    loop_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = tm52(operative_temp, occupancy, outdoor_temp)
+    tm59(operative_temp, occupancy, outdoor_temp)
+    range_test(operative_temp, occupancy)
+    engine_time = time.perf_counter() - start
+
+    assert (results['c1_hours'] == np.array(loop_c1)).all()
+
+    print('Rooms: ' + str(rooms))
+    print('Loop (TM52 criterion 1 only): {:.3f} s'.format(loop_time))
+    print('Engine (TM52, TM59 and range test): {:.3f} s'.format(engine_time))
+    print('TM52 fails: ' + str(int((~results['tm52_pass']).sum())) + ' of ' + str(rooms) + ' rooms')
+    return {'loop': loop_time, 'engine': engine_time}
+
+
+if __name__ == '__main__':
+    benchmark()
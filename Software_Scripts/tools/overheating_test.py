@@ -6,7 +6,8 @@ Overheating test
 Module description
 ------------------
 
-Tests for occupied overheating for 25 & 28 degC thresholds.
+Tests for occupied overheating for 25 & 28 degC thresholds and the CIBSE TM52
+criteria (see overheating_engine.py).
 Outputs to xlsx.
 Metric only.
 
@@ -23,6 +24,90 @@ from tkinter import ttk
 import tkinter.messagebox as messagebox
 import xlsxwriter
 import os
+import numpy as np
+import overheating_engine
+
+
+def get_outdoor_temperature(results_reader_file):
+    """
+    Reads the outdoor dry bulb temperature of the results file.
+
+    Returns
+    -------
+    numpy array or None if not available
+
+    """
+    try:
+        return results_reader_file.get_weather_results('Temperature', 'Dry-bulb temperature')
+    except Exception:
+        return None
+
+
+def get_overheating_data(results_reader_file, rooms_to_be_analysed, aps_file):
+    """
+    Range test (occupied hours above 25 & 28 degC) and TM52 criteria of the rooms to be analysed,
+    calculated for all rooms at once with overheating_engine.
+
+    Parameters
+    ----------
+    results_reader_file : open results reader
+    rooms_to_be_analysed : room ids
+    aps_file : aps file name
+
+    Returns
+    -------
+    list of rows: room name, hours > 25, % hours > 25, hours > 28, % hours > 28,
+    TM52 criterion 1 (%), criterion 2 (days), criterion 3 (hours), result
+
+    """
+    rooms = [room for room in results_reader_file.get_room_list() if room[1] in rooms_to_be_analysed]
+    print('Reading ' + str(len(rooms)) + ' rooms in ' + aps_file)
+    if not rooms:
+        return []
+
+    room_temp = np.array([results_reader_file.get_room_results(room_id, 'Comfort temperature', 'Dry resultant temperature', 'z')
+                          for _, room_id, _, _ in rooms], dtype=float).reshape(len(rooms), -1)
+    occupancy = np.array([results_reader_file.get_room_results(room_id, 'Number of people', 'Number of people', 'z')
+                          for _, room_id, _, _ in rooms], dtype=float).reshape(len(rooms), -1)
+
+    # counts the occupied timesteps above 25 and 28 deg C and adjusts them depending on the
+    # reporting interval to normalize them to amount of hours
+    results_per_day = results_reader_file.results_per_day
+    results_per_hour = results_per_day / 24
+    occupied_timesteps, timesteps_over = overheating_engine.range_test(room_temp, occupancy, (25, 28))
+    occupied_hours = occupied_timesteps / results_per_hour
+    range_test_25_deg, range_test_28_deg = timesteps_over / results_per_hour
+
+    outdoor_temp = get_outdoor_temperature(results_reader_file)
+    tm52 = None
+    if outdoor_temp is not None:
+        tm52 = overheating_engine.tm52(overheating_engine.hourly(room_temp, results_per_day),
+                                       overheating_engine.hourly(occupancy, results_per_day),
+                                       overheating_engine.hourly(outdoor_temp, results_per_day))
+    else:
+        print('Outdoor temperature not available; TM52 criteria not calculated')
+
+    overheating_data = []
+    for i, (name, _, _, _) in enumerate(rooms):
+        # calculates the % of hours above the thresholds by dividing by the annual occupied hours
+        # value will vary slightly with different reporting interval
+        if occupied_hours[i] > 0:
+            percent_25_deg = str(round(range_test_25_deg[i] / occupied_hours[i] * 100, 2)) + '%'
+            percent_28_deg = str(round(range_test_28_deg[i] / occupied_hours[i] * 100, 2)) + '%'
+        else:
+            percent_25_deg = '0%'
+            percent_28_deg = '0%'
+
+        room_overheating_data = [name, range_test_25_deg[i], percent_25_deg, range_test_28_deg[i], percent_28_deg]
+        if tm52 is not None:
+            room_overheating_data += [round(tm52['c1_percent'][i], 2), int(tm52['c2_days'][i]), int(tm52['c3_hours'][i]),
+                                      'Pass' if tm52['tm52_pass'][i] else 'Fail']
+        else:
+            room_overheating_data += ['', '', '', '']
+
+        overheating_data.append(room_overheating_data)
+    return overheating_data
+
 
 def generate_window(project, ve_folder, results_reader, room_groups):
 
@@ -187,75 +272,11 @@ def generate_window(project, ve_folder, results_reader, room_groups):
             # open results file
             results_reader_file = results_reader.open(aps_file_name)
 
-            # run main calculation functions
-            def get_overheating_data(results_reader_file, rooms_to_be_analysed, aps_file):
-                overheating_data = []
-                rooms = results_reader_file.get_room_list()
-                # loops through every room in the model
-                for room_number, room in enumerate(rooms):
-                    # unpack the tuples of room data that is returned from the ResultsReader function. the variables 'a' and
-                    #  'b' and not used here but had to be assigned to something
-                    name, room_id, a, b = room
-
-                    # prints progress information to the console for the user
-                    if room_number % 10 == 0 and room_number + 10 < len(rooms):
-                        print('Calculating Rooms: ' + str(room_number + 1) + ' - ' + str(room_number + 10) + ' of ' + str(len(rooms)) + ' in ' + aps_file)
-                    elif room_number % 10 == 0 and room_number + 10 >= len(rooms):
-                        print('Calculating Rooms: ' + str(room_number + 1) + ' - ' + str(len(rooms)) + ' of ' + str(len(rooms)) + ' in ' + aps_file)
-
-                    # checks if the current room is part of the 'rooms_to_be_analysed' list. Only performs calculations on the rooms that the user placed in the room group
-                    if room_id in rooms_to_be_analysed:
-                        np_room_temp = results_reader_file.get_room_results(room_id, 'Comfort temperature', 'Dry resultant temperature', 'z')
-                        np_occupancy = results_reader_file.get_room_results(room_id, 'Number of people', 'Number of people', 'z')
-
-                        # variables for the range test
-                        timesteps_over_28_deg = 0
-                        timesteps_over_25_deg = 0
-                        occupied_timesteps = 0
-
-                        # convert numpy arrays to python lists
-                        room_temp = np_room_temp.tolist()
-                        occupancy = np_occupancy.tolist()
-
-                        # counts if rooms are above 25 and 28 deg C per timestep
-                        # increments the relevant variable if required
-                        for num, temp in enumerate(room_temp):
-                            if temp > 28 and occupancy[num] > 0:
-                                timesteps_over_28_deg += 1
-                                timesteps_over_25_deg += 1
-                                occupied_timesteps += 1
-                            elif temp > 25 and occupancy[num] > 0:
-                                timesteps_over_25_deg += 1
-                                occupied_timesteps += 1
-                            elif occupancy[num] > 0:
-                                occupied_timesteps += 1
-
-                        # adjust the counts depending on the reporting interval
-                        # to normalize them to amount of hours
-                        results_per_hour = results_reader_file.results_per_day / 24
-
-                        range_test_28_deg = timesteps_over_28_deg / results_per_hour
-                        range_test_25_deg = timesteps_over_25_deg / results_per_hour
-                        occupied_hours = occupied_timesteps / results_per_hour
-
-                        # calculates the % of hours above the thresholds by dividing by the annual occupied hours
-                        # value will vary slightly with different reporting interval
-                        if occupied_hours > 0:
-                            percent_25_deg = str(round(range_test_25_deg / occupied_hours * 100, 2)) + '%'
-                            percent_28_deg = str(round(range_test_28_deg / occupied_hours * 100, 2)) + '%'
-                        else:
-                            percent_25_deg = '0%'
-                            percent_28_deg = '0%'
-
-                        room_overheating_data = [name, range_test_25_deg, percent_25_deg, range_test_28_deg, percent_28_deg]
-
-                        overheating_data.append(room_overheating_data)
-                return overheating_data
-
             print('Running Calculations')
             overheating_data = get_overheating_data(results_reader_file, rooms_to_be_analysed, aps_file_name)
 
-            heading = ['Room Name', 'Hours > 25\u2070C', '% Hours > 25\u2070C', 'Hours > 28\u2070C', '% Hours > 28\u2070C']
+            heading = ['Room Name', 'Hours > 25\u2070C', '% Hours > 25\u2070C', 'Hours > 28\u2070C', '% Hours > 28\u2070C',
+                       'TM52 Criterion 1 (% Hours)', 'TM52 Criterion 2 (Days)', 'TM52 Criterion 3 (Hours)', 'TM52 Result']
 
             # write data to excel worksheets
             print('Writing results to Excel Sheet')
@@ -276,11 +297,12 @@ def generate_window(project, ve_folder, results_reader, room_groups):
                 sheet1.write(y, 2, row[2], format_pct)
                 sheet1.write(y, 3, row[3], format_deg)
                 sheet1.write(y, 4, row[4], format_pct)
+                sheet1.write_row(y, 5, row[5:], format_deg)
                 y += 1
 
             # set column widths
             sheet1.set_column('A:A', 40)
-            sheet1.set_column('B:E', 20)
+            sheet1.set_column('B:I', 20)
 
             try:
                 workbook.close()
@@ -10,20 +10,31 @@ Finally, a Word document is created that contains all the images
 with corresponding profile name/ID
 
 The images and word document are stored in the project "content" folder
+
+Charts are only plotted again when the profile data (including the daily
+profiles it references) has changed since the previous run: the fingerprint
+of each chart is kept in a manifest file in the building folder, with the
+files written, and files of profiles no longer assigned are removed. The
+charts to plot are drawn in worker processes (see profile_charts.py) and the
+Word document is written from the manifest.
 """
-import iesve
 import sys
 import re
 import os
 import csv
+import json
+import hashlib
 import datetime as dt
 from dateutil.relativedelta import relativedelta
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
-from matplotlib.ticker import MultipleLocator, FormatStrFormatter
-from matplotlib.backends.backend_agg import FigureCanvasAgg as FigureCanvas
-from matplotlib.figure import Figure
-import seaborn as sns
+import profile_charts
+
+MANIFEST_NAME = 'profiles_manifest.json'
+
+CATEGORIES = {'daily': "Daily profiles",
+              'weekly': "Weekly Profiles",
+              'annual': "Annual profiles",
+              'compact': "Compact profiles",
+              'freeform': "Free form profiles"}
 
 
 def print_profile(prof):
@@ -48,7 +59,7 @@ def get_daily_profile_reference(id, day_profiles, proj):
     return day_profile.reference
 
 
-def save_group_profile(prof, folder, project, day_profiles, category):
+def save_group_profile(prof, folder, project, day_profiles, category, registered=()):
     profile_file_name = generate_filename(prof, folder) + ".csv"
     days = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday", "Holiday", "Heating-Rm", "Cooling-Rm", "Heating-Sys", "Cooling-Sys"]
     maxNumDays = len(days)
@@ -73,7 +84,10 @@ def save_group_profile(prof, folder, project, day_profiles, category):
                         to_date = dt.date(1999, 1, 1) + relativedelta(days=+(entry[2] - 1))
                         csv_writer.writerow([entry[0], 'TODO', entry[1], entry[2], fromDate.strftime('%d/%m'), to_date.strftime('%d/%m')])
             profile_name = '{0} [{1}]'.format(prof.reference, prof.id)
-            project.register_content(profile_file_name, "{} Profiles (csv)".format(category), profile_name, False)
+            if profile_file_name not in registered:
+                project.register_content(profile_file_name, "{} Profiles (csv)".format(category), profile_name, False)
+            return profile_file_name
+    return None
 
 
 def ensure_dir(f):
@@ -126,430 +140,197 @@ def generate_filename(prof, folder):
             return ""
 
 
-def plot_day_profile_to_subplot(curax, prof):
-    x_vals = []
-    y_vals = []
-
-    if prof is not None:
-        profile_data = prof.get_data()
-        for steps in profile_data:
-            x_vals.append(steps[0])
-            y_vals.append(steps[1])
-        if len(profile_data) == 1:
-            x_vals.append(24.0)
-            y_vals.append(profile_data[0][1])
-    else:
-        print("Warning: no daily profile data to plot")
-
-    curax.plot(x_vals, y_vals, color='#ffa500', lw=2)
-
-
-def chart_week_group_profile(prof, target_folder, ve_proj, day_profiles, group_filenames):
-    filename = generate_filename(prof, target_folder)
-
-    if filename == "":
-        return
-    profile_name = '{0} [{1}]'.format(prof.reference, prof.id)
-
-    print("Plotting weekly profile %s [%s]" % (prof.reference, prof.id))
-    profile_data = prof.get_data()
-    if len(profile_data) != 10:
-        print ("Warning: skipping incomplete week profile:" + prof.id)
-        return
-
-    # create a suitable subplot layout
-    cur_fig, ax = plt.subplots(1, 10, sharex=True, sharey=True, subplot_kw=dict(xlim=(0, 24)))
-    cur_fig.set_size_inches(22.5, 3.0)
-
-    cur_fig.suptitle('Weekly profile: ' + prof.reference + ' (' + prof.id + ')', fontsize=12, fontweight='bold')
-
-    day_names = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday", "Holiday", "Heating", "Cooling"]
-    num_days = len(day_names)
-    major_locator = MultipleLocator(8)
-    major_formatter = FormatStrFormatter('%d:00')
-    minor_locator = MultipleLocator(4)
+def get_daily_profile(id, day_profiles, proj):
+    # re-use the daily profiles already fetched
+    try:
+        day_profile = day_profiles[id]
+    except KeyError:
+        day_profile = proj.daily_profile(id)
+        if day_profile is not None:
+            day_profiles[id] = day_profile
+    return day_profile
 
-    for i, profile_entry in enumerate(profile_data):
-        if i >= num_days:
-            break
 
-        try:
-            day_profile = day_profiles[profile_entry]
-        except KeyError:
-            day_profile = ve_proj.daily_profile(profile_entry)
-            if day_profile is not None:
-                day_profiles[profile_entry] = day_profile
+def day_profile_data(day_profile):
+    if day_profile is None:
+        return None
+    return [[steps[0], steps[1]] for steps in day_profile.get_data()]
 
-        if day_profile is None:
-            print("Warning: daily profile not found for ID: %s (weekly profile ID: %s)" % (profile_entry, prof.id))
 
-        current_subplot = ax[i]
+def plain(data):
+    # profile data as nested lists, so that it can be fingerprinted and sent to the worker processes
+    if isinstance(data, (list, tuple)):
+        return [plain(item) for item in data]
+    return data
 
-        plot_day_profile_to_subplot(current_subplot, day_profile)
-        current_subplot.set_title(day_names[i])
 
-        current_subplot.xaxis.set_major_locator(major_locator)
-        current_subplot.xaxis.set_major_formatter(major_formatter)
+def profile_spec(prof, proj, group_profiles, day_profiles):
+    """
+    plain data of a profile chart (see profile_charts); the daily profiles referenced
+    by a group profile are added to day_profiles
+    :param prof: daily or group profile
+    :param proj: VE project
+    :param group_profiles: group profiles already fetched
+    :param day_profiles: daily profiles already fetched
+    :return: spec dict, None if the profile is not plotted
+    """
+    spec = {'id': prof.id, 'reference': prof.reference}
 
-        # For the minor ticks, use no labels; default NullFormatter
-        current_subplot.xaxis.set_minor_locator(minor_locator)
+    if not prof.is_group():
+        spec.update(kind='daily', absolute=prof.is_absolute(), data=day_profile_data(prof))
 
-        if i == 0:
-            # set a label for the first plot only
-            if prof.is_absolute():
-                current_subplot.set_ylabel("Absolute value")
+    elif prof.is_weekly():
+        profile_data = prof.get_data()
+        if len(profile_data) != 10:
+            print("Warning: skipping incomplete week profile:" + prof.id)
+            return None
+
+        days = []
+        for profile_entry in profile_data:
+            day_profile = get_daily_profile(profile_entry, day_profiles, proj)
+            if day_profile is None:
+                print("Warning: daily profile not found for ID: %s (weekly profile ID: %s)" % (profile_entry, prof.id))
+            days.append(day_profile_data(day_profile))
+        spec.update(kind='weekly', absolute=prof.is_absolute(), days=days)
+
+    elif prof.is_yearly():
+        entries = []
+        for annual_profile_entry in prof.get_data():
+            try:
+                week_profile = group_profiles[annual_profile_entry[0]]
+            except KeyError:
+                week_profile = proj.groupProfile(annual_profile_entry[0])
+                if week_profile is not None:
+                    group_profiles[annual_profile_entry[0]] = week_profile
+
+            days = None
+            if week_profile is None:
+                print("Warning: weekly profile not found for ID: %s (annual profile ID: %s)" % (annual_profile_entry[0], prof.id))
             else:
-                current_subplot.set_ylabel("Modulating value")
+                days = []
+                for day_number, day_profile_entry in enumerate(week_profile.get_data()):
+                    day_profile = get_daily_profile(day_profile_entry, day_profiles, proj)
+                    if day_profile is None:
+                        print("Warning: daily profile %d not found for ID: %s (annual profile ID: %s, weekly Profile ID: %s)"
+                              % (day_number, day_profile_entry, prof.id, annual_profile_entry[0]))
+                    days.append(day_profile_data(day_profile))
+            entries.append({'from': annual_profile_entry[1], 'to': annual_profile_entry[2], 'days': days})
+        spec.update(kind='annual', entries=entries)
+
+    elif prof.is_compact():
+        spec.update(kind='compact', data=plain(prof.get_data()))
+
+    elif prof.is_freeform():
+        import iesve
+        assert isinstance(prof, iesve.FreeFormProfile), "Profile is not Free-form"
+        prof.load_data()
+        if not prof.is_graphable():
+            return None
+        spec.update(kind='freeform', absolute=prof.is_absolute(), data=plain(prof.get_data()))
 
-    sns.despine()
-    plt.tight_layout()   # tight_layout helps with the overwriting of string but kinda messes up the axis scales
-
-    cur_fig.subplots_adjust(wspace=0.3, left=0.04, right=0.98, top=0.85)
-
-    filename_png = filename + '.png'
-    cur_fig.savefig(filename_png)
-    group_filenames[prof.id] = filename_png
-
-    ve_proj.register_content(filename_png, "Weekly Profiles", profile_name, False)
-
-    cur_fig.clf()
-    plt.clf()
-    plt.close('all')
-
-
-def chart_annual_group_profile(prof, target_folder, ve_proj, group_profiles, day_profiles, group_filenames):
-    filename = generate_filename(prof, target_folder)
-
-    if filename == "":
-        return
-
-    profile_name = '{0} [{1}]'.format(prof.reference, prof.id)
-
-    print("Plotting annual profile %s [%s]" % (prof.reference, prof.id))
-    profile_data = prof.get_data()
-    num_entries = len(profile_data)
-    day_names = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday", "Holiday", "Heating-Rm", "Cooling-Rm", "Heating-Sys", "Cooling-Sys"]
-    num_days = len(day_names)
-
-    # create a suitable subplot layout
-    cur_fig, ax = plt.subplots(num_entries, num_days, sharex=True, sharey=True, subplot_kw=dict(xlim=(0, 24)))
-    cur_fig.set_size_inches(22, (num_entries * 2) + 1)  # a plot is 2-ish" high, and 7-ish across for 8
-
-    major_locator = MultipleLocator(8)
-    major_formatter = FormatStrFormatter('%d:00')
-    minor_locator = MultipleLocator(4)
+    else:
+        return None
 
-    for weeks, annual_profile_entry in enumerate(profile_data):
-        try:
-            week_profile = group_profiles[annual_profile_entry[0]]
-        except KeyError:
-            week_profile = ve_proj.groupProfile(annual_profile_entry[0])
-            if week_profile is not None:
-                group_profiles[annual_profile_entry.id] = week_profile
-
-        if week_profile is None:
-            print("Warning: weekly profile not found for ID: %s (annual profile ID: %s)" % (annual_profile_entry[0], prof.id))
-
-        if week_profile is not None:
-            week_profile_data = week_profile.get_data()
-
-            for days, day_profile_entry in enumerate(week_profile_data):
-                if num_entries == 1:
-                    current_subplot = ax[days]
-                else:
-                    current_subplot = ax[weeks, days]
-
-                try:
-                    day_profile = day_profiles[day_profile_entry]
-                except KeyError:
-                    day_profile = ve_proj.daily_profile(day_profile_entry)
-                    if day_profile is not None:
-                        day_profiles[day_profile_entry] = day_profile
-
-                if day_profile is None:
-                    print("Warning: daily profile %d not found for ID: %s (annual profile ID: %s, weekly Profile ID: %s)"
-                          % (days, day_profile_entry, prof.id, annual_profile_entry[0]))
-
-                plot_day_profile_to_subplot(current_subplot, day_profile)
-
-                current_subplot.xaxis.set_major_locator(major_locator)
-                current_subplot.xaxis.set_major_formatter(major_formatter)
-
-                # For the minor ticks, use no labels; default NullFormatter
-                current_subplot.xaxis.set_minor_locator(minor_locator)
-
-                # for every day, write a title (effectively a column header) but only for the first row
-                if weeks == 0:
-                    current_subplot.set_title(day_names[days])
-
-                # for every row, write the dates covered by this profile (only write for first column)
-                if days == 0:
-                    # set a label for the first plot only
-                    fromDate = dt.date(1999, 1, 1)+relativedelta(days=+(annual_profile_entry[1] - 1))
-                    to_date = dt.date(1999, 1, 1)+relativedelta(days=+(annual_profile_entry[2] - 1))
-                    current_subplot.set_ylabel(fromDate.strftime('%d/%m') + ' - ' + to_date.strftime('%d/%m'))
-
-    # now tighten up the spacing and save out the chart to disk
-    plt.tight_layout()   # tight_layout helps with the overwriting of string but kinda messes up the axis scales
-
-    # leave 20 pixels space for the title - this needs to be calculated as a percentage for subplots_adjust
-    # assume 300dpi, so 60 pixels for the title
-    total_height_DPI = 100.0 * ((num_entries * 2.0) + 1.0)
-    ratio = 1.0 - ((40.0 + (6.0 * num_entries)) / total_height_DPI)
-    cur_fig.subplots_adjust(top=ratio)
-
-    cur_fig.suptitle('Annual profile: ' + prof.reference + ' (' + prof.id + ')', fontsize=12, fontweight='bold')
-    sns.despine()
+    return spec
 
-    filename_png = filename + '.png'
-    cur_fig.savefig(filename_png)
-    group_filenames[prof.id] = filename_png
 
-    ve_proj.register_content(filename_png, "Annual profiles", profile_name, False)
+def fingerprint(spec, filename_png):
+    # changes with the profile data, the referenced daily profiles, the file name and the charts
+    text = json.dumps([profile_charts.RENDER_VERSION, filename_png, spec], sort_keys=True, default=str)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
 
-    cur_fig.clf()
-    plt.clf()
-    plt.close('all')
 
+def new_manifest():
+    return {'group': {}, 'daily': {}, 'csv': {}, 'document': None}
 
-def chart_compact_profile(prof, target_folder, ve_proj, group_filenames):
-    filename = generate_filename(prof, target_folder)
 
-    if filename == "":
+def read_manifest(folder):
+    try:
+        with open(folder + MANIFEST_NAME) as manifest_file:
+            manifest = json.load(manifest_file)
+    except (OSError, ValueError):
+        return new_manifest()
+    for key, value in new_manifest().items():
+        manifest.setdefault(key, value)
+    return manifest
+
+
+def write_manifest(folder, manifest):
+    with open(folder + MANIFEST_NAME, 'w') as manifest_file:
+        json.dump(manifest, manifest_file, indent=1, sort_keys=True)
+
+
+def manifest_files(manifest):
+    # files written (and registered) by a run
+    files = set(entry['png'] for section in ('group', 'daily') for entry in manifest[section].values())
+    files.update(manifest['csv'].values())
+    if manifest['document']:
+        files.add(manifest['document'])
+    return files
+
+
+def plan_chart(spec, prof, folder, section, old_manifest, manifest, jobs):
+    """
+    adds a chart to the manifest; the chart is plotted (added to jobs) unless the
+    chart of the previous run has the same fingerprint
+    :param spec: profile spec (None: not plotted)
+    :param prof: profile
+    :param folder: building folder
+    :param section: 'group' or 'daily'
+    :param old_manifest: manifest of the previous run
+    :param manifest: manifest of this run
+    :param jobs: list of (spec, png pathname) to plot
+    """
+    if spec is None:
         return
-
-    profile_name = '{0} [{1}]'.format(prof.reference, prof.id)
-
-    print("Plotting compact profile %s [%s]" % (prof.reference, prof.id))
-    data = prof.get_data()
-    num_entries = len(data)
-
-    # create a suitable subplot layout
-    cur_fig, ax = plt.subplots(num_entries, 1, sharex=False, sharey=True, subplot_kw=dict(xlim=(0, 24)))
-    cur_fig.set_size_inches(8, (num_entries * 3) + 1)  # a plot is 3-ish" high, and 8-ish across for the bar plot
-
-    major_locator = MultipleLocator(4)
-    major_formatter = FormatStrFormatter('%d:00')
-    minor_locator = MultipleLocator(1)
-
-    print("Compact profile: num_entries = %d" % (num_entries))
-
-    for entry in range(0, num_entries):
-        profile_entry = data[entry]
-        end_day, end_month = profile_entry[0]
-        to_date = dt.date(1999, end_month, end_day)
-
-        # subplots returns an array if num_entries > 1, so check if
-        # we need to fetch the sub-plot out of the array
-        current_subplot = ax if num_entries == 1 else ax[entry]
-        y_vals = []
-        y_labels = []
-        y_val = 10
-        for period in reversed(profile_entry[1:]):
-            x_vals = []
-            for tp in period[1:]:
-                if tp[0] is False:
-                    continue        # don't bother with switched off time periods
-                hour_on, minute_on, hourOff, minute_off = tp[1:]
-                time_on = hour_on + (minute_on / 60.0)
-                time_off = hourOff + (minute_off / 60.0)
-
-                # a compact profile is always on if the two times are the same
-                if time_on == time_off:
-                    time_on = 0.0
-                    time_off = 24.0
-
-                if time_off == 0:
-                    time_off = 24.0
-                if time_off < time_on:
-                    print("Warning: invalid compact profile entry, time_off before time_on")
-                    time_off = time_on
-
-                x_vals.append((time_on, time_off - time_on))
-
-            height_vals = (y_val - 3, 6)
-            current_subplot.broken_barh(x_vals, height_vals, facecolors='#ffa500')
-            y_vals.append(y_val)
-            y_labels.append(period[0])
-            y_val = y_val + 10
-
-        current_subplot.yaxis.set_ticks(y_vals)
-        current_subplot.yaxis.set_ticklabels(y_labels)
-        current_subplot.set_ylim(0, (10 * (len(y_labels)) + 5))
-
-        current_subplot.xaxis.set_major_locator(major_locator)
-        current_subplot.xaxis.set_major_formatter(major_formatter)
-        current_subplot.xaxis.grid(True, linestyle='dotted', alpha=0.5, color='b')
-
-        # For the minor ticks, use no labels; default NullFormatter
-        current_subplot.xaxis.set_minor_locator(minor_locator)
-
-        # for every entry, write a title
-        current_subplot.text(1.0, 1.0, 'End date: {date}'.format(date=to_date.strftime('%d/%m')), ha='left', va='bottom', size='medium')
-
-    # now tighten up the spacing and save out the chart to disk
-    plt.tight_layout()   # tight_layout helps with the overwriting of string but kinda messes up the axis scales
-
-    # leave 20 pixels space for the title - this needs to be calculated as a percentage for subplots_adjust
-    # assume 300dpi, so 60 pixels for the title
-    total_height_DPI = 100.0 * ((num_entries * 2.0) + 1.0)
-    ratio = 1.0 - ((40.0 + (6.0 * num_entries)) / total_height_DPI)
-    cur_fig.subplots_adjust(top=ratio)
-
-    cur_fig.suptitle('Compact profile: ' + prof.reference + ' (' + prof.id + ')', fontsize=12, fontweight='bold')
-    sns.despine()
-
-    filename_png = filename + '.png'
-    cur_fig.savefig(filename_png)
-    group_filenames[prof.id] = filename_png
-
-    ve_proj.register_content(filename_png, "Compact profiles", profile_name, False)
-
-    cur_fig.clf()
-    plt.clf()
-    plt.close('all')
-
-
-def chart_free_form_profile(prof, target_folder, ve_proj, group_filenames):
-    formatter = mdates.DateFormatter('%b')
-    monday = 1
-    mondays = mdates.WeekdayLocator(monday)
-    locator = mdates.MonthLocator()
-
-    filename = generate_filename(prof, target_folder)
-
+    filename = generate_filename(prof, folder)
     if filename == "":
         return
 
-    print("Plotting free-form profile %s [%s]" % (prof.reference, prof.id))
-    fig = Figure()
-    FigureCanvas(fig)
-    fig.add_subplot(111)  # "111" means "1x1 grid, first subplot"
-
-    x_vals = []
-    y_vals = []
-
-    if prof is not None:
-        profile_data = prof.get_data()
-        for entry in list(profile_data):
-            x_vals.append(mdates.date2num(dt.datetime(2015, entry[0], entry[1], entry[2], entry[3])))
-            y_vals.append(entry[4])
-    else:
-        print("Warning: no daily profile data to plot")
-
-    plt.plot(x_vals, y_vals, color='#ffa500', linewidth=0.5)
-
-    cur_axis = plt.gca()
-    cur_axis.xaxis.set_major_locator(locator)
-    cur_axis.xaxis.set_major_formatter(formatter)
-    cur_axis.xaxis.set_minor_locator(mondays)
-    cur_axis.autoscale_view()
-
-    plt.suptitle(prof.reference + ' (' + prof.id + ')')
-
-    for label in cur_axis.get_xmajorticklabels():
-        label.set_fontsize(7)
-
-    # Set the axis labels
-    plt.xlabel("Time")
-    if prof.is_absolute():
-        plt.ylabel("Absolute value")
-    else:
-        plt.ylabel("Modulating value")
-
-    sns.despine()
-
-    fig.autofmt_xdate()
-
     filename_png = filename + '.png'
-    plt.savefig(filename_png)
-    group_filenames[prof.id] = filename_png
-
-    profile_name = '{0} [{1}]'.format(prof.reference, prof.id)
-    ve_proj.register_content(filename_png, "Free form profiles", profile_name, False)
-
-    plt.clf()
-    fig.clf()
-    plt.close('all')
-
-
-def create_chart(prof, target_folder, chart_dict, project):
-    filename = generate_filename(prof, target_folder)
-
-    if filename == "":
-        return
-
-    profile_name = '{0} [{1}]'.format(prof.reference, prof.id)
-
-    print("Plotting daily profile %s [%s]" % (prof.reference, prof.id))
-    fig = Figure()
-    FigureCanvas(fig)
-    fig.add_subplot(111)  # "111" means "1x1 grid, first subplot"
-
-    x_vals = []
-    y_vals = []
-
-    if prof is not None:
-        profile_data = prof.get_data()
-        for steps in profile_data:
-            x_vals.append(steps[0])
-            y_vals.append(steps[1])
-        if len(profile_data) == 1:
-            x_vals.append(24.0)
-            y_vals.append(profile_data[0][1])
-    else:
-        print("Warning: no daily profile data to plot")
+    entry = {'reference': prof.reference, 'kind': spec['kind'], 'png': filename_png,
+             'fingerprint': fingerprint(spec, filename_png)}
+    old_entry = old_manifest[section].get(prof.id)
 
-    major_locator = MultipleLocator(4)
-    major_formatter = FormatStrFormatter('%d:00')
-    minor_locator = MultipleLocator(1)
+    if old_entry is None or old_entry['fingerprint'] != entry['fingerprint'] or not os.path.isfile(filename_png):
+        print("Plotting %s profile %s [%s]" % (spec['kind'], prof.reference, prof.id))
+        jobs.append((spec, filename_png))
+    manifest[section][prof.id] = entry
 
-    plt.plot(x_vals, y_vals, color='#ffa500', lw=2)
 
-    cur_axis = plt.gca()
-    cur_axis.xaxis.set_major_locator(major_locator)
-    cur_axis.xaxis.set_major_formatter(major_formatter)
+def register_content(proj, filename, category, name, registered, tree=False):
+    # files registered by the previous run are registered again to update the content
+    if filename in registered:
+        proj.deregister_content(filename)
+    proj.register_content(filename, category, name, tree)
 
-    # For the minor ticks, use no labels; default NullFormatter
-    cur_axis.xaxis.set_minor_locator(minor_locator)
 
-    plt.grid(True, 'major')
-    plt.suptitle(prof.reference + ' (' + prof.id + ')')
-    plt.xlim(0, 24)
-
-    # Set the axis labels
-    plt.xlabel("Time of Day")
-    if prof.is_absolute():
-        plt.ylabel("Absolute value")
-    else:
-        plt.ylabel("Modulating value")
-
-    sns.despine()
-
-    filename_png = filename + '.png'
-    plt.savefig(filename_png)
-    chart_dict[prof.id] = filename_png
-
-    project.register_content(filename_png, "Daily profiles", profile_name, False)
-
-    plt.clf()
-    fig.clf()
-    plt.close('all')
+def remove_stale_files(old_manifest, manifest, proj):
+    stale = manifest_files(old_manifest) - manifest_files(manifest)
+    for file_path in sorted(stale):
+        try:
+            proj.deregister_content(file_path)
+            if os.path.isfile(file_path):
+                os.remove(file_path)
+        except:
+            print("Failure to remove file: {0}".format(file_path))
+    return len(stale)
 
 
-def create_word_index_document(building_target_folder, building_reference, proj, day_profiles, group_profiles, group_filenames, chart_dict):
-    from docx import Document
-    from docx.shared import Inches
-    import collections
-
+def index_document_filename(building_target_folder, building_reference, proj):
     filename = proj.name
     if building_reference is not None:
         filename += ' ({})'.format(building_reference)
     filename += ' profiles.docx'
     filename = re.sub(r'[<>:"/\|?*]', "", filename)
+    return building_target_folder + filename
+
+
+def create_word_index_document(filename, proj, manifest, registered):
+    from docx import Document
+    from docx.shared import Inches
 
     document = Document()
-    filename = building_target_folder + filename
 
     print("Writing word index document")
 
@@ -558,7 +339,8 @@ def create_word_index_document(building_target_folder, building_reference, proj,
 
     image_width = Inches(3.5)
 
-    if len(group_filenames) > 0:
+    group_charts = sorted(manifest['group'].items())
+    if len(group_charts) > 0:
         document.add_heading('Model assigned profiles', 0)
         group_table = document.add_table(rows=1, cols=3)
         group_table.style = 'Light Grid Accent 1'
@@ -566,20 +348,20 @@ def create_word_index_document(building_target_folder, building_reference, proj,
         hdr_cells[0].text = 'ID'
         hdr_cells[1].text = 'Desc'
         hdr_cells[2].text = 'Profile'
-        od = collections.OrderedDict(sorted(group_filenames.items()))
-        for key, value in od.items():
+        for key, entry in group_charts:
             row_cells = group_table.add_row().cells
             row_cells[0].text = key
-            row_cells[1].text = group_profiles[key].reference
+            row_cells[1].text = entry['reference']
 
             cell = row_cells[2]
             paragraph = cell.paragraphs[0]
             run = paragraph.add_run()
-            run.add_picture(value, width=image_width)
+            run.add_picture(entry['png'], width=image_width)
 
-    if len(chart_dict) > 0:
+    day_charts = sorted(manifest['daily'].items())
+    if len(day_charts) > 0:
         # if we also plotted group profiles, then introduce a page break for clarity
-        if len(group_filenames) > 0:
+        if len(group_charts) > 0:
             document.add_page_break()
 
         document.add_heading('Daily profiles detailed plot', 0)
@@ -589,42 +371,58 @@ def create_word_index_document(building_target_folder, building_reference, proj,
         hdr_cells[0].text = 'ID'
         hdr_cells[1].text = 'Desc'
         hdr_cells[2].text = 'Profile'
-        od = collections.OrderedDict(sorted(chart_dict.items()))
-        for key, value in od.items():
+        for key, entry in day_charts:
             row_cells = day_table.add_row().cells
             row_cells[0].text = key
-            row_cells[1].text = day_profiles[key].reference
+            row_cells[1].text = entry['reference']
 
             cell = row_cells[2]
             paragraph = cell.paragraphs[0]
             run = paragraph.add_run()
-            run.add_picture(value, width=image_width)
+            run.add_picture(entry['png'], width=image_width)
 
     document.save(filename)
-    proj.register_content(filename, 'Assigned profiles', 'Assigned profiles', True)
+    register_content(proj, filename, 'Assigned profiles', 'Assigned profiles', registered, True)
+
 
 # # MAIN BODY STARTS HERE # #
 if __name__ == '__main__':
-    # clear any old plotting data, also in case a previous plot was cancelled / interrupted
-    plt.clf()
-    plt.close('all')
-    sns.set_style("ticks")
+    import iesve
+
+    ### Settings
+    processes = None        # worker processes used to plot the charts; None = number of CPUs, 1 = in this process
+    rebuild_all = False     # True = delete all charts and plot every profile again
 
     # now get the project data
     proj = iesve.VEProject.get_current_project()
     target_folder = proj.content_folder + '\\Profiles\\'
     print("Writing profiles to folder: " + target_folder)
     ensure_dir(target_folder)
-    clean_dir(target_folder, proj)
+    if rebuild_all:
+        clean_dir(target_folder, proj)
     model_list = proj.models
     print("Number of building models: %d" % (len(model_list)))
+
+    # remove the folders of buildings no longer in the model
+    building_ids = [building.id for building in model_list]
+    for folder_name in os.listdir(target_folder):
+        folder_path = os.path.join(target_folder, folder_name)
+        if os.path.isdir(folder_path) and folder_name not in building_ids:
+            clean_dir(folder_path, proj)
+            os.rmdir(folder_path)
+
     for building in model_list:
         print("Building: %s" % (building.id))
         building_target_folder = target_folder + building.id + '\\'
         ensure_dir(building_target_folder)
 
-        group_filenames = {}
-        chart_dict = {}
+        if not os.path.isfile(building_target_folder + MANIFEST_NAME):
+            # no record of the files of a previous run
+            clean_dir(building_target_folder, proj)
+        old_manifest = read_manifest(building_target_folder)
+        registered = manifest_files(old_manifest)
+        manifest = new_manifest()
+        jobs = []
 
         # get all the assigned profiles in the building, so that we can plot them
         assigned_profile_ids = building.get_assigned_profiles()
@@ -651,30 +449,50 @@ if __name__ == '__main__':
                 print("Error: unable to find profile with ID: {}".format(profile_id))
                 continue
 
+            csv_file_name = None
             if a_profile.is_weekly():
-                save_group_profile(a_profile, building_target_folder, proj, day_profiles, "Weekly")
-                chart_week_group_profile(a_profile, building_target_folder, proj, day_profiles, group_filenames)
+                csv_file_name = save_group_profile(a_profile, building_target_folder, proj, day_profiles, "Weekly", registered)
             elif a_profile.is_yearly():
-                save_group_profile(a_profile, building_target_folder, proj, day_profiles, "Annual")
-                chart_annual_group_profile(a_profile, building_target_folder, proj, group_profiles, day_profiles, group_filenames)
-            elif a_profile.is_compact():
-                chart_compact_profile(a_profile, building_target_folder, proj, group_filenames)
-            elif a_profile.is_freeform():
-                assert isinstance(a_profile, iesve.FreeFormProfile), "Profile is not Free-form"
-                a_profile.load_data()
-                if a_profile.is_graphable():
-                    chart_free_form_profile(a_profile, building_target_folder, proj, group_filenames)
+                csv_file_name = save_group_profile(a_profile, building_target_folder, proj, day_profiles, "Annual", registered)
+            if csv_file_name:
+                manifest['csv'][profile_id] = csv_file_name
+
+            spec = profile_spec(a_profile, proj, group_profiles, day_profiles)
+            plan_chart(spec, a_profile, building_target_folder, 'group', old_manifest, manifest, jobs)
 
         # optional - chart all the daily profiles again in all detail
         print("Number of derived daily profiles: %d" % (len(day_profiles)))
-        for day_profile_id, day_profile in day_profiles.items():
-            create_chart(day_profile, building_target_folder, chart_dict, proj)
+        for day_profile_id, day_profile in list(day_profiles.items()):
+            spec = profile_spec(day_profile, proj, group_profiles, day_profiles)
+            plan_chart(spec, day_profile, building_target_folder, 'daily', old_manifest, manifest, jobs)
+
+        print("Unchanged profiles: %d, profiles to plot: %d" % (len(manifest['group']) + len(manifest['daily']) - len(jobs), len(jobs)))
+        rendered = set(profile_charts.render_all(jobs, processes))
+        planned = set(filename_png for spec, filename_png in jobs)
+
+        for section in ('group', 'daily'):
+            for profile_id, entry in list(manifest[section].items()):
+                if entry['png'] in rendered:
+                    profile_name = '{0} [{1}]'.format(entry['reference'], profile_id)
+                    register_content(proj, entry['png'], CATEGORIES[entry['kind']], profile_name, registered)
+                elif entry['png'] in planned:
+                    # not plotted; removed with the stale files and plotted again next time
+                    del manifest[section][profile_id]
 
         building_reference = None
         if len(model_list) > 1:
             building_reference = building.id
 
-        create_word_index_document(building_target_folder, building_reference, proj, day_profiles, group_profiles, group_filenames, chart_dict)
+        document_filename = index_document_filename(building_target_folder, building_reference, proj)
+        manifest['document'] = document_filename
+        removed = remove_stale_files(old_manifest, manifest, proj)
+
+        if rendered or removed or not os.path.isfile(document_filename):
+            create_word_index_document(document_filename, proj, manifest, registered)
+        else:
+            print("Word index document is up to date")
+
+        write_manifest(building_target_folder, manifest)
 
         del day_profiles
         del group_profiles
@@ -0,0 +1,378 @@
+"""
+============================
+Profile charts - renderer
+============================
+
+Module description
+------------------
+
+Draws the profile charts of plot_profiles.py from plain profile data (a spec
+dict made by plot_profiles.profile_spec) instead of the VE profile objects, so
+that the charts can be rendered in worker processes with the Agg backend.
+No iesve: the workers only import this module.
+
+Specs by kind:
+
+- daily: id, reference, absolute, data [[x, y], ...]
+- weekly: id, reference, absolute, days (10 x daily data or None)
+- annual: id, reference, entries [{from, to, days (12 x daily data or None) or None}]
+- compact: id, reference, data (as returned by the profile)
+- freeform: id, reference, absolute, data [[month, day, hour, minute, value], ...]
+
+Notes
+-----
+Increase RENDER_VERSION when the charts change so that the charts cached by
+plot_profiles.py are drawn again.
+
+"""
+
+import time
+import datetime as dt
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from dateutil.relativedelta import relativedelta
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import matplotlib.dates as mdates
+from matplotlib.ticker import MultipleLocator, FormatStrFormatter
+import seaborn as sns
+
+RENDER_VERSION = 1
+
+
+def plot_day_profile_to_subplot(curax, profile_data):
+    x_vals = []
+    y_vals = []
+
+    if profile_data is not None:
+        for steps in profile_data:
+            x_vals.append(steps[0])
+            y_vals.append(steps[1])
+        if len(profile_data) == 1:
+            x_vals.append(24.0)
+            y_vals.append(profile_data[0][1])
+    else:
+        print("Warning: no daily profile data to plot")
+
+    curax.plot(x_vals, y_vals, color='#ffa500', lw=2)
+
+
+def chart_week_group_profile(spec, filename_png):
+    # create a suitable subplot layout
+    cur_fig, ax = plt.subplots(1, 10, sharex=True, sharey=True, subplot_kw=dict(xlim=(0, 24)))
+    cur_fig.set_size_inches(22.5, 3.0)
+
+    cur_fig.suptitle('Weekly profile: ' + spec['reference'] + ' (' + spec['id'] + ')', fontsize=12, fontweight='bold')
+
+    day_names = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday", "Holiday", "Heating", "Cooling"]
+    major_locator = MultipleLocator(8)
+    major_formatter = FormatStrFormatter('%d:00')
+    minor_locator = MultipleLocator(4)
+
+    for i, day_data in enumerate(spec['days']):
+        current_subplot = ax[i]
+
+        plot_day_profile_to_subplot(current_subplot, day_data)
+        current_subplot.set_title(day_names[i])
+
+        current_subplot.xaxis.set_major_locator(major_locator)
+        current_subplot.xaxis.set_major_formatter(major_formatter)
+
+        # For the minor ticks, use no labels; default NullFormatter
+        current_subplot.xaxis.set_minor_locator(minor_locator)
+
+        if i == 0:
+            # set a label for the first plot only
+            if spec['absolute']:
+                current_subplot.set_ylabel("Absolute value")
+            else:
+                current_subplot.set_ylabel("Modulating value")
+
+    sns.despine()
+    plt.tight_layout()   # tight_layout helps with the overwriting of string but kinda messes up the axis scales
+
+    cur_fig.subplots_adjust(wspace=0.3, left=0.04, right=0.98, top=0.85)
+    cur_fig.savefig(filename_png)
+
+
+def chart_annual_group_profile(spec, filename_png):
+    entries = spec['entries']
+    num_entries = len(entries)
+    day_names = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday", "Holiday", "Heating-Rm", "Cooling-Rm", "Heating-Sys", "Cooling-Sys"]
+    num_days = len(day_names)
+
+    # create a suitable subplot layout
+    cur_fig, ax = plt.subplots(num_entries, num_days, sharex=True, sharey=True, subplot_kw=dict(xlim=(0, 24)))
+    cur_fig.set_size_inches(22, (num_entries * 2) + 1)  # a plot is 2-ish" high, and 7-ish across for 8
+
+    major_locator = MultipleLocator(8)
+    major_formatter = FormatStrFormatter('%d:00')
+    minor_locator = MultipleLocator(4)
+
+    for weeks, entry in enumerate(entries):
+        if entry['days'] is None:
+            continue
+
+        for days, day_data in enumerate(entry['days']):
+            if num_entries == 1:
+                current_subplot = ax[days]
+            else:
+                current_subplot = ax[weeks, days]
+
+            plot_day_profile_to_subplot(current_subplot, day_data)
+
+            current_subplot.xaxis.set_major_locator(major_locator)
+            current_subplot.xaxis.set_major_formatter(major_formatter)
+
+            # For the minor ticks, use no labels; default NullFormatter
+            current_subplot.xaxis.set_minor_locator(minor_locator)
+
+            # for every day, write a title (effectively a column header) but only for the first row
+            if weeks == 0:
+                current_subplot.set_title(day_names[days])
+
+            # for every row, write the dates covered by this profile (only write for first column)
+            if days == 0:
+                # set a label for the first plot only
+                fromDate = dt.date(1999, 1, 1)+relativedelta(days=+(entry['from'] - 1))
+                to_date = dt.date(1999, 1, 1)+relativedelta(days=+(entry['to'] - 1))
+                current_subplot.set_ylabel(fromDate.strftime('%d/%m') + ' - ' + to_date.strftime('%d/%m'))
+
+    # now tighten up the spacing and save out the chart to disk
+    plt.tight_layout()   # tight_layout helps with the overwriting of string but kinda messes up the axis scales
+
+    # leave 20 pixels space for the title - this needs to be calculated as a percentage for subplots_adjust
+    # assume 300dpi, so 60 pixels for the title
+    total_height_DPI = 100.0 * ((num_entries * 2.0) + 1.0)
+    ratio = 1.0 - ((40.0 + (6.0 * num_entries)) / total_height_DPI)
+    cur_fig.subplots_adjust(top=ratio)
+
+    cur_fig.suptitle('Annual profile: ' + spec['reference'] + ' (' + spec['id'] + ')', fontsize=12, fontweight='bold')
+    sns.despine()
+    cur_fig.savefig(filename_png)
+
+
+def chart_compact_profile(spec, filename_png):
+    data = spec['data']
+    num_entries = len(data)
+
+    # create a suitable subplot layout
+    cur_fig, ax = plt.subplots(num_entries, 1, sharex=False, sharey=True, subplot_kw=dict(xlim=(0, 24)))
+    cur_fig.set_size_inches(8, (num_entries * 3) + 1)  # a plot is 3-ish" high, and 8-ish across for the bar plot
+
+    major_locator = MultipleLocator(4)
+    major_formatter = FormatStrFormatter('%d:00')
+    minor_locator = MultipleLocator(1)
+
+    for entry in range(0, num_entries):
+        profile_entry = data[entry]
+        end_day, end_month = profile_entry[0]
+        to_date = dt.date(1999, end_month, end_day)
+
+        # subplots returns an array if num_entries > 1, so check if
+        # we need to fetch the sub-plot out of the array
+        current_subplot = ax if num_entries == 1 else ax[entry]
+        y_vals = []
+        y_labels = []
+        y_val = 10
+        for period in reversed(profile_entry[1:]):
+            x_vals = []
+            for tp in period[1:]:
+                if tp[0] is False:
+                    continue        # don't bother with switched off time periods
+                hour_on, minute_on, hourOff, minute_off = tp[1:]
+                time_on = hour_on + (minute_on / 60.0)
+                time_off = hourOff + (minute_off / 60.0)
+
+                # a compact profile is always on if the two times are the same
+                if time_on == time_off:
+                    time_on = 0.0
+                    time_off = 24.0
+
+                if time_off == 0:
+                    time_off = 24.0
+                if time_off < time_on:
+                    print("Warning: invalid compact profile entry, time_off before time_on")
+                    time_off = time_on
+
+                x_vals.append((time_on, time_off - time_on))
+
+            height_vals = (y_val - 3, 6)
+            current_subplot.broken_barh(x_vals, height_vals, facecolors='#ffa500')
+            y_vals.append(y_val)
+            y_labels.append(period[0])
+            y_val = y_val + 10
+
+        current_subplot.yaxis.set_ticks(y_vals)
+        current_subplot.yaxis.set_ticklabels(y_labels)
+        current_subplot.set_ylim(0, (10 * (len(y_labels)) + 5))
+
+        current_subplot.xaxis.set_major_locator(major_locator)
+        current_subplot.xaxis.set_major_formatter(major_formatter)
+        current_subplot.xaxis.grid(True, linestyle='dotted', alpha=0.5, color='b')
+
+        # For the minor ticks, use no labels; default NullFormatter
+        current_subplot.xaxis.set_minor_locator(minor_locator)
+
+        # for every entry, write a title
+        current_subplot.text(1.0, 1.0, 'End date: {date}'.format(date=to_date.strftime('%d/%m')), ha='left', va='bottom', size='medium')
+
+    # now tighten up the spacing and save out the chart to disk
+    plt.tight_layout()   # tight_layout helps with the overwriting of string but kinda messes up the axis scales
+
+    # leave 20 pixels space for the title - this needs to be calculated as a percentage for subplots_adjust
+    # assume 300dpi, so 60 pixels for the title
+    total_height_DPI = 100.0 * ((num_entries * 2.0) + 1.0)
+    ratio = 1.0 - ((40.0 + (6.0 * num_entries)) / total_height_DPI)
+    cur_fig.subplots_adjust(top=ratio)
+
+    cur_fig.suptitle('Compact profile: ' + spec['reference'] + ' (' + spec['id'] + ')', fontsize=12, fontweight='bold')
+    sns.despine()
+    cur_fig.savefig(filename_png)
+
+
+def chart_free_form_profile(spec, filename_png):
+    formatter = mdates.DateFormatter('%b')
+    monday = 1
+    mondays = mdates.WeekdayLocator(monday)
+    locator = mdates.MonthLocator()
+
+    fig = plt.figure()
+
+    x_vals = []
+    y_vals = []
+    for entry in spec['data']:
+        x_vals.append(mdates.date2num(dt.datetime(2015, entry[0], entry[1], entry[2], entry[3])))
+        y_vals.append(entry[4])
+
+    plt.plot(x_vals, y_vals, color='#ffa500', linewidth=0.5)
+
+    cur_axis = plt.gca()
+    cur_axis.xaxis.set_major_locator(locator)
+    cur_axis.xaxis.set_major_formatter(formatter)
+    cur_axis.xaxis.set_minor_locator(mondays)
+    cur_axis.autoscale_view()
+
+    plt.suptitle(spec['reference'] + ' (' + spec['id'] + ')')
+
+    for label in cur_axis.get_xmajorticklabels():
+        label.set_fontsize(7)
+
+    # Set the axis labels
+    plt.xlabel("Time")
+    if spec['absolute']:
+        plt.ylabel("Absolute value")
+    else:
+        plt.ylabel("Modulating value")
+
+    sns.despine()
+
+    fig.autofmt_xdate()
+    plt.savefig(filename_png)
+
+
+def create_chart(spec, filename_png):
+    plt.figure()
+
+    x_vals = []
+    y_vals = []
+    profile_data = spec['data']
+    for steps in profile_data:
+        x_vals.append(steps[0])
+        y_vals.append(steps[1])
+    if len(profile_data) == 1:
+        x_vals.append(24.0)
+        y_vals.append(profile_data[0][1])
+
+    major_locator = MultipleLocator(4)
+    major_formatter = FormatStrFormatter('%d:00')
+    minor_locator = MultipleLocator(1)
+
+    plt.plot(x_vals, y_vals, color='#ffa500', lw=2)
+
+    cur_axis = plt.gca()
+    cur_axis.xaxis.set_major_locator(major_locator)
+    cur_axis.xaxis.set_major_formatter(major_formatter)
+
+    # For the minor ticks, use no labels; default NullFormatter
+    cur_axis.xaxis.set_minor_locator(minor_locator)
+
+    plt.grid(True, 'major')
+    plt.suptitle(spec['reference'] + ' (' + spec['id'] + ')')
+    plt.xlim(0, 24)
+
+    # Set the axis labels
+    plt.xlabel("Time of Day")
+    if spec['absolute']:
+        plt.ylabel("Absolute value")
+    else:
+        plt.ylabel("Modulating value")
+
+    sns.despine()
+    plt.savefig(filename_png)
+
+
+CHARTS = {'daily': create_chart,
+          'weekly': chart_week_group_profile,
+          'annual': chart_annual_group_profile,
+          'compact': chart_compact_profile,
+          'freeform': chart_free_form_profile}
+
+
+def init_worker():
+    # pyplot style of each worker process
+    sns.set_style("ticks")
+
+
+def render(spec, filename_png):
+    """
+    draws one chart
+    :param spec: profile spec
+    :param filename_png: png pathname
+    :return: png pathname
+    """
+    try:
+        CHARTS[spec['kind']](spec, filename_png)
+    finally:
+        plt.close('all')
+    return filename_png
+
+
+def render_all(jobs, processes=None):
+    """
+    draws the charts in a process pool; in this process if the workers cannot start
+    :param jobs: list of (spec, png pathname)
+    :param processes: worker processes; None = number of CPUs, 1 = in this process
+    :return: png pathnames drawn
+    """
+    rendered = []
+    remaining = list(jobs)
+    start = time.time()
+
+    if processes != 1 and len(remaining) > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=processes, initializer=init_worker) as pool:
+                futures = {pool.submit(render, spec, filename_png): (spec, filename_png) for spec, filename_png in remaining}
+                for future in as_completed(futures):
+                    spec, filename_png = futures[future]
+                    try:
+                        rendered.append(future.result())
+                    except BrokenProcessPool:
+                        raise
+                    except Exception as error:
+                        print("Error: unable to plot profile %s: %s" % (spec['id'], error))
+                    remaining.remove((spec, filename_png))
+        except (BrokenProcessPool, OSError) as error:
+            print("Worker processes not available (%s); plotting in this process" % error)
+
+    if remaining:
+        init_worker()
+    for spec, filename_png in remaining:
+        try:
+            rendered.append(render(spec, filename_png))
+        except Exception as error:
+            print("Error: unable to plot profile %s: %s" % (spec['id'], error))
+
+    print("Plotted %d profiles in %.1f s" % (len(jobs), time.time() - start))
+    return rendered
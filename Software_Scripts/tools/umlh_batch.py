@@ -0,0 +1,243 @@
+"""
+================================
+Unmet load hours - batch mode
+================================
+
+Module description
+------------------
+
+Evaluates unmet load hours (UMLH) for many aps files without the UI, e.g. the
+Para_run_<n>.aps files of a parametric study, and returns one table of
+file x heating/cooling x threshold. The workbook is written once at the end
+from that table.
+
+Each aps file is evaluated in a worker process that opens its own results
+reader (iesve.ResultsReader.open), reads all rooms into arrays and runs
+umlh_engine, so the files are evaluated in parallel and the results reader
+of the VE session is not used.
+
+Run from the VE with the settings below, or call batch_unmet_load_hours.
+
+Notes
+-----
+If the worker processes cannot start or cannot import iesve (the VE python is
+embedded), the files are evaluated one after another in this process.
+
+Problem rooms are rooms with at least `limit` unmet load hours at the lowest
+threshold, as in unmet_load_hours_test.py
+
+"""
+
+import os
+import glob
+import time
+import numpy as np
+import pandas as pd
+import xlsxwriter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+import umlh_engine
+
+
+def read_room_results(results_reader, rooms, label=None):
+    """
+    reads the results required for the unmet load hours check for all rooms of an aps file
+    :param results_reader: results reader with the aps file open
+    :param rooms: room list of the results reader
+    :param label: name printed with the progress; None = no progress
+    :return: room air temperature, heating set point, cooling set point and plant profile (rooms, hours) arrays
+    """
+    variables = [('Room air temperature', 'Air temperature'),
+                 ('Heating set point', 'Heating set point'),
+                 ('Cooling set point', 'Cooling set point'),
+                 ('Plant profile', 'Plant profile')]
+    number_of_rooms = len(rooms)
+    arrays = [[] for _ in variables]
+
+    for room_number, room in enumerate(rooms):
+        # unpack the tuples of room data that is returned from the ResultsReader function
+        _, room_id, _, _ = room
+
+        if label is not None and room_number%10 == 0:
+            last = min(room_number + 10, number_of_rooms)
+            print('Reading Rooms: ' + str(room_number + 1) + ' - ' + str(last) + ' of ' + str(number_of_rooms) + ' in ' + label)
+
+        for array, (aps_var, vista_var) in zip(arrays, variables):
+            results = results_reader.get_room_results(room_id, aps_var, vista_var, 'z', 1, 365)
+
+            if results is None:
+                raise ValueError("Invalid Room Results.")
+
+            array.append(results)
+
+    return [np.asarray(array, dtype=float).reshape(number_of_rooms, -1) for array in arrays]
+
+
+def summary_rows(aps_file, umlh, heating_thresholds, cooling_thresholds, limit=300):
+    """
+    table rows of the unmet load hours of one aps file
+    :param aps_file: aps file name
+    :param umlh: umlh_engine.unmet_load_hours results
+    :param heating_thresholds: heating thresholds
+    :param cooling_thresholds: cooling thresholds
+    :param limit: unmet load hours of a problem room
+    :return: list of dicts (one per load and threshold)
+    """
+    rows = []
+    for load, thresholds in (('heating', heating_thresholds), ('cooling', cooling_thresholds)):
+        room_hours = umlh[load + '_hours']
+        for i, threshold in enumerate(thresholds):
+            rows.append({'file': aps_file,
+                         'load': load,
+                         'threshold': threshold,
+                         'simultaneous_hours': int(umlh[load + '_total'][i]),
+                         'max_room_hours': int(room_hours[i].max()) if room_hours.shape[1] else 0,
+                         'problem_rooms': int((room_hours[0] >= limit).sum()),
+                         'rooms': room_hours.shape[1]})
+    return rows
+
+
+def evaluate_aps_file(aps_path, heating_thresholds, cooling_thresholds, limit=300):
+    """
+    unmet load hours of one aps file with its own results reader (worker process)
+    :param aps_path: aps file pathname
+    :param heating_thresholds: heating thresholds
+    :param cooling_thresholds: cooling thresholds
+    :param limit: unmet load hours of a problem room
+    :return: list of dicts (one per load and threshold)
+    """
+    import iesve
+
+    results_reader = iesve.ResultsReader.open(aps_path)
+    if results_reader is None:
+        raise ValueError('Error opening results file ' + aps_path)
+    try:
+        arrays = read_room_results(results_reader, results_reader.get_room_list())
+    finally:
+        results_reader.close()
+
+    umlh = umlh_engine.unmet_load_hours(*arrays, heating_thresholds, cooling_thresholds)
+    return summary_rows(os.path.basename(aps_path), umlh, heating_thresholds, cooling_thresholds, limit)
+
+
+def find_aps_files(vista_folder, pattern='Para_run_*.aps'):
+    """
+    aps files of a folder
+    :param vista_folder: project Vista folder
+    :param pattern: file name pattern
+    :return: sorted list of aps pathnames
+    """
+    return sorted(glob.glob(os.path.join(vista_folder, pattern)))
+
+
+def batch_unmet_load_hours(aps_paths, heating_threshold=1.0, cooling_threshold=1.0, processes=None, limit=300):
+    """
+    evaluates the unmet load hours of many aps files in a process pool
+    :param aps_paths: aps file pathnames
+    :param heating_threshold: lowest heating threshold; +1 and +2 are also evaluated
+    :param cooling_threshold: lowest cooling threshold; +1 and +2 are also evaluated
+    :param processes: worker processes; None = number of CPUs, 1 = in this process
+    :param limit: unmet load hours of a problem room
+    :return: pandas DataFrame with a row per file, load and threshold (errors in an error column)
+    """
+    heating_thresholds = [heating_threshold, heating_threshold + 1, heating_threshold + 2]
+    cooling_thresholds = [cooling_threshold, cooling_threshold + 1, cooling_threshold + 2]
+    args = (heating_thresholds, cooling_thresholds, limit)
+    rows = []
+    remaining = list(aps_paths)
+    start = time.time()
+
+    if processes != 1 and len(remaining) > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=processes) as pool:
+                futures = {pool.submit(evaluate_aps_file, path, *args): path for path in remaining}
+                for future in as_completed(futures):
+                    path = futures[future]
+                    try:
+                        rows += future.result()
+                    except (ImportError, BrokenProcessPool):
+                        # iesve is only available in the VE process; stop and evaluate the rest here
+                        raise
+                    except Exception as error:
+                        rows.append({'file': os.path.basename(path), 'error': str(error)})
+                    remaining.remove(path)
+                    print(str(len(aps_paths) - len(remaining)) + ' of ' + str(len(aps_paths)) + ' files evaluated')
+        except (ImportError, BrokenProcessPool, OSError) as error:
+            print('Worker processes not available (' + str(error) + '); evaluating in this process')
+
+    done = len(aps_paths) - len(remaining)
+    for path in remaining:
+        try:
+            rows += evaluate_aps_file(path, *args)
+        except Exception as error:
+            rows.append({'file': os.path.basename(path), 'error': str(error)})
+        done += 1
+        print(str(done) + ' of ' + str(len(aps_paths)) + ' files evaluated')
+
+    print('Unmet load hours of ' + str(len(aps_paths)) + ' files in ' + str(round(time.time() - start, 1)) + ' s')
+    table = pd.DataFrame(rows)
+    if len(table):
+        table = table.sort_values(['file', 'load', 'threshold'] if 'load' in table else ['file'], kind='stable').reset_index(drop=True)
+    return table
+
+
+def write_summary_workbook(table, xlsx_path, limit=300):
+    """
+    writes the consolidated table to a workbook (one sheet per load, a row per file and a column per threshold)
+    :param table: batch_unmet_load_hours table
+    :param xlsx_path: workbook pathname
+    :param limit: unmet load hours of a problem room (highlighted)
+    """
+    book = xlsxwriter.Workbook(xlsx_path)
+    title = book.add_format({'bold': True, 'color': 'white', 'bg_color': '#448595', 'text_wrap': True, 'border': True, 'align': 'centre', 'valign': 'vcenter'})
+    main = book.add_format({'num_format': '0', 'border': True, 'align': 'centre'})
+    fail = book.add_format({'num_format': '0', 'border': True, 'align': 'centre', 'bold': True, 'color': 'white', 'bg_color': 'red'})
+
+    # No load sheets if every file failed; the errors sheet is still written
+    loads = ('heating', 'cooling') if 'load' in table else ()
+    for load in loads:
+        sheet = book.add_worksheet(load.capitalize())
+        data = table[table['load'] == load]
+        hours = data.pivot(index='file', columns='threshold', values='simultaneous_hours')
+        problem_rooms = data.groupby('file')['problem_rooms'].first()
+
+        headers = ['File'] + ['Threshold ' + str(t) + ' \u2070C' for t in hours.columns] + ['Problem Rooms']
+        sheet.write_row(0, 0, headers, title)
+        for row, (aps_file, values) in enumerate(hours.iterrows(), start=1):
+            sheet.write(row, 0, aps_file, main)
+            for column, value in enumerate(values, start=1):
+                sheet.write(row, column, value, fail if value >= limit else main)
+            sheet.write(row, len(headers) - 1, problem_rooms[aps_file], main)
+        sheet.set_column(0, 0, 30)
+        sheet.set_column(1, len(headers) - 1, 14)
+        sheet.freeze_panes(1, 1)
+
+    if 'error' in table:
+        errors = table[table['error'].notna()]
+        if len(errors):
+            sheet = book.add_worksheet('Errors')
+            sheet.write_row(0, 0, ['File', 'Error'], title)
+            for row, (aps_file, error) in enumerate(zip(errors['file'], errors['error']), start=1):
+                sheet.write_row(row, 0, [aps_file, error])
+
+    book.close()
+
+
+if __name__ == '__main__':
+    import iesve
+
+    ### Settings
+    pattern = 'Para_run_*.aps'      # aps files of the Vista folder to evaluate
+    heating_threshold = 1.0         # degC; +1 and +2 are also evaluated
+    cooling_threshold = 1.0         # degC; +1 and +2 are also evaluated
+    processes = None                # None = number of CPUs
+    save_file_name = 'UMLH_batch'
+
+    project = iesve.VEProject.get_current_project()
+    aps_paths = find_aps_files(os.path.join(project.path, 'Vista'), pattern)
+    print(str(len(aps_paths)) + ' aps files found')
+
+    table = batch_unmet_load_hours(aps_paths, heating_threshold, cooling_threshold, processes)
+    table.to_csv(os.path.join(project.path, save_file_name + '.csv'), index=False)
+    write_summary_workbook(table, os.path.join(project.path, save_file_name + '.xlsx'))
+    print('Saved ' + save_file_name + '.csv and ' + save_file_name + '.xlsx in the project folder')
@@ -0,0 +1,193 @@
+"""
+=============================
+Unmet load hours - engine
+=============================
+
+Module description
+------------------
+
+Calculates heating and cooling unmet load hours (UMLH) for all rooms of a
+results file at once. Required by unmet_load_hours_test.py
+
+The room air temperature, set points and plant profile of every room are
+held in (rooms, hours) arrays. The adjusted set points (daytime set point
+when the plant is on, night setback otherwise, so that the morning start up
+is not counted) are built with np.where and every threshold is evaluated in
+the same pass by broadcasting over a (thresholds, rooms, hours) array.
+
+No iesve or xlsxwriter: the engine can be run and benchmarked on synthetic
+data; benchmark also checks every output against the former per room loop.
+
+Notes
+-----
+Only occupied (plant on) hours can be unmet; unoccupied hours are compared
+with the setback set points as in the original calculation.
+
+"""
+
+import math
+import time
+import numpy as np
+
+
+def adjusted_set_points(set_points: np.ndarray, plant_profile: np.ndarray, daytime: str):
+    """
+    set point of each room and hour: the daytime set point when the plant is on
+    and the night setback when it is off
+    :param set_points: (rooms, hours) heating or cooling set points
+    :param plant_profile: (rooms, hours) plant profile
+    :param daytime: 'max' for heating (setback is the min) or 'min' for cooling
+    :return: (rooms, hours) adjusted set points
+    """
+    if daytime == 'max':
+        day, night = set_points.max(axis=1), set_points.min(axis=1)
+    else:
+        day, night = set_points.min(axis=1), set_points.max(axis=1)
+    return np.where(plant_profile == 0, night[:, None], day[:, None])
+
+
+def unmet_load_hours(room_temp, heating_set_point, cooling_set_point, plant_profile,
+                     heating_thresholds, cooling_thresholds):
+    """
+    heating and cooling unmet load hours of every room for every threshold
+    :param room_temp: (rooms, hours) room air temperature
+    :param heating_set_point: (rooms, hours) heating set point
+    :param cooling_set_point: (rooms, hours) cooling set point
+    :param plant_profile: (rooms, hours) plant profile
+    :param heating_thresholds: heating thresholds (degC below the set point)
+    :param cooling_thresholds: cooling thresholds (degC above the set point)
+    :return: dict of
+        heating_hours / cooling_hours: (thresholds, rooms) unmet hours of each room
+        heating_total / cooling_total: (thresholds,) simultaneous unmet hours (hours
+            when the load is not met in any room)
+        min_temp, min_temp_day: (rooms,) min temperature during operating hours and its day
+        max_temp, max_temp_day: (rooms,) max temperature during operating hours and its day
+        min_day_heating_set_point: (rooms,) max heating set point of the min temperature day
+        max_day_cooling_set_point: (rooms,) min cooling set point of the max temperature day
+    """
+    room_temp = np.atleast_2d(np.asarray(room_temp, dtype=float))
+    heating_set_point = np.atleast_2d(np.asarray(heating_set_point, dtype=float))
+    cooling_set_point = np.atleast_2d(np.asarray(cooling_set_point, dtype=float))
+    plant_profile = np.atleast_2d(np.asarray(plant_profile, dtype=float))
+    heating_thresholds = np.asarray(heating_thresholds, dtype=float)[:, None, None]
+    cooling_thresholds = np.asarray(cooling_thresholds, dtype=float)[:, None, None]
+
+    adjusted_heating = adjusted_set_points(heating_set_point, plant_profile, 'max')
+    adjusted_cooling = adjusted_set_points(cooling_set_point, plant_profile, 'min')
+
+    # (thresholds, rooms, hours)
+    heating_unmet = (room_temp + heating_thresholds) <= adjusted_heating
+    cooling_unmet = (room_temp - cooling_thresholds) >= adjusted_cooling
+
+    # temperatures during operating hours; unoccupied hours are excluded from the min
+    occupied_temp = room_temp * plant_profile
+    occupied_min_temp = np.where(occupied_temp == 0, 100, occupied_temp)
+    rooms = np.arange(len(room_temp))
+    min_temp_day = occupied_min_temp.argmin(axis=1) // 24
+    max_temp_day = occupied_temp.argmax(axis=1) // 24
+
+    def day_values(values, days):
+        # the 24 hours of a given day of each room
+        hours = days[:, None] * 24 + np.arange(24)
+        return values[rooms[:, None], np.minimum(hours, values.shape[1] - 1)]
+
+    return {'heating_hours': heating_unmet.sum(axis=2),
+            'cooling_hours': cooling_unmet.sum(axis=2),
+            'heating_total': heating_unmet.any(axis=1).sum(axis=1),
+            'cooling_total': cooling_unmet.any(axis=1).sum(axis=1),
+            'min_temp': occupied_min_temp.min(axis=1),
+            'min_temp_day': min_temp_day,
+            'max_temp': occupied_temp.max(axis=1),
+            'max_temp_day': max_temp_day,
+            'min_day_heating_set_point': day_values(heating_set_point, min_temp_day).max(axis=1),
+            'max_day_cooling_set_point': day_values(cooling_set_point, max_temp_day).min(axis=1)}
+
+
+def synthetic_rooms(rooms=500, hours=8760, seed=0):
+    """
+    synthetic room results for testing and benchmarking
+    :param rooms: number of rooms
+    :param hours: number of hours
+    :param seed: random seed
+    :return: room_temp, heating_set_point, cooling_set_point, plant_profile (rooms, hours)
+    """
+    rng = np.random.default_rng(seed)
+    hour_of_day = np.arange(hours) % 24
+    plant_profile = np.tile(((hour_of_day >= 7) & (hour_of_day < 19)).astype(float), (rooms, 1))
+    heating_set_point = np.where(plant_profile == 1, 21.0, 15.0)
+    cooling_set_point = np.where(plant_profile == 1, 24.0, 30.0)
+    season = 5 * np.sin(2 * np.pi * (np.arange(hours) / hours - 0.3))
+    room_temp = 21.0 + season + 3 * plant_profile + rng.normal(0, 1.5, (rooms, hours))
+    return room_temp, heating_set_point, cooling_set_point, plant_profile
+
+
+def benchmark(rooms=500, hours=8760, thresholds=(1, 2, 3)):
+    """
+    compares the per room, per threshold calculation with list built set points
+    (the former unmet_load_hours_calculations) with the engine and checks that every
+    output of the engine matches it
+    :param rooms: number of rooms
+    :param hours: number of hours
+    :param thresholds: thresholds evaluated
+    :return: dict of times (s)
+    """
+    room_temp, heating_set_point, cooling_set_point, plant_profile = synthetic_rooms(rooms, hours)
+
+    def adjusted_loop(set_points, profile, day, night):
+        adjusted = []
+        for i in profile:
+            if i == 0:
+                adjusted.append(night)
+            elif i >= 1:
+                adjusted.append(day)
+        return np.asarray(adjusted)
+
+    start = time.perf_counter()
+    loop = {key: np.zeros((len(thresholds), rooms), dtype=int) for key in ('heating_hours', 'cooling_hours')}
+    loop.update({key: np.zeros(rooms) for key in ('min_temp', 'min_temp_day', 'max_temp', 'max_temp_day',
+                                                  'min_day_heating_set_point', 'max_day_cooling_set_point')})
+    heating_total = np.zeros((len(thresholds), hours))
+    cooling_total = np.zeros((len(thresholds), hours))
+    for r in range(rooms):
+        for t, threshold in enumerate(thresholds):
+            heating = adjusted_loop(heating_set_point[r], plant_profile[r],
+                                    heating_set_point[r].max(), heating_set_point[r].min())
+            heating_unmet = ((room_temp[r] + threshold) <= heating).astype(int)
+            cooling = adjusted_loop(cooling_set_point[r], plant_profile[r],
+                                    cooling_set_point[r].min(), cooling_set_point[r].max())
+            cooling_unmet = ((room_temp[r] - threshold) >= cooling).astype(int)
+            loop['heating_hours'][t, r] = heating_unmet.sum()
+            loop['cooling_hours'][t, r] = cooling_unmet.sum()
+            heating_total[t] += heating_unmet
+            cooling_total[t] += cooling_unmet
+
+        occupied_temp = room_temp[r] * plant_profile[r]
+        min_temp_array = np.asarray([100 if item == 0 else item for item in occupied_temp])
+        min_day = math.floor(min_temp_array.argmin() / 24)
+        max_day = math.floor(occupied_temp.argmax() / 24)
+        loop['min_temp'][r] = min_temp_array.min()
+        loop['min_temp_day'][r] = min_day
+        loop['max_temp'][r] = occupied_temp.max()
+        loop['max_temp_day'][r] = max_day
+        loop['min_day_heating_set_point'][r] = heating_set_point[r][24 * min_day:24 * min_day + 24].max()
+        loop['max_day_cooling_set_point'][r] = cooling_set_point[r][24 * max_day:24 * max_day + 24].min()
+    loop['heating_total'] = (heating_total > 0).sum(axis=1)
+    loop['cooling_total'] = (cooling_total > 0).sum(axis=1)
+    loop_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = unmet_load_hours(room_temp, heating_set_point, cooling_set_point, plant_profile,
+                               thresholds, thresholds)
+    engine_time = time.perf_counter() - start
+
+    for key, expected in loop.items():
+        assert np.array_equal(results[key], expected), key + ' differs from the loop calculation'
+
+    print('Rooms: ' + str(rooms) + ', thresholds: ' + str(len(thresholds)))
+    print('Loop:   {:.3f} s'.format(loop_time))
+    print('Engine: {:.3f} s'.format(engine_time))
+    return {'loop': loop_time, 'engine': engine_time}
+
+
+if __name__ == '__main__':
+    benchmark()
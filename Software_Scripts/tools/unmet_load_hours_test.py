@@ -1,11 +1,11 @@
 import iesve
-import numpy as np
 import xlsxwriter
 import os
 import time
-import math
 import datetime
 from tkinter import filedialog, Frame, BOTH, Label, W, Button, Entry, E, IntVar, Checkbutton, Tk
+import umlh_engine
+import umlh_batch
 
 
 def main():
@@ -144,47 +144,6 @@ def unmet_load_hours_calculations(aps_file,
     :param worksheet: worksheet
     :param worksheet_name: worksheet name
     """
-    def cooling_unmet_load_hours_check(np_room_temp: np.ndarray, np_cooling_set_point: np.ndarray, np_plant_profile, cooling_threshold: float):
-        np_cooling_unmet_load_hour = np.zeros((1, 8760))
-
-        daytime_cooling_set_point = np_cooling_set_point.min()
-        night_setback_cooling_set_point = np_cooling_set_point.max()
-
-        # adjust cooling set point profile to eliminate morning startup time
-        adjusted_cooling_set_point = []
-        for i in np_plant_profile:
-            if i == 0:
-                adjusted_cooling_set_point.append(night_setback_cooling_set_point)
-            elif i >= 1:
-                adjusted_cooling_set_point.append(daytime_cooling_set_point)
-
-        np_adjusted_cooling_set_point = np.asarray(adjusted_cooling_set_point)
-
-        np_cooling_unmet_load_hour = ((np_room_temp - cooling_threshold) >= np_adjusted_cooling_set_point).astype(int)
-
-        return np_cooling_unmet_load_hour
-
-    def heating_unmet_load_hours_check(np_room_temp: np.ndarray, np_heating_set_point: np.ndarray, np_plant_profile, heating_threshold: float):
-        np_heating_unmet_load_hour = np.zeros((1,8760))
-
-        daytime_heating_set_point = np_heating_set_point.max()
-        night_setback_heating_set_point = np_heating_set_point.min()
-
-        # adjust heating set point profile to eliminate morning startup time
-        adjusted_heating_set_point = []
-
-        for i in np_plant_profile:
-            if i == 0:
-                adjusted_heating_set_point.append(night_setback_heating_set_point)
-            elif i >= 1:
-                adjusted_heating_set_point.append(daytime_heating_set_point)
-
-        np_adjusted_heating_set_point = np.asarray(adjusted_heating_set_point)
-
-        np_heating_unmet_load_hour = ((np_room_temp + heating_threshold) <= np_adjusted_heating_set_point).astype(int)
-
-        return np_heating_unmet_load_hour
-
     # create formats object to use when print to the excel sheet
     formats = xlsxFormats(book)
 
@@ -197,13 +156,14 @@ def unmet_load_hours_calculations(aps_file,
     heating_unmet_load_problem_rooms = []
     cooling_unmet_load_problem_rooms = []
 
-    # generates the arrays that will contain the unmet load hours data for every room in the building
-    np_simultaneous_heating_umlh = np.zeros((1, 8760))
-    np_simultaneous_cooling_umlh = np.zeros((1, 8760))
-    np_simultaneous_heating_umlh_2 = np.zeros((1, 8760))
-    np_simultaneous_cooling_umlh_2 = np.zeros((1, 8760))
-    np_simultaneous_heating_umlh_3 = np.zeros((1, 8760))
-    np_simultaneous_cooling_umlh_3 = np.zeros((1, 8760))
+    # get variables from aps file that are required for unmet load hours check, as (rooms, hours) arrays
+    np_room_temps, np_heating_set_points, np_cooling_set_points, np_plant_profiles = umlh_batch.read_room_results(global_vista_results_reader, rooms, worksheet_name)
+
+    # heating and cooling unmet load hours of all rooms for the three thresholds
+    heating_thresholds = [global_heating_threshold, global_heating_threshold + 1, global_heating_threshold + 2]
+    cooling_thresholds = [global_cooling_threshold, global_cooling_threshold + 1, global_cooling_threshold + 2]
+    umlh = umlh_engine.unmet_load_hours(np_room_temps, np_heating_set_points, np_cooling_set_points, np_plant_profiles,
+                                        heating_thresholds, cooling_thresholds)
 
     # y variable is a cell reference used for printing to the excel sheet
     y = 10
@@ -256,67 +216,19 @@ def unmet_load_hours_calculations(aps_file,
         # unpack the tuples of room data that is returned from the ResultsReader function. the variables 'a' and 'b' and not used here but had to be assigned to something
         name, room_id, _, _ = room
 
-        if room_number%10 == 0 and room_number + 10 < number_of_rooms:
-            print('Calculating Rooms: ' + str(room_number + 1) + ' - ' + str(room_number + 10) + ' of ' + str(number_of_rooms) + ' in ' + worksheet_name)
-        elif room_number%10 == 0 and room_number + 10 >= number_of_rooms:
-            print('Calculating Rooms: ' + str(room_number + 1) + ' - ' + str(number_of_rooms) + ' of ' + str(number_of_rooms) + ' in ' + worksheet_name)
-
-        def get_vista_room_results(aps_var: str, vista_var: str):
-            results = global_vista_results_reader.get_room_results(room_id, aps_var, vista_var, 'z', 1, 365)
-
-            if results is None:
-                raise ValueError("Invalid Room Results.")
-
-            return results
+        np_room_temp = np_room_temps[room_number]
+        np_heating_set_point = np_heating_set_points[room_number]
+        np_cooling_set_point = np_cooling_set_points[room_number]
+        np_plant_profile = np_plant_profiles[room_number]
 
-        # get variables from aps file that are required for unmet load hours check
-        np_room_temp = get_vista_room_results('Room air temperature', 'Air temperature')
-        np_heating_set_point = get_vista_room_results('Heating set point', 'Heating set point')
-        np_cooling_set_point = get_vista_room_results('Cooling set point', 'Cooling set point')
-        np_plant_profile = get_vista_room_results('Plant profile', 'Plant profile')
+        # unmet load hours of the room for each threshold
+        heating_unmet_load_hours = umlh['heating_hours'][:, room_number]
+        cooling_unmet_load_hours = umlh['cooling_hours'][:, room_number]
 
-        # heating unmet load hours
-        heating_unmet_load_hour = heating_unmet_load_hours_check(np_room_temp, np_heating_set_point, np_plant_profile, global_heating_threshold)
-        heating_unmet_load_hour_2 = heating_unmet_load_hours_check(np_room_temp, np_heating_set_point, np_plant_profile, global_heating_threshold + 1)
-        heating_unmet_load_hour_3 = heating_unmet_load_hours_check(np_room_temp, np_heating_set_point, np_plant_profile, global_heating_threshold + 2)
-
-        # cooling unmet load hours
-        cooling_unmet_load_hour = cooling_unmet_load_hours_check(np_room_temp, np_cooling_set_point, np_plant_profile, global_cooling_threshold)
-        cooling_unmet_load_hour_2 = cooling_unmet_load_hours_check(np_room_temp, np_cooling_set_point, np_plant_profile, global_cooling_threshold + 1)
-        cooling_unmet_load_hour_3 = cooling_unmet_load_hours_check(np_room_temp, np_cooling_set_point, np_plant_profile, global_cooling_threshold + 2)
-
-        # adds heating unmet load hours array for each room to another array so that the simultaneous unmet load hours can be calculated
-        np_simultaneous_heating_umlh += heating_unmet_load_hour
-        np_simultaneous_heating_umlh_2 += heating_unmet_load_hour_2
-        np_simultaneous_heating_umlh_3 += heating_unmet_load_hour_3
-
-        # adds cooling unmet load hours array for each room to another array so that the simultaneous unmet load hours can be calculated
-        np_simultaneous_cooling_umlh += cooling_unmet_load_hour
-        np_simultaneous_cooling_umlh_2 += cooling_unmet_load_hour_2
-        np_simultaneous_cooling_umlh_3 += cooling_unmet_load_hour_3
-
-        occupied_max_temp = np_room_temp * np_plant_profile
-
-        max_temp = occupied_max_temp.max()
-
-        # calculated the minimum temperature during occupied times
-        occupied_min_temp = np_room_temp * np_plant_profile
-        min_temp_list = []
-        for item in occupied_min_temp:
-            if item == 0:
-                min_temp_list.append(100)
-            else:
-                min_temp_list.append(item)
-
-        np_min_temp_array = np.zeros((1, 8760))
-        np_min_temp_array = np.asarray(min_temp_list)
-        min_temp = np_min_temp_array.min()
-
-        # get the index of the row where this max occurs
-        min_temp_index = np_min_temp_array.argmin()
-        # get the number of the day the max occurs by dividing by 24 and rounding the result down to the nearest integer
-        min_temp_day_number = math.floor(min_temp_index / 24)
-        # get the temperature and cooling setpoint values for each hour of the day that the peak occurs
+        min_temp = umlh['min_temp'][room_number]
+        # get the number of the day the min occurs
+        min_temp_day_number = int(umlh['min_temp_day'][room_number])
+        # get the temperature and heating setpoint values for each hour of the day that the peak occurs
         min_day_air_temp = np_room_temp[24 * min_temp_day_number:24 * min_temp_day_number + 24]
         min_day_heating_setpoint = np_heating_set_point[24 * min_temp_day_number:24 * min_temp_day_number + 24]
         min_day_plant_profile = np_plant_profile[24 * min_temp_day_number:24 * min_temp_day_number + 24]
@@ -324,11 +236,10 @@ def unmet_load_hours_calculations(aps_file,
         min_date = datetime.datetime(2000, 1, 1) + datetime.timedelta(min_temp_day_number + 1)
         min_date = min_date.strftime('%d %b')
 
-        # get the index of the row where this max occurs
-        max_temp_index = (np_room_temp * np_plant_profile).argmax()
-
-        # get the number of the day the max occurs by dividing by 24 and rounding the result down to the nearest integer
-        max_temp_day_number = math.floor(max_temp_index / 24)
+        # get max temp during conditioned time by multiplying by plant profile
+        max_temp = umlh['max_temp'][room_number]
+        # get the number of the day the max occurs
+        max_temp_day_number = int(umlh['max_temp_day'][room_number])
 
         # get the temperature and cooling setpoint values for each hour of the day that the peak occurs
         max_day_air_temp = np_room_temp[24 * max_temp_day_number:24 * max_temp_day_number + 24]
@@ -339,15 +250,9 @@ def unmet_load_hours_calculations(aps_file,
 
         # combines all of the data required for each room into a single list so it can be printed to the excel sheet
         heating_unmet_loads_data = [name, min_date, min_temp,
-                                    min_day_heating_setpoint.max(),
-                                    heating_unmet_load_hour.sum(),
-                                    heating_unmet_load_hour_2.sum(),
-                                    heating_unmet_load_hour_3.sum()]
+                                    umlh['min_day_heating_set_point'][room_number]] + heating_unmet_load_hours.tolist()
         cooling_unmet_loads_data = [name, max_date, max_temp,
-                                    max_day_cooling_setpoint.min(),
-                                    cooling_unmet_load_hour.sum(),
-                                    cooling_unmet_load_hour_2.sum(),
-                                    cooling_unmet_load_hour_3.sum()]
+                                    umlh['max_day_cooling_set_point'][room_number]] + cooling_unmet_load_hours.tolist()
 
         # prints the unmet load hours data for each room to the excel sheet
         worksheet.write_row(y, x_heating, heating_unmet_loads_data, formats.table_main)
@@ -367,7 +272,7 @@ def unmet_load_hours_calculations(aps_file,
         # highlight the problem rooms in color and print graphs for peak heating day
         # -------------------------------------------------------------------------------------------------------------
 
-        if heating_unmet_load_hour.sum() >= unmet_load_hours_limit:
+        if heating_unmet_load_hours[0] >= unmet_load_hours_limit:
             heating_unmet_load_problem_rooms.append(name)
 
             # make empty cells white beside graphs
@@ -388,7 +293,7 @@ def unmet_load_hours_calculations(aps_file,
             worksheet.write_formula(y, x_heating+1, hyperlink + str(min_date) + '")', formats.highlight_fail)
             worksheet.write_formula(y, x_heating+2, hyperlink + str(round(min_temp, 1)) + '")', formats.highlight_fail)
             worksheet.write_formula(y, x_heating+3, hyperlink + str(round(min_day_heating_setpoint.max(), 1)) + '")', formats.highlight_fail)
-            worksheet.write_formula(y, x_heating+4, hyperlink + str(heating_unmet_load_hour.sum()) + '")', formats.highlight_fail)
+            worksheet.write_formula(y, x_heating+4, hyperlink + str(heating_unmet_load_hours[0]) + '")', formats.highlight_fail)
 
             # writes peak day data to be used in the graphs
             worksheet.write(problem_rooms_y, x_peak_data, 'Air Temperature', formats.white_background)
@@ -422,13 +327,10 @@ def unmet_load_hours_calculations(aps_file,
                 chart.set_plotarea(chart_plot_format)
                 worksheet.insert_chart(problem_rooms_y, x_heating, chart, chart_size)
 
-        # get max temp during conditioned time by multiplying by plant profile
-        max_temp = (np_room_temp * np_plant_profile).max()
-
         # -------------------------------------------------------------------------------------------------------------
         # highlight the problem rooms in color and print graphs for peak cooling day
         # -------------------------------------------------------------------------------------------------------------
-        if cooling_unmet_load_hour.sum() >= unmet_load_hours_limit:
+        if cooling_unmet_load_hours[0] >= unmet_load_hours_limit:
             cooling_unmet_load_problem_rooms.append(name)
 
             # make empty cells white beside graphs
@@ -439,11 +341,11 @@ def unmet_load_hours_calculations(aps_file,
                         # excludes cells that contain the information for the graphs
                     if sheet_main_y == problem_rooms_y + 5 or sheet_main_y == problem_rooms_y + 6 or sheet_main_y == problem_rooms_y + 7:
                         sheet_main_y += 1
-                    elif heating_unmet_load_hour.sum() >= unmet_load_hours_limit and sheet_main_y == problem_rooms_y + 0:
+                    elif heating_unmet_load_hours[0] >= unmet_load_hours_limit and sheet_main_y == problem_rooms_y + 0:
                         sheet_main_y += 1
-                    elif heating_unmet_load_hour.sum() >= unmet_load_hours_limit and sheet_main_y == problem_rooms_y + 1:
+                    elif heating_unmet_load_hours[0] >= unmet_load_hours_limit and sheet_main_y == problem_rooms_y + 1:
                         sheet_main_y += 1
-                    elif heating_unmet_load_hour.sum() >= unmet_load_hours_limit and sheet_main_y == problem_rooms_y + 2:
+                    elif heating_unmet_load_hours[0] >= unmet_load_hours_limit and sheet_main_y == problem_rooms_y + 2:
                         sheet_main_y += 1
                     else:
                         worksheet.write(sheet_main_y, sheet_main_x, '', formats.white_background)
@@ -455,7 +357,7 @@ def unmet_load_hours_calculations(aps_file,
             worksheet.write_formula(y, x_cooling+1, hyperlink + str(max_date) + '")', formats.highlight_fail)
             worksheet.write_formula(y, x_cooling+2, hyperlink + str(round(max_temp, 1)) + '")', formats.highlight_fail)
             worksheet.write_formula(y, x_cooling+3, hyperlink + str(round(max_day_cooling_setpoint.min(), 1)) + '")', formats.highlight_fail)
-            worksheet.write_formula(y, x_cooling+4, hyperlink + str(cooling_unmet_load_hour.sum()) + '")', formats.highlight_fail)
+            worksheet.write_formula(y, x_cooling+4, hyperlink + str(cooling_unmet_load_hours[0]) + '")', formats.highlight_fail)
 
             # writes peak day data to be used in the graphs
             worksheet.write(problem_rooms_y + 5, x_peak_data, 'Air Temperature', formats.white_background)
@@ -495,7 +397,7 @@ def unmet_load_hours_calculations(aps_file,
         # if unmet load hours data has been printed to excel for this room then increment the y co-ordinate by 16 so that the next room data will be printed correctly
         # -------------------------------------------------------------------------------------------------------------
 
-        if heating_unmet_load_hour.sum() >= unmet_load_hours_limit or cooling_unmet_load_hour.sum() >= unmet_load_hours_limit:
+        if heating_unmet_load_hours[0] >= unmet_load_hours_limit or cooling_unmet_load_hours[0] >= unmet_load_hours_limit:
 
             # merge cells between graphs for hyperlink
             worksheet.merge_range('H' + str(problem_rooms_y) + ':H' + str(problem_rooms_y+13), '', formats.grey_background)
@@ -530,23 +432,9 @@ def unmet_load_hours_calculations(aps_file,
     # set background color of cell in between the two tables
     worksheet.write(y, 7, '', formats.grey_background)
 
-    # generates an array which shows '1' for each hour when the load is not met in any room in the building
-
-    np_simultaneous_heating_umlh[np_simultaneous_heating_umlh > 0] = 1
-    np_simultaneous_heating_umlh_2[np_simultaneous_heating_umlh_2 > 0] = 1
-    np_simultaneous_heating_umlh_3[np_simultaneous_heating_umlh_3 > 0] = 1
-
-    np_simultaneous_cooling_umlh[np_simultaneous_cooling_umlh > 0] = 1
-    np_simultaneous_cooling_umlh_2[np_simultaneous_cooling_umlh_2 > 0] = 1
-    np_simultaneous_cooling_umlh_3[np_simultaneous_cooling_umlh_3 > 0] = 1
-
-    # sums the array generated in the previous step to calculate the total simultaneous unmet load hours
-    total_heating_umlh = np_simultaneous_heating_umlh.sum()
-    total_heating_umlh_2 = np_simultaneous_heating_umlh_2.sum()
-    total_heating_umlh_3 = np_simultaneous_heating_umlh_3.sum()
-    total_cooling_umlh = np_simultaneous_cooling_umlh.sum()
-    total_cooling_umlh_2 = np_simultaneous_cooling_umlh_2.sum()
-    total_cooling_umlh_3 = np_simultaneous_cooling_umlh_3.sum()
+    # total simultaneous unmet load hours: hours when the load is not met in any room in the building
+    total_heating_umlh, total_heating_umlh_2, total_heating_umlh_3 = umlh['heating_total'].tolist()
+    total_cooling_umlh, total_cooling_umlh_2, total_cooling_umlh_3 = umlh['cooling_total'].tolist()
 
     # combines the total unmet load hours for each threshold calculation into a single list so it can be printed to the excel sheet
     total_heating_unmet_load_hours_list = ['Total', '', '', '', total_heating_umlh, total_heating_umlh_2, total_heating_umlh_3]